@@ -0,0 +1,57 @@
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+from base64 import b64encode
+from ipaddress import IPv4Address
+from wg_api.repositories.wg_configs import ConfigParser
+
+
+PEERS = (100, 1_000, 10_000)
+
+
+def make_config(peers: int) -> str:
+    key = b64encode(bytes(32)).decode('utf-8')
+    lines = [
+        '[Interface]',
+        f'PrivateKey = {key}',
+        'Address = 10.0.0.1/16',
+        'ListenPort = 51820',
+        'PostUp = nft add element inet wg-table interfaces { %i }',
+    ]
+    base = int(IPv4Address('10.0.0.2'))
+    for idx in range(peers):
+        lines += [
+            '',
+            '[Peer]',
+            f'PublicKey = {b64encode(idx.to_bytes(32, "big")).decode("utf-8")}',
+            f'AllowedIPs = {IPv4Address(base + idx)}/32',
+            'PersistentKeepalive = 25',
+        ]
+
+    return '\n'.join(lines) + '\n'
+
+
+async def measure(path: Path, **kwargs) -> float:
+    parser = ConfigParser()
+    start = time.perf_counter()
+    interface = await parser.load(path, **kwargs)
+    elapsed = time.perf_counter() - start
+    assert interface is not None
+    return elapsed
+
+
+async def main():
+    print(f'{"peers":>8} {"by lines ms":>12} {"bulk ms":>9} {"bulk trusted ms":>16}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for peers in PEERS:
+            path = Path(tmp_dir) / f'wg{peers}.conf'
+            path.write_text(make_config(peers))
+            by_lines = await measure(path, bulk=False)
+            bulk = await measure(path)
+            trusted = await measure(path, trusted=True)
+            print(f'{peers:>8} {by_lines * 1e3:>12.1f} {bulk * 1e3:>9.1f} {trusted * 1e3:>16.1f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
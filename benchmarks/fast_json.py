@@ -0,0 +1,88 @@
+import gzip
+import time
+import asyncio
+import orjson
+from typing import Dict
+from base64 import b64encode
+from ipaddress import IPv4Address
+from fastapi.routing import serialize_response
+from fastapi.responses import JSONResponse
+from fastapi.utils import create_response_field
+from wg_api.models import WGRunningInterface, WGConfigInterface
+from wg_api.repositories import WGRunning
+from wg_api.repositories.wg_configs import ConfigParser
+from wg_api.utils.fast_json import model_record, running_interface_record
+from wg_api.utils.wg_netlink import WGDeviceInfo, WGPeerInfo
+from benchmarks.config_parser import make_config
+
+
+PEERS = (1_000, 5_000, 20_000, 50_000)
+
+
+def make_dump(peers: int):
+    key = b64encode(bytes(32)).decode('utf-8')
+    base = int(IPv4Address('10.0.0.2'))
+    now = int(time.time())
+    device = WGDeviceInfo('wg0', key, key, 51820, None)
+    return device, [
+        WGPeerInfo(
+            public_key=b64encode(idx.to_bytes(32, 'big')).decode('utf-8'),
+            preshared_key=None,
+            end_point=f'192.168.{idx % 250}.{idx % 200 + 1}:51820',
+            allowed_ips=[f'{IPv4Address(base + idx)}/32'],
+            latest_handshake=now - idx % 300,
+            transfer_rx=idx * 1000,
+            transfer_tx=idx * 2000,
+            keepalive=25,
+        )
+        for idx in range(peers)
+    ]
+
+
+async def current_response(field, content) -> bytes:
+    # What FastAPI does for a route with a response model
+    value = await serialize_response(field=field, response_content=content, is_coroutine=True)
+    return JSONResponse(value).body
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+async def timed_async(func, *args) -> float:
+    start = time.perf_counter()
+    await func(*args)
+    return time.perf_counter() - start
+
+
+async def main():
+    running_field = create_response_field('running', Dict[str, WGRunningInterface])
+    config_field = create_response_field('configs', Dict[str, WGConfigInterface])
+    print(f'{"peers":>8} {"running ms":>11} {"fast ms":>8} {"configs ms":>11} {"fast ms":>8} '
+          f'{"cached ms":>10} {"json KB":>8} {"gzip KB":>8} {"gzip ms":>8}')
+    for peers in PEERS:
+        device, peer_infos = make_dump(peers)
+        running = await timed_async(
+            lambda: current_response(running_field, {'wg0': WGRunning._parse_interface(device, peer_infos)})
+        )
+        fast_running = timed(lambda: orjson.dumps({'wg0': running_interface_record(
+            device, peer_infos, ['10.0.0.1/16'], set(), time.time(), 120.0
+        )}))
+
+        interface = ConfigParser().loads(make_config(peers), trusted=True)
+        configs = await timed_async(lambda: current_response(config_field, {'wg0.conf': interface}))
+        fast_configs = timed(lambda: orjson.dumps({'wg0.conf': model_record(interface)}))
+        record = {'wg0.conf': model_record(interface)}
+        cached = timed(lambda: orjson.dumps(record))
+
+        body = orjson.dumps(record)
+        gzip_time = timed(lambda: gzip.compress(body, compresslevel=4))
+        print(f'{peers:>8} {running * 1e3:>11.1f} {fast_running * 1e3:>8.1f} {configs * 1e3:>11.1f} '
+              f'{fast_configs * 1e3:>8.1f} {cached * 1e3:>10.1f} {len(body) / 1024:>8.0f} '
+              f'{len(gzip.compress(body, compresslevel=4)) / 1024:>8.0f} {gzip_time * 1e3:>8.1f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+import timeit
+from base64 import b64encode
+from ipaddress import IPv4Address, IPv4Interface
+from wg_api.models import WGPeer
+from wg_api.utils.peer_index import PeerIndex
+
+
+SIZES = (100, 1_000, 10_000, 100_000)
+LOOKUPS = 1_000
+
+
+def make_peers(count: int):
+    base = int(IPv4Address('10.0.0.2'))
+    return [
+        WGPeer.construct(
+            public_key=b64encode(idx.to_bytes(32, 'big')).decode('utf-8'),
+            allowed_ips=[IPv4Interface(f'{IPv4Address(base + idx)}/32')],
+        )
+        for idx in range(count)
+    ]
+
+
+def scan_by_key(peers, public_key):
+    for peer in peers:
+        if peer.public_key == public_key:
+            return peer
+
+
+def scan_by_ip(peers, addr):
+    for peer in peers:
+        for peer_ip in peer.allowed_ips:
+            if addr in peer_ip.network:
+                return peer
+
+
+def main():
+    print(f'{"peers":>8} {"build ms":>10} {"key scan us":>12} {"key index us":>13} '
+          f'{"ip scan us":>11} {"ip index us":>12}')
+    for size in SIZES:
+        peers = make_peers(size)
+        last = peers[-1]
+        last_ip = last.allowed_ips[0].ip
+
+        build = timeit.timeit(lambda: PeerIndex(peers), number=1)
+        index = PeerIndex(peers)
+        number = max(1, LOOKUPS * 100 // size)
+        key_scan = timeit.timeit(lambda: scan_by_key(peers, last.public_key), number=number) / number
+        ip_scan = timeit.timeit(lambda: scan_by_ip(peers, last_ip), number=number) / number
+        key_index = timeit.timeit(lambda: index.get(last.public_key), number=LOOKUPS) / LOOKUPS
+        ip_index = timeit.timeit(lambda: index.routes(last_ip), number=LOOKUPS) / LOOKUPS
+
+        print(f'{size:>8} {build * 1e3:>10.1f} {key_scan * 1e6:>12.1f} {key_index * 1e6:>13.2f} '
+              f'{ip_scan * 1e6:>11.1f} {ip_index * 1e6:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, Tuple
+from wg_api.repositories.wg_configs import ConfigParser
+from benchmarks.config_parser import make_config
+
+
+PEERS = (1_000, 10_000, 50_000)
+
+
+def measure(build: Callable[[], Any]) -> Tuple[float, float]:
+    # Time without tracing, then the memory kept by the result
+    gc.collect()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert result is not None
+    return elapsed, size
+
+
+def main():
+    print(f'{"peers":>8} {"kind":>10} {"build ms":>9} {"MB":>7} {"B/peer":>7} {"to model ms":>12}')
+    for peers in PEERS:
+        config = make_config(peers)
+        parser = ConfigParser()
+        # Only the construction is measured, the text is parsed beforehand
+        state = parser._local()
+        state._loads(config, True, True)
+
+        kinds = {
+            'validated': lambda: state._build_interface(False),
+            'construct': lambda: state._build_interface(True),
+            'record': lambda: state._make_record(True),
+        }
+        for kind, build in kinds.items():
+            elapsed, size = measure(build)
+            to_model = ''
+            if kind == 'record':
+                record = build()
+                start = time.perf_counter()
+                record.to_model()
+                to_model = f'{(time.perf_counter() - start) * 1e3:.1f}'
+
+            print(f'{peers:>8} {kind:>10} {elapsed * 1e3:>9.1f} {size / 2 ** 20:>7.1f} '
+                  f'{size / peers:>7.0f} {to_model:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,50 @@
+import asyncio
 import uvicorn
-from fastapi import FastAPI
-from wg_api.routers import running_router, configs_router
+from contextlib import asynccontextmanager, suppress
+from fastapi import Depends, FastAPI
+from wg_api.utils import config, ShellError, shell_pool, key_pool
+from wg_api.utils.tracing import TracingMiddleware
+from wg_api.routers import running_router, configs_router, \
+    metrics_router, debug_router, drift_router
+from wg_api.repositories import WGFirewall, WGHistory, WGDrift
+from wg_api.sequrity.auth import authenticator, verify_app
+from wg_api.db import connect_database, disconnect_database
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    await connect_database()
+    with suppress(ShellError, ValueError):
+        await WGFirewall.load_disabled_ips()
+
+    tasks = [
+        asyncio.ensure_future(WGFirewall.reconcile_periodically(config.FIREWALL_RECONCILE_INTERVAL)),
+        asyncio.ensure_future(WGHistory.sample_periodically(config.HISTORY_INTERVAL)),
+        asyncio.ensure_future(key_pool.fill()),
+    ]
+    if config.DRIFT_INTERVAL > 0:
+        tasks.append(asyncio.ensure_future(WGDrift.reconcile_periodically(config.DRIFT_INTERVAL)))
+
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+
+        await shell_pool.close()
+        with suppress(Exception):
+            await authenticator.close()
+
+        await disconnect_database()
+
+
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(verify_app)])
 app.include_router(running_router)
 app.include_router(configs_router)
+app.include_router(metrics_router)
+app.include_router(debug_router)
+app.include_router(drift_router)
+app.add_middleware(TracingMiddleware)
 
 
 if __name__ == "__main__":
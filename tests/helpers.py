@@ -0,0 +1,171 @@
+import errno
+import socket
+import struct
+from base64 import b64encode, b64decode
+from functools import partial
+from ipaddress import ip_address
+from typing import List, Optional
+from wg_api.utils.exceptions import NetlinkError
+from wg_api.utils.wg_netlink import WGNetlink, WGDeviceInfo, WGPeerInfo, WGDump, \
+    pack_attr, pack_message, pack_nested, pack_str, parse_attrs, parse_messages, _str, \
+    NETLINK_ROUTE, NETLINK_GENERIC, NLMSG_ERROR, NLMSG_DONE, NLM_F_MULTI, GENL_ID_CTRL, \
+    CTRL_CMD_NEWFAMILY, CTRL_ATTR_FAMILY_ID, CTRL_ATTR_FAMILY_NAME, RTM_NEWLINK, RTM_GETLINK, \
+    IFLA_IFNAME, IFLA_LINKINFO, IFLA_INFO_KIND, WG_GENL_NAME, WG_GENL_VERSION, WG_CMD_GET_DEVICE, \
+    WGDEVICE_A_IFNAME, WGDEVICE_A_PRIVATE_KEY, WGDEVICE_A_PUBLIC_KEY, WGDEVICE_A_LISTEN_PORT, \
+    WGDEVICE_A_FWMARK, WGDEVICE_A_PEERS, WGPEER_A_PUBLIC_KEY, WGPEER_A_PRESHARED_KEY, \
+    WGPEER_A_ENDPOINT, WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL, WGPEER_A_LAST_HANDSHAKE_TIME, \
+    WGPEER_A_RX_BYTES, WGPEER_A_TX_BYTES, WGPEER_A_ALLOWEDIPS, WGALLOWEDIP_A_FAMILY, \
+    WGALLOWEDIP_A_IPADDR, WGALLOWEDIP_A_CIDR_MASK, _NLMSGHDR, _GENLMSGHDR, _IFINFOMSG, \
+    _TIMESPEC, _ZERO_KEY
+
+
+class FakeNetlinkSocket:
+
+    FAMILY_ID = 0x20
+    MAX_PEERS_PER_MESSAGE = 16
+
+    _devices: WGDump = None
+    _protocol: int = None
+    _responses: List[bytes] = None
+
+    def __init__(self, devices: WGDump, protocol: int):
+        self._devices = devices
+        self._protocol = protocol
+        self._responses = []
+
+    @staticmethod
+    def _pack_key(value: Optional[str]) -> bytes:
+        return b64decode(value) if value else _ZERO_KEY
+
+    @staticmethod
+    def _pack_endpoint(end_point: str) -> bytes:
+        host, _, port = end_point.rpartition(':')
+        addr = ip_address(host.strip('[]'))
+        if addr.version == 4:
+            return struct.pack('=H', socket.AF_INET) + struct.pack('!H', int(port)) \
+                + addr.packed + bytes(8)
+
+        return struct.pack('=H', socket.AF_INET6) + struct.pack('!HI', int(port), 0) \
+            + addr.packed + bytes(4)
+
+    @staticmethod
+    def _pack_allowed_ip(allowed_ip: str) -> bytes:
+        host, _, cidr = allowed_ip.partition('/')
+        addr = ip_address(host)
+        family = socket.AF_INET if addr.version == 4 else socket.AF_INET6
+        return pack_nested(
+            0,
+            pack_attr(WGALLOWEDIP_A_FAMILY, struct.pack('=H', family)),
+            pack_attr(WGALLOWEDIP_A_IPADDR, addr.packed),
+            pack_attr(WGALLOWEDIP_A_CIDR_MASK, bytes([int(cidr or addr.max_prefixlen)])),
+        )
+
+    @classmethod
+    def _pack_peer(cls, peer: WGPeerInfo) -> bytes:
+        attrs = [
+            pack_attr(WGPEER_A_PUBLIC_KEY, cls._pack_key(peer.public_key)),
+            pack_attr(WGPEER_A_PRESHARED_KEY, cls._pack_key(peer.preshared_key)),
+            pack_attr(WGPEER_A_LAST_HANDSHAKE_TIME, _TIMESPEC.pack(peer.latest_handshake or 0, 0)),
+            pack_attr(WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL, struct.pack('=H', peer.keepalive or 0)),
+            pack_attr(WGPEER_A_RX_BYTES, struct.pack('=Q', peer.transfer_rx)),
+            pack_attr(WGPEER_A_TX_BYTES, struct.pack('=Q', peer.transfer_tx)),
+            pack_nested(WGPEER_A_ALLOWEDIPS, *map(cls._pack_allowed_ip, peer.allowed_ips)),
+        ]
+        if peer.end_point:
+            attrs.append(pack_attr(WGPEER_A_ENDPOINT, cls._pack_endpoint(peer.end_point)))
+
+        return pack_nested(0, *attrs)
+
+    def _pack_device(self, seq: int, name: str) -> List[bytes]:
+        device, peers = self._devices[name]
+        header = _GENLMSGHDR.pack(WG_CMD_GET_DEVICE, WG_GENL_VERSION, 0)
+        header += pack_str(WGDEVICE_A_IFNAME, name)
+        header += pack_attr(WGDEVICE_A_LISTEN_PORT, struct.pack('=H', device.listen_port or 0))
+        header += pack_attr(WGDEVICE_A_FWMARK, struct.pack('=I', int(device.fw_mark or '0', 0)))
+        header += pack_attr(WGDEVICE_A_PUBLIC_KEY, self._pack_key(device.public_key))
+        if device.private_key:
+            header += pack_attr(WGDEVICE_A_PRIVATE_KEY, self._pack_key(device.private_key))
+
+        messages = []
+        step = self.MAX_PEERS_PER_MESSAGE
+        for idx in range(0, max(len(peers), 1), step):
+            payload = header + pack_nested(WGDEVICE_A_PEERS, *map(self._pack_peer, peers[idx:idx + step]))
+            messages.append(pack_message(self.FAMILY_ID, NLM_F_MULTI, seq, payload))
+
+        return messages
+
+    def _pack_links(self, seq: int) -> List[bytes]:
+        messages = []
+        for idx, name in enumerate(self._devices, start=1):
+            payload = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, idx, 0, 0)
+            payload += pack_str(IFLA_IFNAME, name)
+            payload += pack_nested(IFLA_LINKINFO, pack_str(IFLA_INFO_KIND, WG_GENL_NAME))
+            messages.append(pack_message(RTM_NEWLINK, NLM_F_MULTI, seq, payload))
+
+        return messages
+
+    @staticmethod
+    def _pack_error(seq: int, err_code: int) -> bytes:
+        return pack_message(NLMSG_ERROR, 0, seq, struct.pack('=i', -err_code) + bytes(_NLMSGHDR.size))
+
+    def send(self, data: bytes) -> int:
+        for msg_type, _, payload in parse_messages(data):
+            _, _, _, seq, _ = _NLMSGHDR.unpack_from(data)
+            attrs = dict(parse_attrs(payload, _GENLMSGHDR.size))
+            if self._protocol == NETLINK_ROUTE and msg_type == RTM_GETLINK:
+                self._responses.extend(self._pack_links(seq))
+            elif self._protocol == NETLINK_GENERIC and msg_type == GENL_ID_CTRL:
+                if _str(attrs.get(CTRL_ATTR_FAMILY_NAME, b'')) != WG_GENL_NAME:
+                    self._responses.append(self._pack_error(seq, errno.ENOENT))
+                    continue
+
+                payload = _GENLMSGHDR.pack(CTRL_CMD_NEWFAMILY, 2, 0)
+                payload += pack_attr(CTRL_ATTR_FAMILY_ID, struct.pack('=H', self.FAMILY_ID))
+                self._responses.append(pack_message(GENL_ID_CTRL, 0, seq, payload))
+                continue
+            elif self._protocol == NETLINK_GENERIC and msg_type == self.FAMILY_ID:
+                name = _str(attrs.get(WGDEVICE_A_IFNAME, b''))
+                if name not in self._devices:
+                    self._responses.append(self._pack_error(seq, errno.ENODEV))
+                    continue
+
+                self._responses.extend(self._pack_device(seq, name))
+            else:
+                self._responses.append(self._pack_error(seq, errno.EOPNOTSUPP))
+                continue
+
+            self._responses.append(pack_message(NLMSG_DONE, NLM_F_MULTI, seq, struct.pack('=i', 0)))
+
+        return len(data)
+
+    def recv(self, bufsize: int) -> bytes:
+        if not self._responses:
+            raise NetlinkError(errno.EAGAIN, 'No pending netlink responses')
+
+        return self._responses.pop(0)
+
+    def close(self):
+        self._responses.clear()
+
+
+def make_key(idx: int) -> str:
+    return b64encode(idx.to_bytes(32, 'big')).decode('utf-8')
+
+
+def make_peer(idx: int, allowed_ips=None, **kwargs) -> WGPeerInfo:
+    values = dict(
+        public_key=make_key(idx + 1), preshared_key=None, end_point=None,
+        allowed_ips=[f'10.0.{idx // 250}.{idx % 250 + 2}/32'] if allowed_ips is None else allowed_ips,
+        latest_handshake=None, transfer_rx=idx, transfer_tx=2 * idx, keepalive=None,
+    )
+    values.update(kwargs)
+    return WGPeerInfo(**values)
+
+
+def make_dump(peers_count: int, name: str = 'wg0', listen_port: int = 51820) -> WGDump:
+    device = WGDeviceInfo(name, make_key(10 ** 6), make_key(10 ** 6 + 1), listen_port, None)
+    return {name: (device, [make_peer(idx) for idx in range(peers_count)])}
+
+
+def make_netlink(dump: WGDump) -> WGNetlink:
+    return WGNetlink(partial(FakeNetlinkSocket, dump))
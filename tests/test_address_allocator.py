@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from ipaddress import IPv4Address, IPv4Interface, IPv4Network
+from wg_api.models import WGInterface, WGPeer
+from wg_api.repositories import wg_clients
+from wg_api.repositories.wg_clients import WGClients
+from wg_api.utils.address_allocator import AddressAllocator
+from wg_api.utils.wg_keys import generate_private_key
+from tests.helpers import make_key
+
+
+def test_allocate_skips_reserved():
+    allocator = AddressAllocator(IPv4Network('10.0.0.0/29'), ['10.0.0.2', '10.0.0.4/31'])
+    assert [allocator.allocate() for _ in range(2)] == [IPv4Address('10.0.0.1'), IPv4Address('10.0.0.3')]
+    assert allocator.allocate() == IPv4Address('10.0.0.6')
+    with pytest.raises(RuntimeError):
+        allocator.allocate()
+
+
+def test_release_and_reuse():
+    allocator = AddressAllocator(IPv4Network('10.0.0.0/24'))
+    addresses = [allocator.allocate() for _ in range(10)]
+    allocator.release(addresses[3])
+    assert not allocator.is_used(addresses[3])
+    assert allocator.allocate() == addresses[3]
+    assert allocator.allocate() == IPv4Address('10.0.0.11')
+
+
+def test_reserve_range():
+    allocator = AddressAllocator(IPv4Network('10.0.0.0/16'))
+    allocator.reserve_range(IPv4Address('9.255.255.0'), IPv4Address('10.0.1.0'))
+    assert len(allocator) == 2 ** 16 - 257 - 1
+    assert allocator.allocate() == IPv4Address('10.0.1.1')
+
+
+def test_outside_addresses_are_ignored():
+    allocator = AddressAllocator(IPv4Network('10.0.0.0/24'))
+    allocator.reserve('192.168.0.0/16')
+    allocator.release('10.1.0.1')
+    assert len(allocator) == 254
+    assert '10.0.0.0/16' in allocator
+    assert '10.1.0.0/24' not in allocator
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    monkeypatch.setattr(WGClients, '_allocators', {})
+
+
+def make_interface(*peer_ips: str) -> WGInterface:
+    return WGInterface(
+        private_key=generate_private_key(), address=['10.0.0.10/24'], listen_port=51820,
+        peers=[WGPeer(public_key=make_key(idx + 1), allowed_ips=[peer_ip]) for idx, peer_ip in enumerate(peer_ips)],
+    )
+
+
+def create_client(owner: str, interface: WGInterface) -> IPv4Interface:
+    client_peer, client_interface = asyncio.run(WGClients.create_client(owner, interface))
+    assert client_interface.address == client_peer.allowed_ips
+    return client_peer.allowed_ips[0]
+
+
+def test_client_addresses_follow_server_and_peers(clients):
+    interface = make_interface('10.0.0.11/32', '10.0.0.12/31')
+    owner = WGClients.config_owner('wg0')
+    assert create_client(owner, interface) == IPv4Interface('10.0.0.14/32')
+    assert create_client(owner, interface) == IPv4Interface('10.0.0.15/32')
+
+
+def test_resync_on_changed_peer_addresses(clients):
+    owner = WGClients.config_owner('wg0')
+    assert create_client(owner, make_interface('10.0.0.11/32')) == IPv4Interface('10.0.0.12/32')
+    # Same number of peers, another address
+    assert create_client(owner, make_interface('10.0.0.13/32')) == IPv4Interface('10.0.0.11/32')
+    assert create_client(owner, make_interface('10.0.0.13/32')) == IPv4Interface('10.0.0.14/32')
+
+
+def test_release_only_in_owner(clients):
+    interface = make_interface()
+    running_owner, config_owner = WGClients.running_owner('wg0'), WGClients.config_owner('wg0')
+    assert create_client(running_owner, interface) == IPv4Interface('10.0.0.11/32')
+    assert create_client(config_owner, interface) == IPv4Interface('10.0.0.11/32')
+
+    WGClients.release_client_address(running_owner, WGPeer(public_key=make_key(1), allowed_ips=['10.0.0.11/32']))
+    assert create_client(config_owner, interface) == IPv4Interface('10.0.0.12/32')
+    assert create_client(running_owner, interface) == IPv4Interface('10.0.0.11/32')
+
+
+def test_fixed_addresses_are_not_released():
+    allocator = AddressAllocator(IPv4Network('10.0.0.0/29'), ['10.0.0.2'])
+    allocator.reserve_range(IPv4Address('10.0.0.0'), IPv4Address('10.0.0.1'))
+    allocator.reserve('10.0.0.0/29')
+    allocator.release('10.0.0.0/29')
+    assert [allocator.allocate() for _ in range(4)] == [IPv4Address(f'10.0.0.{idx}') for idx in range(3, 7)]
+    with pytest.raises(RuntimeError):
+        allocator.allocate()
+
+
+def test_resync_releases_removed_peers(clients):
+    owner = WGClients.running_owner('wg0')
+    assert create_client(owner, make_interface('10.0.0.11/32', '10.0.0.12/32')) == IPv4Interface('10.0.0.13/32')
+    # 10.0.0.11 was removed outside the API, 10.0.0.13 is not saved yet
+    assert create_client(owner, make_interface('10.0.0.12/32')) == IPv4Interface('10.0.0.11/32')
+    assert create_client(owner, make_interface('10.0.0.12/32')) == IPv4Interface('10.0.0.14/32')
+
+
+def test_failed_create_releases_address(clients, monkeypatch):
+    owner = WGClients.config_owner('wg0')
+    interface = make_interface()
+    get_keypair = wg_clients.key_pool.get
+
+    async def fail_get():
+        raise RuntimeError('no keys')
+
+    monkeypatch.setattr(wg_clients.key_pool, 'get', fail_get)
+    with pytest.raises(RuntimeError):
+        asyncio.run(WGClients.create_client(owner, interface))
+
+    monkeypatch.setattr(wg_clients.key_pool, 'get', get_keypair)
+    assert create_client(owner, interface) == IPv4Interface('10.0.0.11/32')
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from wg_api.sequrity import auth
+from wg_api.sequrity.auth import AppAuthenticator
+from wg_api.sequrity.passwords import hash_password, verify_password
+
+
+HASHED_SECRET = hash_password('secret', iterations=1000)
+
+
+class FakeApps:
+
+    async def get(self, app_key: str):
+        if app_key != 'app':
+            return None
+
+        return {'app_key': app_key, 'app_name': 'App', 'auth_dt': None,
+                'create_dt': None, 'hashed_password': HASHED_SECRET}
+
+    async def update_auth_dts(self, auth_dts):
+        pass
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    calls = []
+
+    def counted_verify(*args):
+        calls.append(args)
+        return verify_password(*args)
+
+    monkeypatch.setattr(auth, 'verify_password', counted_verify)
+    return calls
+
+
+def authenticate(*attempts):
+    async def run():
+        authenticator = AppAuthenticator(FakeApps(), 16, 300, 30, 30, 3)
+        try:
+            return [bool(await authenticator.authenticate(*attempt)) for attempt in attempts]
+        finally:
+            await authenticator.close()
+
+    return asyncio.run(run())
+
+
+def test_success_is_cached(hashes):
+    assert authenticate(('app', 'secret'), ('app', 'secret')) == [True, True]
+    assert len(hashes) == 1
+
+
+def test_wrong_secret_is_hashed_once(hashes):
+    assert authenticate(*[('app', 'wrong', '10.0.0.1')] * 3, ('app', 'secret', '10.0.0.1')) == \
+        [False, False, False, True]
+    assert len(hashes) == 2
+
+
+def test_failing_client_is_throttled_not_the_key(hashes):
+    attempts = [('app', f'wrong{idx}', '10.0.0.1') for idx in range(5)]
+    results = authenticate(*attempts, ('app', 'secret', '10.0.0.1'), ('app', 'secret', '10.0.0.2'))
+    assert results == [False] * 6 + [True]
+    assert len(hashes) == 4
@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from starlette.requests import Request
+from wg_api.utils import config
+from wg_api.utils.etag import check_etag, dump_etag, make_etag, parse_if_none_match
+from wg_api.utils.snapshot_cache import running_cache
+from wg_api.repositories.wg_firewall import WGFirewall
+from wg_api.repositories.wg_running import WGRunning
+from tests.helpers import make_dump, make_netlink, make_peer
+
+
+def make_request(if_none_match: str = None) -> Request:
+    headers = [] if if_none_match is None else [(b'if-none-match', if_none_match.encode('latin-1'))]
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': headers}, receive)
+
+
+def get_tag_of(*tags: str):
+    tags = list(tags)
+
+    async def get_tag():
+        return tags.pop(0) if len(tags) > 1 else tags[0]
+
+    return get_tag
+
+
+def test_parse_if_none_match():
+    assert parse_if_none_match('W/"a", "b",, *') == {'"a"', '"b"', '*'}
+    assert parse_if_none_match(None) == set()
+
+
+def test_new_state():
+    etag, response = asyncio.run(check_etag(make_request(), get_tag_of('"a"')))
+    assert etag == 'W/"a"' and response is None
+
+    etag, response = asyncio.run(check_etag(make_request('W/"b"'), get_tag_of('"a"')))
+    assert etag == 'W/"a"' and response is None
+
+
+@pytest.mark.parametrize('if_none_match', ['W/"a"', '"a"', '"x", W/"a"', '*'])
+def test_not_modified(if_none_match):
+    etag, response = asyncio.run(check_etag(make_request(if_none_match), get_tag_of('"a"')))
+    assert response.status_code == 304
+    assert response.headers['etag'] == etag == 'W/"a"'
+
+
+def test_wait_for_change(monkeypatch):
+    monkeypatch.setattr(config, 'ETAG_POLL_INTERVAL', 0.01)
+    etag, response = asyncio.run(check_etag(make_request('W/"a"'), get_tag_of('"a"', '"a"', '"b"'), wait=5))
+    assert etag == 'W/"b"' and response is None
+
+    etag, response = asyncio.run(check_etag(make_request('W/"a"'), get_tag_of('"a"'), wait=0.05))
+    assert response.status_code == 304
+
+
+def test_tags_are_stable():
+    dump = make_dump(20)
+    assert make_etag(('a', 1)) == make_etag(('a', 1)) != make_etag(('a', 2))
+    assert dump_etag(dump, 100.0, 120.0, ('10.0.0.3',)) == dump_etag(make_dump(20), 100.0, 120.0, ('10.0.0.3',))
+    assert dump_etag(dump, 100.0, 120.0) != dump_etag(dump, 100.0, 120.0, ('10.0.0.3',))
+
+
+def test_dump_tag_follows_connection_state():
+    dump = make_dump(0)
+    dump['wg0'][1].append(make_peer(0, latest_handshake=1000))
+    assert dump_etag(dump, 1010.0, 120.0) == dump_etag(dump, 1100.0, 120.0)
+    assert dump_etag(dump, 1010.0, 120.0) != dump_etag(dump, 1200.0, 120.0)
+
+
+@pytest.fixture
+def running(monkeypatch):
+    async def load_disabled_ips(cls):
+        return set()
+
+    async def get_interfaces_addresses(cls, *interface_names):
+        return {name: [] for name in interface_names}
+
+    dump = make_dump(10)
+    monkeypatch.setattr(WGRunning, '_netlink', make_netlink(dump))
+    monkeypatch.setattr(WGFirewall, 'load_disabled_ips', classmethod(load_disabled_ips))
+    monkeypatch.setattr(WGFirewall, 'get_interfaces_addresses', classmethod(get_interfaces_addresses))
+    running_cache.invalidate()
+    yield dump
+    running_cache.invalidate()
+
+
+def test_running_tag(running):
+    async def get_tags():
+        first = await WGRunning.get_tag('wg0')
+        same = await WGRunning.get_tag('wg0')
+        running['wg0'][1].append(make_peer(100))
+        cached = await WGRunning.get_tag('wg0')
+        running_cache.invalidate()
+        return first, same, cached, await WGRunning.get_tag('wg0')
+
+    first, same, cached, changed = asyncio.run(get_tags())
+    assert first == same == cached
+    assert changed != first
@@ -0,0 +1,44 @@
+import asyncio
+from contextlib import suppress
+from starlette.requests import Request
+from wg_api.repositories import WGEvents
+from wg_api.routers.running import stream_events
+
+
+def make_request(disconnect: asyncio.Event) -> Request:
+    async def receive():
+        await disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    return Request({'type': 'http', 'method': 'GET', 'path': '/running/events', 'headers': []}, receive)
+
+
+def test_unstarted_stream_does_not_subscribe():
+    async def drop_response():
+        await stream_events(make_request(asyncio.Event()))
+        return WGEvents.subscribers()
+
+    assert asyncio.run(drop_response()) == 0
+
+
+def test_disconnect_unsubscribes(monkeypatch):
+    async def poll(cls):
+        pass
+
+    monkeypatch.setattr(WGEvents, 'poll', classmethod(poll))
+
+    async def stream_until_disconnect():
+        disconnect = asyncio.Event()
+        response = await stream_events(make_request(disconnect))
+        chunks = response.body_iterator
+        task = asyncio.ensure_future(chunks.__anext__())
+        await asyncio.sleep(0.05)
+        subscribed = WGEvents.subscribers()
+        disconnect.set()
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+        return subscribed, WGEvents.subscribers()
+
+    assert asyncio.run(stream_until_disconnect()) == (1, 0)
@@ -0,0 +1,67 @@
+import random
+import pytest
+from wg_api.utils.exceptions import IncorrectPeerQuery
+from wg_api.utils.peer_query import PeerQuery
+from tests.helpers import make_peer
+
+
+def make_peers(count: int):
+    peers = [make_peer(idx) for idx in range(count)]
+    random.Random(count).shuffle(peers)
+    return peers
+
+
+def read_pages(peers, **kwargs):
+    page, cursor, total = PeerQuery(**kwargs).select(peers)
+    keys = [peer.public_key for peer in page]
+    while cursor is not None:
+        page, cursor, _ = PeerQuery(cursor=cursor, **kwargs).select(peers)
+        keys.extend(peer.public_key for peer in page)
+
+    return keys, total
+
+
+def test_pages_cover_all_peers_in_order():
+    peers = make_peers(125)
+    keys, total = read_pages(peers, limit=50)
+    assert keys == sorted(peer.public_key for peer in peers)
+    assert total == 125
+
+
+def test_last_page_has_no_cursor():
+    peers = make_peers(100)
+    page, cursor, _ = PeerQuery(limit=100).select(peers)
+    assert len(page) == 100 and cursor is None
+    page, cursor, _ = PeerQuery(limit=99).select(peers)
+    assert cursor == page[-1].public_key
+
+
+def test_pages_stable_when_peers_change():
+    peers = sorted(make_peers(100), key=lambda peer: peer.public_key)
+    page, cursor, _ = PeerQuery(limit=10).select(peers)
+    # A removed peer of the first page does not shift the next one
+    peers.remove(page[0])
+    next_page, _, _ = PeerQuery(cursor=cursor, limit=10).select(peers)
+    assert next_page == peers[9:19]
+
+
+def test_filters():
+    peers = make_peers(300)
+    keys, total = read_pages(peers, limit=40, prefix='10.0.1.0/24')
+    assert total == 50
+    assert keys == sorted(peer.public_key for peer in peers if peer.allowed_ips[0].startswith('10.0.1.'))
+
+    page, _, total = PeerQuery(prefix='10.0.0.0/16').select(peers, match=lambda peer: peer.transfer_rx % 2 == 0)
+    assert total == 150 and all(peer.transfer_rx % 2 == 0 for peer in page)
+
+
+def test_projection():
+    query = PeerQuery(fields='public_key, allowed_ips')
+    query.check(('public_key', 'allowed_ips', 'keepalive'))
+    assert query.project({'public_key': 'a', 'allowed_ips': [], 'keepalive': 5}) == {'public_key': 'a', 'allowed_ips': []}
+
+
+@pytest.mark.parametrize('kwargs', [{'prefix': '10.0.0.300/24'}, {'fields': 'public_key,unknown'}])
+def test_incorrect_query(kwargs):
+    with pytest.raises(IncorrectPeerQuery):
+        PeerQuery(**kwargs).check(('public_key',))
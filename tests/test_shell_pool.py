@@ -0,0 +1,91 @@
+import os
+import asyncio
+import pytest
+from contextlib import suppress
+from wg_api.utils import config, wg_utils
+from wg_api.utils.shell_pool import ShellPool
+from wg_api.utils.exceptions import ShellError
+
+
+def run(pool: ShellPool, coro):
+    async def run_and_close():
+        try:
+            return await coro
+        finally:
+            await pool.close()
+
+    return asyncio.run(run_and_close())
+
+
+def test_exec_output_and_code():
+    pool = ShellPool(2, 5, 10, 2 ** 16)
+    assert run(pool, pool.exec('echo out; echo err >&2; exit 3')) == (3, 'out\n', 'err\n')
+
+
+def test_input_is_not_expanded():
+    pool = ShellPool(2, 5, 10, 2 ** 16)
+    value = "$(echo no) 'quoted' `x` \\ EOF"
+    assert run(pool, pool.exec('cat', value)) == (0, value + '\n', '')
+
+
+def test_workers_are_reused():
+    pool = ShellPool(2, 5, 10, 2 ** 16)
+
+    async def exec_many():
+        return await asyncio.gather(*(pool.exec('echo $$') for _ in range(10)))
+
+    results = run(pool, exec_many())
+    assert all(code == 0 for code, _, _ in results)
+    assert len({stdout for _, stdout, _ in results}) <= 2
+
+
+def test_exit_does_not_break_pool():
+    pool = ShellPool(1, 5, 10, 2 ** 16)
+
+    async def exec_after_exit():
+        # Commands run in a subshell, `exit` ends only that
+        await pool.exec('exit 1')
+        return await pool.exec('echo ok')
+
+    assert run(pool, exec_after_exit()) == (0, 'ok\n', '')
+
+
+def test_timeout_kills_worker():
+    pool = ShellPool(1, 0.2, 10, 2 ** 16)
+
+    async def exec_after_timeout():
+        with pytest.raises(ShellError):
+            await pool.exec('sleep 5')
+
+        return await pool.exec('echo ok')
+
+    assert run(pool, exec_after_timeout()) == (0, 'ok\n', '')
+
+
+def test_too_many_pending():
+    pool = ShellPool(1, 5, 2, 2 ** 16)
+
+    async def exec_many():
+        return await asyncio.gather(*(pool.exec('sleep 0.1') for _ in range(3)), return_exceptions=True)
+
+    results = run(pool, exec_many())
+    assert [isinstance(result, ShellError) for result in results] == [False, False, True]
+
+
+def running_commands(marker: str):
+    commands = []
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        with suppress(OSError):
+            with open(f'/proc/{pid}/cmdline', 'rb') as cmdline:
+                commands.append(cmdline.read().replace(b'\0', b' ').decode())
+
+    return [command for command in commands if command.startswith(marker)]
+
+
+def test_spawn_timeout_kills_command(monkeypatch):
+    monkeypatch.setattr(config, 'SHELL_TIMEOUT', 0.2)
+    # The shell does not exec the last command of a list, so it is a child
+    with pytest.raises(ShellError):
+        asyncio.run(wg_utils._spawn_exec('sleep 7.25; true'))
+
+    assert running_commands('sleep 7.25') == []
@@ -0,0 +1,44 @@
+import asyncio
+from wg_api.utils.snapshot_cache import SnapshotCache
+
+
+def fetch_of(value):
+    async def fetch():
+        await asyncio.sleep(0)
+        return value
+
+    return fetch
+
+
+def test_concurrent_gets_are_coalesced():
+    cache = SnapshotCache(10, 4)
+
+    async def get_many():
+        return await asyncio.gather(*(cache.get('key', fetch_of(idx)) for idx in range(5)))
+
+    assert asyncio.run(get_many()) == [0] * 5
+    assert cache.stats() == {'hits': 0, 'misses': 1, 'coalesced': 4, 'size': 1}
+
+
+def test_size_is_bounded():
+    cache = SnapshotCache(10, 4)
+
+    async def get_many():
+        for idx in range(10):
+            await cache.get(idx, fetch_of(idx))
+
+        return await cache.get(9, fetch_of(None)), await cache.get(0, fetch_of('new'))
+
+    assert asyncio.run(get_many()) == (9, 'new')
+    assert cache.stats()['size'] == 4
+
+
+def test_expired_entries_are_dropped():
+    cache = SnapshotCache(0.01, 4)
+
+    async def get_after_ttl():
+        await cache.get('key', fetch_of('old'))
+        await asyncio.sleep(0.02)
+        return await cache.get('key', fetch_of('new'))
+
+    assert asyncio.run(get_after_ttl()) == 'new'
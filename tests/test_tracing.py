@@ -0,0 +1,26 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from wg_api.utils.tracing import TracingMiddleware
+
+
+def make_client(**kwargs) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, profiler=None, profile_header=False, **kwargs)
+
+    @app.get('/')
+    async def root():
+        return {}
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize('trace_header', [False, True])
+def test_trace_header_needs_opt_in(trace_header):
+    response = make_client(enabled=False, trace_header=trace_header).get('/', headers={'X-Trace': '1'})
+    assert ('server-timing' in response.headers) == trace_header
+
+
+def test_trace_header_cannot_disable_server_tracing():
+    response = make_client(enabled=True, trace_header=False).get('/', headers={'X-Trace': '0'})
+    assert 'server-timing' in response.headers
@@ -0,0 +1,135 @@
+import os
+import stat
+import asyncio
+import pytest
+from wg_api.models import WGPeer
+from wg_api.repositories.wg_configs import WGConfigs, ConfigParser, config_cache
+from wg_api.utils.exceptions import BaseInterfaceException
+from wg_api.utils.wg_keys import generate_private_key
+from tests.helpers import make_key
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / 'wg0.conf'
+    path.write_text(f'[Interface]\nPrivateKey = {generate_private_key()}\nAddress = 10.0.0.1/24\n')
+    path.chmod(0o640)
+    return path
+
+
+def make_peer(idx: int) -> WGPeer:
+    return WGPeer(public_key=make_key(idx + 1), allowed_ips=[f'10.0.0.{idx + 2}/32'])
+
+
+def test_write_atomic_keeps_mode(config_path):
+    ConfigParser._write_atomic(config_path, '[Interface]\n')
+    assert config_path.read_text() == '[Interface]\n'
+    assert stat.S_IMODE(os.stat(config_path).st_mode) == 0o640
+    assert os.listdir(config_path.parent) == ['wg0.conf']
+
+
+def test_write_atomic_failure_keeps_old_config(config_path, monkeypatch):
+    old_config = config_path.read_text()
+
+    def fail_replace(*args):
+        raise OSError('replace failed')
+
+    monkeypatch.setattr(os, 'replace', fail_replace)
+    with pytest.raises(OSError):
+        ConfigParser._write_atomic(config_path, '[Interface]\n')
+
+    assert config_path.read_text() == old_config
+    assert os.listdir(config_path.parent) == ['wg0.conf']
+
+
+def test_concurrent_edits_are_batched(config_path, monkeypatch):
+    configs = WGConfigs(config_path.parent)
+    writes = []
+    write = configs._write
+
+    async def counted_write(*args):
+        writes.append(args)
+        await write(*args)
+
+    monkeypatch.setattr(configs, '_write', counted_write)
+
+    async def edit():
+        await asyncio.gather(*(configs.set_peer(config_path, make_peer(idx)) for idx in range(20)))
+        return await configs.remove_peer(config_path, make_key(1))
+
+    removed = asyncio.run(edit())
+    assert removed.public_key == make_key(1)
+    # The first edit is written alone, the ones queued meanwhile together
+    assert len(writes) == 3
+    assert config_path.read_text().count('[Peer]') == 19
+
+
+def test_failed_edit_does_not_fail_batch(config_path):
+    configs = WGConfigs(config_path.parent)
+
+    async def edit():
+        return await asyncio.gather(
+            configs.set_peer(config_path, make_peer(0)),
+            configs.remove_peer(config_path, make_key(100)),
+            configs.set_peer(config_path, make_peer(1)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(edit())
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], KeyError)
+    assert config_path.read_text().count('[Peer]') == 2
+
+
+def test_cancelled_edit_resolves_waiters(config_path, monkeypatch):
+    configs = WGConfigs(config_path.parent)
+    write = configs._write
+
+    async def slow_write(*args):
+        await asyncio.sleep(0.2)
+        await write(*args)
+
+    monkeypatch.setattr(configs, '_write', slow_write)
+
+    async def edit():
+        lock = configs._get_lock(config_path)
+        await lock.acquire()
+        tasks = [asyncio.ensure_future(configs.set_peer(config_path, make_peer(idx))) for idx in range(3)]
+        await asyncio.sleep(0)
+        lock.release()
+        await asyncio.sleep(0.1)
+        tasks[0].cancel()
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 5)
+
+    results = asyncio.run(edit())
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert all(isinstance(result, BaseInterfaceException) for result in results[1:])
+
+
+def test_returned_peers_are_not_cached(config_path):
+    configs = WGConfigs(config_path.parent)
+
+    async def change_returned():
+        await configs.set_peer(config_path, make_peer(0))
+        interface = await configs.get(config_path)
+        interface.peers[0].keepalive = 25
+        interface.peers.append(make_peer(1))
+        return await configs.get(config_path)
+
+    interface = asyncio.run(change_returned())
+    assert len(interface.peers) == 1
+    assert interface.peers[0].keepalive is None
+
+
+def test_removed_configs_are_pruned(config_path):
+    configs = WGConfigs(config_path.parent)
+    renamed_path = config_path.with_name('wg1.conf')
+
+    async def rename():
+        await configs.get_all()
+        config_path.rename(renamed_path)
+        return await configs.get_all()
+
+    assert list(asyncio.run(rename())) == [renamed_path]
+    assert config_path not in config_cache._entries
+    assert not [key for key in config_cache._views if key[0] == config_path]
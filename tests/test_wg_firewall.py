@@ -0,0 +1,37 @@
+import asyncio
+import pytest
+from ipaddress import IPv4Address
+from wg_api.repositories import wg_firewall
+from wg_api.repositories.wg_firewall import WGFirewall
+
+
+@pytest.fixture
+def scripts(monkeypatch):
+    scripts = []
+
+    async def shell_exec(command, *input_lines):
+        scripts.append(list(input_lines))
+        return ''
+
+    monkeypatch.setattr(wg_firewall, 'shell_exec', shell_exec)
+    monkeypatch.setattr(WGFirewall, '_disabled_ips', {IPv4Address('10.0.0.2')})
+    return scripts
+
+
+def test_redundant_adds_are_skipped(scripts):
+    asyncio.run(WGFirewall._commit_disabled_ips({'10.0.0.2': True, '10.0.0.3': True}))
+    assert scripts == [['add element inet wg-table disabled-peers { 10.0.0.3 }']]
+    assert WGFirewall._disabled_ips == {IPv4Address('10.0.0.2'), IPv4Address('10.0.0.3')}
+
+    asyncio.run(WGFirewall._commit_disabled_ips({'10.0.0.2': True}))
+    assert len(scripts) == 1
+
+
+def test_enable_is_issued_despite_stale_shadow(scripts):
+    # 10.0.0.5 was disabled behind our back, the shadow set does not know it
+    asyncio.run(WGFirewall._commit_disabled_ips({'10.0.0.2': False, '10.0.0.5': False}))
+    assert scripts == [[
+        'add element inet wg-table disabled-peers { 10.0.0.2, 10.0.0.5 }',
+        'delete element inet wg-table disabled-peers { 10.0.0.2, 10.0.0.5 }',
+    ]]
+    assert WGFirewall._disabled_ips == set()
@@ -0,0 +1,45 @@
+import pytest
+from base64 import b64encode
+from wg_api.utils import wg_keys
+from wg_api.utils.exceptions import IncorrectKey
+from wg_api.utils.wg_keys import derive_public_key, generate_keypair, generate_private_key
+
+
+# RFC 7748, section 5.2
+SCALAR = 'a546e36bf0527c9d3b16154b82465edd62144c0ac1fc5a18506a2244ba449ac4'
+U_COORDINATE = 'e6db6867583030db3594c1a424b15f7c726624ec26b3353b10a903a6d0ab1c4c'
+OUTPUT = 'c3da55379de9c6908e94ea4df28d084f32eccf03491c71f754b4075577a28552'
+
+# RFC 7748, section 6.1
+ALICE_PRIVATE = '77076d0a7318a57d3c16c17251b26645df4c2f87ebc0992ab177fba51db92c2a'
+ALICE_PUBLIC = '8520f0098930a754748b7ddcb43ef75a0dbf3a0d26381af4eba4a98eaa9b4e6a'
+
+
+def to_key(value: str) -> str:
+    return b64encode(bytes.fromhex(value)).decode('utf-8')
+
+
+def test_x25519_vector():
+    u = int.from_bytes(bytes.fromhex(U_COORDINATE), 'little')
+    assert wg_keys._x25519(bytes.fromhex(SCALAR), u).hex() == OUTPUT
+
+
+def test_public_key_vector():
+    assert derive_public_key(to_key(ALICE_PRIVATE)) == to_key(ALICE_PUBLIC)
+
+
+def test_public_key_fallback(monkeypatch):
+    monkeypatch.setattr(wg_keys, 'X25519PrivateKey', None)
+    assert derive_public_key(to_key(ALICE_PRIVATE)) == to_key(ALICE_PUBLIC)
+
+
+def test_generated_keypair():
+    private_key, public_key = generate_keypair()
+    assert derive_public_key(private_key) == public_key
+    assert derive_public_key(generate_private_key()) != public_key
+
+
+@pytest.mark.parametrize('key', ['', 'not a key', b64encode(bytes(31)).decode('utf-8')])
+def test_incorrect_key(key):
+    with pytest.raises(IncorrectKey):
+        derive_public_key(key)
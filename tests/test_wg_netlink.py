@@ -0,0 +1,96 @@
+import errno
+import struct
+import asyncio
+import pytest
+from functools import partial
+from wg_api.repositories.wg_running import WGRunning
+from wg_api.utils.exceptions import NetlinkError
+from wg_api.utils.wg_netlink import WGNetlink
+from tests.helpers import FakeNetlinkSocket, make_dump, make_netlink, make_peer
+
+
+def test_dump_spans_several_messages():
+    dump = make_dump(FakeNetlinkSocket.MAX_PEERS_PER_MESSAGE * 3 + 5)
+    assert make_netlink(dump).dump() == dump
+
+
+def test_dump_of_one_interface():
+    dump = {**make_dump(3), **make_dump(2, name='wg1')}
+    assert make_netlink(dump).dump('wg1') == {'wg1': dump['wg1']}
+    assert sorted(make_netlink(dump).interfaces()) == ['wg0', 'wg1']
+
+
+def test_peer_values():
+    dump = make_dump(0)
+    dump['wg0'][1].extend([
+        make_peer(0, end_point='192.168.1.10:51820', keepalive=25, latest_handshake=1700000000,
+                  preshared_key=make_peer(100).public_key),
+        make_peer(1, allowed_ips=['10.1.0.0/16', 'fd00::2/128'], end_point='[fd00::1]:443'),
+        make_peer(2, allowed_ips=[]),
+    ])
+    assert make_netlink(dump).dump() == dump
+
+
+def test_allowed_ips_continue_in_next_message():
+    # The kernel repeats a peer in the next message with the rest of its allowed ips
+    dump = make_dump(0)
+    dump['wg0'][1].extend([
+        make_peer(0, allowed_ips=['10.0.0.2/32', '10.0.0.3/32']),
+        make_peer(0, allowed_ips=['10.0.0.4/32']),
+        make_peer(1),
+    ])
+    socket_factory = partial(type('OnePeerSocket', (FakeNetlinkSocket,), {'MAX_PEERS_PER_MESSAGE': 1}), dump)
+    device, peers = WGNetlink(socket_factory).device('wg0')
+    assert device == dump['wg0'][0]
+    assert [peer.allowed_ips for peer in peers] == [['10.0.0.2/32', '10.0.0.3/32', '10.0.0.4/32'],
+                                                    make_peer(1).allowed_ips]
+
+
+def test_missing_interface():
+    with pytest.raises(NetlinkError) as ex_info:
+        make_netlink(make_dump(1)).device('wg7')
+
+    assert ex_info.value.err_code == errno.ENODEV
+
+
+def test_running_dump_of_missing_interface(monkeypatch):
+    netlink = make_netlink(make_dump(1))
+    monkeypatch.setattr(WGRunning, '_netlink', netlink)
+    assert asyncio.run(WGRunning._read_netlink_dump('wg7')) == {}
+    # ENODEV is an answer, netlink is still used afterwards
+    assert WGRunning._netlink is netlink
+
+
+def failing_netlink(err_code: int) -> WGNetlink:
+    def socket_factory(protocol):
+        raise OSError(err_code, 'failed')
+
+    return WGNetlink(socket_factory)
+
+
+@pytest.mark.parametrize('err_code', [errno.EAGAIN, errno.EINTR, errno.ENOBUFS])
+def test_transient_error_falls_back_once(monkeypatch, err_code):
+    netlink = failing_netlink(err_code)
+    monkeypatch.setattr(WGRunning, '_netlink', netlink)
+    assert asyncio.run(WGRunning._read_netlink_dump()) is None
+    assert WGRunning._netlink is netlink
+
+
+@pytest.mark.parametrize('err_code', [errno.EPERM, errno.EPROTONOSUPPORT])
+def test_unavailable_netlink_is_disabled(monkeypatch, err_code):
+    monkeypatch.setattr(WGRunning, '_netlink', failing_netlink(err_code))
+    assert asyncio.run(WGRunning._read_netlink_dump()) is None
+    assert WGRunning._netlink is None
+
+
+def test_missing_family_disables_netlink(monkeypatch):
+    class NoFamilySocket(FakeNetlinkSocket):
+
+        def send(self, data: bytes) -> int:
+            seq = struct.unpack_from('=IHHII', data)[3]
+            self._responses.append(self._pack_error(seq, errno.ENOENT))
+            return len(data)
+
+    monkeypatch.setattr(WGRunning, '_netlink', WGNetlink(partial(NoFamilySocket, make_dump(1))))
+    assert asyncio.run(WGRunning._read_netlink_dump('wg0')) is None
+    assert WGRunning._netlink is None
@@ -0,0 +1,134 @@
+import asyncio
+import pytest
+from wg_api.models import WGInterface, WGPeer, WGPeerAction, WGPeerOperation
+from wg_api.repositories import wg_running
+from wg_api.repositories.wg_firewall import WGFirewall
+from wg_api.repositories.wg_running import WGRunning
+from wg_api.utils.exceptions import ShellError
+from wg_api.utils.wg_netlink import WGDeviceInfo
+from tests.helpers import make_dump, make_netlink, make_peer, make_key
+
+
+@pytest.fixture
+def running(monkeypatch):
+    calls = []
+
+    async def shell_exec(cmd, *input_args):
+        calls.append((cmd, input_args))
+        return ''
+
+    dump = make_dump(600)
+    monkeypatch.setattr(WGRunning, '_netlink', make_netlink(dump))
+    monkeypatch.setattr(wg_running, 'shell_exec', shell_exec)
+    return dump, calls
+
+
+def to_model(peer) -> WGPeer:
+    return WGPeer(public_key=peer.public_key, allowed_ips=peer.allowed_ips,
+                  keepalive=peer.keepalive, end_point=peer.end_point, preshared_key=peer.preshared_key)
+
+
+def make_interface(device: WGDeviceInfo, peers, **kwargs) -> WGInterface:
+    values = dict(private_key=device.private_key, listen_port=device.listen_port, peers=peers)
+    values.update(kwargs)
+    return WGInterface.construct(**values)
+
+
+def test_unchanged_peer():
+    peer = make_peer(0, keepalive=25, end_point='192.168.1.10:51820')
+    assert WGRunning._peer_changes(to_model(peer), peer) == []
+    # Without an endpoint in the config the one learned by the kernel is kept
+    assert WGRunning._peer_changes(to_model(peer._replace(end_point=None)), peer) == []
+
+
+def test_changed_peer():
+    peer = make_peer(0)
+    changed = to_model(peer._replace(keepalive=25, allowed_ips=['10.0.0.9/32'], end_point='192.168.1.10:51820'))
+    assert WGRunning._peer_changes(changed, peer) == ['end_point', 'keepalive', 'allowed_ips']
+    assert WGRunning._is_peer_changed(changed, None)
+
+
+def test_allowed_ips_compared_as_networks():
+    peer = make_peer(0, allowed_ips=['10.1.0.0/24', '10.0.0.2/32'])
+    saved = WGPeer.construct(public_key=peer.public_key, allowed_ips=['10.0.0.2/32', '10.1.0.1/24'],
+                             keepalive=None, end_point=None, preshared_key=None)
+    assert WGRunning._peer_changes(saved, peer) == []
+
+
+def test_listen_port_only_when_configured():
+    device = make_dump(0)['wg0'][0]
+    assert WGRunning._interface_args(make_interface(device, [], listen_port=None), device) == ('', [])
+    assert WGRunning._interface_args(make_interface(device, [], listen_port=51821), device) == \
+        (' listen-port 51821', [])
+
+
+def test_set_interface_changes_only_differences(running):
+    dump, calls = running
+    device, peers = dump['wg0']
+    new_peers = [to_model(peer) for peer in peers[:-1]]
+    new_peers[0] = to_model(peers[0]._replace(keepalive=25))
+    new_peers.append(to_model(make_peer(1000)))
+
+    changes = asyncio.run(WGRunning.set_interface('wg0', make_interface(device, new_peers)))
+    assert changes == 3
+    assert len(calls) == 1
+    cmd, _ = calls[0]
+    assert cmd.startswith("wg set 'wg0' peer")
+    assert f"peer '{peers[0].public_key}'" in cmd
+    assert f"peer '{make_peer(1000).public_key}'" in cmd
+    assert f"peer '{peers[-1].public_key}' remove" in cmd
+
+
+def test_set_interface_in_batches(running):
+    dump, calls = running
+    device, peers = dump['wg0']
+    new_peers = [to_model(peer._replace(keepalive=25)) for peer in peers]
+    changes = asyncio.run(WGRunning.set_interface('wg0', make_interface(device, new_peers, listen_port=51900)))
+
+    assert changes == len(peers)
+    assert len(calls) == 3
+    assert [cmd.count(' peer ') for cmd, _ in calls] == [256, 256, 88]
+    # The interface options go with the first batch only
+    assert ' listen-port 51900' in calls[0][0]
+    assert all('listen-port' not in cmd for cmd, _ in calls[1:])
+
+
+def test_set_interface_without_changes(running):
+    dump, calls = running
+    device, peers = dump['wg0']
+    interface = make_interface(device, [to_model(peer) for peer in peers])
+    assert asyncio.run(WGRunning.set_interface('wg0', interface)) == 0
+    assert calls == []
+
+
+def test_private_key_goes_to_input(running):
+    dump, calls = running
+    device, peers = dump['wg0']
+    interface = make_interface(device, [to_model(peer) for peer in peers], private_key=make_key(7))
+    asyncio.run(WGRunning.set_interface('wg0', interface))
+    cmd, input_args = calls[0]
+    assert make_key(7) not in cmd
+    assert input_args == (make_key(7),)
+
+
+def test_apply_peers_fails_only_failed_batch(running, monkeypatch):
+    dump, calls = running
+    _, peers = dump['wg0']
+
+    async def shell_exec(cmd, *input_args):
+        calls.append((cmd, input_args))
+        if len(calls) == 2:
+            raise ShellError(cmd, 'failed', 1)
+
+        return ''
+
+    async def update_disabled_ips(cls, disable_ips=(), enable_ips=()):
+        pass
+
+    monkeypatch.setattr(wg_running, 'shell_exec', shell_exec)
+    monkeypatch.setattr(WGFirewall, 'update_disabled_ips', classmethod(update_disabled_ips))
+    operations = [WGPeerOperation(action=WGPeerAction.REMOVE, public_key=peer.public_key) for peer in peers]
+    results = asyncio.run(WGRunning.apply_peers('wg0', operations))
+
+    assert len(calls) == 3
+    assert [result.success for result in results] == [True] * 256 + [False] * 256 + [True] * 88
@@ -1,4 +1,3 @@
 from .client_app import client_app
-from .engine import metadata, engine
-
-metadata.create_all(bind=engine)
+from .engine import metadata, database, \
+    connect_database, disconnect_database
@@ -1,8 +1,24 @@
-from sqlalchemy import MetaData, create_engine
-from databases import Database
+from pathlib import Path
+from sqlalchemy import MetaData
+from sqlalchemy.schema import CreateTable
+from wg_api.utils import config
+from wg_api.db.pool import PooledDatabase
 
-DB_PATH = 'sqlite:///db/wg_server.db'
+DB_PATH = f'sqlite:///{Path(__file__).parent / "wg_server.db"}'
 
-database = Database(DB_PATH)
-engine = create_engine(DB_PATH, echo=True)
+database = PooledDatabase(DB_PATH, pool_size=config.DB_POOL_SIZE, pragmas=config.DB_PRAGMAS)
 metadata = MetaData()
+
+
+async def create_schema():
+    for table in metadata.sorted_tables:
+        await database.execute(CreateTable(table, if_not_exists=True))
+
+
+async def connect_database():
+    await database.connect()
+    await create_schema()
+
+
+async def disconnect_database():
+    await database.disconnect()
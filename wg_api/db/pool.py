@@ -0,0 +1,96 @@
+import asyncio
+import typing
+import aiosqlite
+from databases import Database
+from databases.core import DatabaseURL
+from databases.backends.sqlite import SQLiteBackend, SQLitePool
+
+
+class PooledSQLitePool(SQLitePool):
+
+    size: int = None
+    pragmas: typing.Dict[str, typing.Any] = None
+
+    _idle: typing.List[aiosqlite.Connection] = None
+    _connections: typing.Set[aiosqlite.Connection] = None
+    _semaphore: typing.Optional[asyncio.Semaphore] = None
+
+    def __init__(self, url: DatabaseURL, size: int, pragmas: typing.Dict[str, typing.Any], **options):
+        super().__init__(url, **options)
+        self.size = size
+        self.pragmas = pragmas
+        self._idle = []
+        self._connections = set()
+
+    async def _open(self) -> aiosqlite.Connection:
+        connection = aiosqlite.connect(database=self._database, isolation_level=None, **self._options)
+        await connection.__aenter__()
+        for name, value in self.pragmas.items():
+            await connection.execute(f'PRAGMA {name} = {value}')
+
+        self._connections.add(connection)
+        return connection
+
+    async def open(self):
+        self._semaphore = asyncio.Semaphore(self.size)
+        # Opening one connection up front applies the persistent pragmas
+        # (journal_mode) and fails early when the file is not accessible
+        if not self._idle:
+            self._idle.append(await self._open())
+
+    async def close(self):
+        # Checked out connections are closed too, their holders get errors
+        # instead of the worker threads keeping the process alive
+        connections, self._connections = self._connections, set()
+        self._idle = []
+        self._semaphore = None
+        for connection in connections:
+            await connection.close()
+
+    async def acquire(self) -> aiosqlite.Connection:
+        if self._semaphore is None:
+            await self.open()
+
+        await self._semaphore.acquire()
+        try:
+            return self._idle.pop() if self._idle else await self._open()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def release(self, connection: aiosqlite.Connection):
+        if connection not in self._connections:
+            # Closed with the pool while it was checked out
+            return
+
+        self._semaphore.release()
+        if connection.in_transaction:
+            # Never hand out a connection with a half finished transaction
+            self._connections.discard(connection)
+            await connection.close()
+            return
+
+        self._idle.append(connection)
+
+
+class PooledSQLiteBackend(SQLiteBackend):
+
+    def __init__(self, database_url: typing.Union[DatabaseURL, str],
+                 pool_size: int = 4, pragmas: typing.Dict[str, typing.Any] = None, **options):
+        super().__init__(database_url, **options)
+        self._pool = PooledSQLitePool(self._database_url, pool_size, pragmas or {}, **options)
+
+    async def connect(self):
+        await self._pool.open()
+
+    async def disconnect(self):
+        await super().disconnect()
+        await self._pool.close()
+
+
+class PooledDatabase(Database):
+
+    SUPPORTED_BACKENDS = {
+        **Database.SUPPORTED_BACKENDS,
+        'sqlite': 'wg_api.db.pool:PooledSQLiteBackend',
+    }
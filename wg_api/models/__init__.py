@@ -1,3 +1,5 @@
 from .wg_peer import *
 from .wg_interface import *
 from .wg_client_app import *
+from .wg_records import *
+from .wg_drift import *
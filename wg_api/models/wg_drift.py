@@ -0,0 +1,45 @@
+from enum import Enum
+from typing import List, Optional
+from pydantic import BaseModel, root_validator
+
+
+class WGSyncDirection(str, Enum):
+
+    TO_RUNNING = 'to_running'
+    TO_CONFIG = 'to_config'
+
+
+class WGPeerDrift(BaseModel):
+
+    public_key: str
+    fields: List[str]
+
+
+class WGInterfaceDrift(BaseModel):
+
+    name: str
+    running: bool
+    # Relative to the config: peers missing from the running interface and extra in it
+    interface: List[str] = []
+    missing_peers: List[str] = []
+    extra_peers: List[str] = []
+    changed_peers: List[WGPeerDrift] = []
+    in_sync: bool = True
+
+    @root_validator(skip_on_failure=True)
+    def validate_in_sync(cls, values: dict) -> dict:
+        values['in_sync'] = values['running'] and not (
+            values['interface'] or values['missing_peers'] or values['extra_peers'] or values['changed_peers']
+        )
+        return values
+
+
+class WGReconcileResult(BaseModel):
+
+    name: str
+    direction: Optional[WGSyncDirection]
+    dry_run: bool
+    in_sync: bool
+    changes: int = 0
+    error: Optional[str]
+    drift: WGInterfaceDrift
@@ -1,7 +1,7 @@
 from typing import List, Optional
 from pydantic import BaseModel, validator
 from ipaddress import IPv4Address, IPv4Interface
-from wg_api.models.wg_peer import WGPeer
+from wg_api.models.wg_peer import WGPeer, WGRunningPeer
 
 
 class WGInterface(BaseModel):
@@ -26,3 +26,16 @@ class WGInterface(BaseModel):
 
     class Config:
         validate_assignment = True
+
+
+class WGConfigInterface(WGInterface):
+
+    pass
+
+
+class WGRunningInterface(WGInterface):
+
+    private_key: Optional[str]
+    public_key: Optional[str]
+    address: List[IPv4Interface] = []
+    peers: List[WGRunningPeer] = []
@@ -1,7 +1,8 @@
-from typing import List, Optional
+from enum import Enum
+from typing import Any, Dict, List, Optional
 from ipaddress import IPv4Interface, IPv4Address, \
     AddressValueError
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, validator, root_validator
 
 
 class WGPeer(BaseModel):
@@ -49,3 +50,60 @@ class WGPeer(BaseModel):
 
     class Config:
         validate_assignment = True
+
+
+class WGRunningPeer(WGPeer):
+
+    latest_handshake: Optional[int]
+    transfer_rx: Optional[int]
+    transfer_tx: Optional[int]
+    connected: bool = False
+    disabled: bool = False
+
+
+class WGPeerPage(BaseModel):
+
+    peers: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+    total: int
+
+
+class WGPeerAction(str, Enum):
+
+    ADD = 'add'
+    UPDATE = 'update'
+    REMOVE = 'remove'
+    DISABLE = 'disable'
+    ENABLE = 'enable'
+
+
+class WGPeerOperation(BaseModel):
+
+    action: WGPeerAction
+    public_key: Optional[str]
+    peer: Optional[WGPeer]
+
+    @root_validator(skip_on_failure=True)
+    def validate_operation(cls, values: dict) -> dict:
+        action, peer = values.get('action'), values.get('peer')
+        if action in (WGPeerAction.ADD, WGPeerAction.UPDATE):
+            if peer is None:
+                raise ValueError(f'peer is required for the "{action.value}" action')
+
+            if values.get('public_key') not in (None, peer.public_key):
+                raise ValueError('public_key does not match the peer public key')
+
+            values['public_key'] = peer.public_key
+
+        if not values.get('public_key'):
+            raise ValueError('public_key is required')
+
+        return values
+
+
+class WGPeerOperationResult(BaseModel):
+
+    action: WGPeerAction
+    public_key: str
+    success: bool = True
+    error: Optional[str]
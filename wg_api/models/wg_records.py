@@ -0,0 +1,170 @@
+from ipaddress import IPv4Address, IPv4Interface
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+from wg_api.models.wg_interface import WGInterface
+from wg_api.models.wg_peer import WGPeer
+
+
+# Compact trusted forms of the models for internal processing: no validation,
+# addresses are kept as strings and converted only when a model is required
+
+
+def _strings(values: Optional[Iterable[Any]]) -> Optional[Tuple[str, ...]]:
+    return None if values is None else tuple(map(str, values))
+
+
+def _list(values: Optional[Tuple[str, ...]]) -> Optional[List[str]]:
+    return None if values is None else list(values)
+
+
+class WGPeerRecord:
+
+    __slots__ = ('public_key', 'keepalive', 'end_point', 'preshared_key', 'allowed_ips')
+
+    def __init__(self, public_key: str, keepalive: Optional[int] = None, end_point: Optional[str] = None,
+                 preshared_key: Optional[str] = None, allowed_ips: Optional[Tuple[str, ...]] = None):
+        self.public_key = public_key
+        self.keepalive = keepalive
+        self.end_point = end_point
+        self.preshared_key = preshared_key
+        self.allowed_ips = allowed_ips
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, WGPeerRecord):
+            return NotImplemented
+
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f'WGPeerRecord(public_key={self.public_key!r}, allowed_ips={self.allowed_ips!r})'
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> 'WGPeerRecord':
+        return cls(
+            data['public_key'], data.get('keepalive'), data.get('end_point'),
+            data.get('preshared_key'), _strings(data.get('allowed_ips')),
+        )
+
+    @classmethod
+    def from_model(cls, peer: WGPeer) -> 'WGPeerRecord':
+        return cls(peer.public_key, peer.keepalive, peer.end_point, peer.preshared_key, _strings(peer.allowed_ips))
+
+    def to_model(self, model_cls: Type[WGPeer] = WGPeer) -> WGPeer:
+        return model_cls.construct(
+            public_key=self.public_key,
+            keepalive=self.keepalive,
+            end_point=self.end_point,
+            preshared_key=self.preshared_key,
+            allowed_ips=None if self.allowed_ips is None else list(map(IPv4Interface, self.allowed_ips)),
+        )
+
+    def dict(self) -> Dict[str, Any]:
+        return {
+            'public_key': self.public_key,
+            'keepalive': self.keepalive,
+            'end_point': self.end_point,
+            'preshared_key': self.preshared_key,
+            'allowed_ips': _list(self.allowed_ips),
+        }
+
+
+class WGInterfaceRecord:
+
+    __slots__ = ('private_key', 'address', 'mtu', 'table', 'fw_mark', 'save_conf', 'listen_port',
+                 'pre_up', 'post_up', 'pre_down', 'post_down', 'dns', 'peers')
+
+    _ARRAYS = ('pre_up', 'post_up', 'pre_down', 'post_down')
+
+    def __init__(self, private_key: str, address: Tuple[str, ...] = (), mtu: Optional[int] = None,
+                 table: Optional[str] = None, fw_mark: Optional[str] = None, save_conf: Optional[bool] = None,
+                 listen_port: Optional[int] = None, pre_up: Optional[Tuple[str, ...]] = None,
+                 post_up: Optional[Tuple[str, ...]] = None, pre_down: Optional[Tuple[str, ...]] = None,
+                 post_down: Optional[Tuple[str, ...]] = None, dns: Optional[Tuple[str, ...]] = None,
+                 peers: List[WGPeerRecord] = None):
+        self.private_key = private_key
+        self.address = address
+        self.mtu = mtu
+        self.table = table
+        self.fw_mark = fw_mark
+        self.save_conf = save_conf
+        self.listen_port = listen_port
+        self.pre_up = pre_up
+        self.post_up = post_up
+        self.pre_down = pre_down
+        self.post_down = post_down
+        self.dns = dns
+        self.peers = [] if peers is None else peers
+
+    @classmethod
+    def from_data(cls, interface_data: Dict[str, Any], peers_data: List[Dict[str, Any]]) -> 'WGInterfaceRecord':
+        return cls(
+            interface_data['private_key'],
+            _strings(interface_data.get('address')) or (),
+            interface_data.get('mtu'),
+            interface_data.get('table'),
+            interface_data.get('fw_mark'),
+            interface_data.get('save_conf'),
+            interface_data.get('listen_port'),
+            *(_strings(interface_data.get(name)) for name in cls._ARRAYS),
+            _strings(interface_data.get('dns')),
+            [WGPeerRecord.from_data(peer_data) for peer_data in peers_data if peer_data],
+        )
+
+    @classmethod
+    def from_model(cls, interface: WGInterface) -> 'WGInterfaceRecord':
+        return cls(
+            interface.private_key,
+            _strings(interface.address) or (),
+            interface.mtu,
+            interface.table,
+            interface.fw_mark,
+            interface.save_conf,
+            interface.listen_port,
+            *(_strings(getattr(interface, name)) for name in cls._ARRAYS),
+            _strings(interface.dns),
+            list(map(WGPeerRecord.from_model, interface.peers)),
+        )
+
+    def copy(self) -> 'WGInterfaceRecord':
+        # Peer records are replaced and never changed in place,
+        # so a copy only needs its own peers list
+        record = WGInterfaceRecord.__new__(WGInterfaceRecord)
+        for name in self.__slots__:
+            setattr(record, name, getattr(self, name))
+
+        record.peers = list(self.peers)
+        return record
+
+    def to_model(self, model_cls: Type[WGInterface] = WGInterface) -> WGInterface:
+        return model_cls.construct(
+            private_key=self.private_key,
+            address=list(map(IPv4Interface, self.address)),
+            mtu=self.mtu,
+            table=self.table,
+            fw_mark=self.fw_mark,
+            save_conf=self.save_conf,
+            listen_port=self.listen_port,
+            pre_up=_list(self.pre_up),
+            post_up=_list(self.post_up),
+            pre_down=_list(self.pre_down),
+            post_down=_list(self.post_down),
+            dns=None if self.dns is None else list(map(IPv4Address, self.dns)),
+            peers=[peer.to_model() for peer in self.peers],
+        )
+
+    def dict(self) -> Dict[str, Any]:
+        # The JSON-ready form, the same as the encoded model
+        return {
+            'private_key': self.private_key,
+            'address': list(self.address),
+            'mtu': self.mtu,
+            'table': self.table,
+            'fw_mark': self.fw_mark,
+            'save_conf': self.save_conf,
+            'listen_port': self.listen_port,
+            'pre_up': _list(self.pre_up),
+            'post_up': _list(self.post_up),
+            'pre_down': _list(self.pre_down),
+            'post_down': _list(self.post_down),
+            'dns': _list(self.dns),
+            'peers': [peer.dict() for peer in self.peers],
+        }
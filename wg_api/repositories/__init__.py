@@ -1,4 +1,7 @@
-# from .wg_configs import WGConfigs
-# from .wg_running import WGRunning
-# from .wg_firewall import WGFirewall
-# from .wg_clients import WGClients
+from .wg_configs import WGConfigs
+from .wg_running import WGRunning
+from .wg_firewall import WGFirewall
+from .wg_clients import WGClients
+from .wg_history import WGHistory
+from .wg_events import WGEvents
+from .wg_drift import WGDrift
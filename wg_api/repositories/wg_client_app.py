@@ -1,3 +1,5 @@
+from datetime import datetime
+from typing import Dict, Optional
 from databases import Database
 from wg_api.db import client_app
 from wg_api.models import WGClientAppDB
@@ -12,19 +14,34 @@ class WGClientApp:
 
     async def get(self, app_key: str):
         qwery = client_app.select().where(client_app.c.app_key == app_key)
-        print(app_key)
         return await self._db.fetch_one(qwery)
 
     async def crate(self, app: WGClientAppDB):
         qwery = client_app.insert().values(**app.dict())
         await self._db.execute(qwery)
 
-import asyncio
-from wg_api.db.engine import database
-
-async def create_app():
-    apps = WGClientApp(database)
-    #await apps.crate(WGClientAppDB(id=12, app_key='123', app_name='123', hashed_password='123123234565235'))
-    print(await apps.get('123'))
-
-asyncio.run(create_app())
\ No newline at end of file
+    async def set_password(self, app_key: str, hashed_password: str, app_name: Optional[str] = None) -> bool:
+        # Creates the application or replaces the secret of an existing one
+        async with self._db.transaction():
+            if await self.get(app_key) is None:
+                qwery = client_app.insert().values(app_key=app_key, app_name=app_name or app_key,
+                                                   hashed_password=hashed_password, create_dt=datetime.utcnow())
+                await self._db.execute(qwery)
+                return True
+
+            values = {'hashed_password': hashed_password}
+            if app_name:
+                values['app_name'] = app_name
+
+            qwery = client_app.update().where(client_app.c.app_key == app_key).values(**values)
+            await self._db.execute(qwery)
+            return False
+
+    async def update_auth_dts(self, auth_dts: Dict[str, datetime]):
+        if not auth_dts:
+            return
+
+        async with self._db.transaction():
+            for app_key, auth_dt in auth_dts.items():
+                qwery = client_app.update().where(client_app.c.app_key == app_key).values(auth_dt=auth_dt)
+                await self._db.execute(qwery)
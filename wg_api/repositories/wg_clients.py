@@ -1,8 +1,9 @@
-from typing import Tuple
-from ipaddress import IPv4Address, IPv4Interface
+from typing import Dict, List, Tuple
+from ipaddress import IPv4Interface
 from wg_api.utils import config
 from wg_api.models import WGPeer, WGInterface, WGConfigInterface
-from wg_api.utils.wg_utils import get_private_key, get_public_key
+from wg_api.utils.address_allocator import AddressAllocator
+from wg_api.utils.wg_utils import key_pool, get_public_key
 
 
 class WGClients:
@@ -11,37 +12,78 @@ class WGClients:
     MTU = '1420'
     KEEAPALIVE = '20'
 
-    @staticmethod
-    def _is_address_reserved(peer: WGPeer, addr: IPv4Address):
-        if not peer.allowed_ips:
-            return False
+    # Allocators are per interface, an address freed in a config may still
+    # be used by the running interface and the other way round
+    _allocators: Dict[Tuple[str, IPv4Interface], AddressAllocator] = {}
 
-        for peer_ip in peer.allowed_ips:
-            if addr in peer_ip.network:
-                return True
+    @classmethod
+    def _get_allocator(cls, owner: str, addr: IPv4Interface, peers: List[WGPeer]) -> AddressAllocator:
+        allocator = cls._allocators.get((owner, addr))
+        if allocator is None:
+            allocator = AddressAllocator(addr.network, config.CLIENTS_RESERVED_ADDRESSES)
+            allocator.reserve_range(addr.network.network_address, addr.ip)
+            cls._allocators[(owner, addr)] = allocator
+
+        # Networks of the removed peers are released and the current ones reserved
+        # again, addresses handed out for peers not saved yet are left as they are
+        networks = frozenset(peer_ip.network for peer in peers for peer_ip in peer.allowed_ips or [])
+        synced_networks = allocator.synced_networks or frozenset()
+        if synced_networks != networks:
+            for network in synced_networks - networks:
+                allocator.release(network)
+
+            for network in networks:
+                allocator.reserve(network)
+
+            allocator.synced_networks = networks
 
-        return False
+        return allocator
 
     @classmethod
-    def _get_client_address(cls, interface: WGInterface) -> IPv4Interface:
+    def _get_client_address(cls, owner: str, interface: WGInterface) -> IPv4Interface:
         for addr in interface.address:
-            for host in addr.network:
-                if host <= addr.ip:
-                    continue
-
-                for peer in interface.peers:
-                    if cls._is_address_reserved(peer, host):
-                        break
-                else:
-                    return IPv4Interface(host)
+            try:
+                return IPv4Interface(cls._get_allocator(owner, addr, interface.peers).allocate())
+            except RuntimeError:
+                continue
 
         raise RuntimeError('All addresses are reserved')
 
     @classmethod
-    async def create_client(cls, interface: WGInterface) -> Tuple[WGPeer, WGConfigInterface]:
-        client_address = cls._get_client_address(interface)
+    def _release_address(cls, owner: str, address: IPv4Interface):
+        for (allocator_owner, _), allocator in cls._allocators.items():
+            if allocator_owner == owner:
+                allocator.release(address.ip)
+
+    @classmethod
+    def release_client_address(cls, owner: str, peer: WGPeer):
+        for peer_ip in peer.allowed_ips or []:
+            if peer_ip.network.prefixlen == peer_ip.max_prefixlen:
+                cls._release_address(owner, peer_ip)
+
+    @classmethod
+    def running_owner(cls, name: str) -> str:
+        return f'running:{name}'
+
+    @classmethod
+    def config_owner(cls, name: str) -> str:
+        return f'config:{name}'
+
+    @classmethod
+    async def create_client(cls, owner: str, interface: WGInterface) -> Tuple[WGPeer, WGConfigInterface]:
+        client_address = cls._get_client_address(owner, interface)
+        try:
+            return await cls._make_client(interface, client_address)
+        except BaseException:
+            cls._release_address(owner, client_address)
+            raise
+
+    @classmethod
+    async def _make_client(cls, interface: WGInterface,
+                           client_address: IPv4Interface) -> Tuple[WGPeer, WGConfigInterface]:
+        private_key, public_key = await key_pool.get()
         client_interface = WGConfigInterface(
-            private_key=await get_private_key(),
+            private_key=private_key,
             address=[client_address],
             dns=cls.DNS,
             mtu=cls.MTU,
@@ -53,7 +95,7 @@ class WGClients:
             )]
         )
         client_peer = WGPeer(
-            public_key=await get_public_key(client_interface.private_key),
+            public_key=public_key,
             allowed_ips=[client_address],
         )
         return client_peer, client_interface
@@ -1,13 +1,35 @@
+import os
 import re
+import stat
 import asyncio
+import tempfile
 import aiofiles
+from copy import copy
+from functools import partial
+from contextlib import suppress
 from pathlib import Path
-from typing import List, Dict, Optional
+from concurrent.futures import Executor, ThreadPoolExecutor, \
+    ProcessPoolExecutor
+from typing import Any, Callable, Iterable, List, Dict, Optional, Tuple, Union
+from ipaddress import IPv4Address, IPv4Interface
 from wg_api.models.wg_interface import WGInterface, WGPeer
+from wg_api.models.wg_records import WGInterfaceRecord, WGPeerRecord
+from wg_api.models.wg_peer import WGPeerAction, WGPeerOperation, \
+    WGPeerOperationResult
+from wg_api.utils import config
+from wg_api.utils.wg_utils import check_interface_name, allowed_networks
+from wg_api.utils.peer_index import PeerIndex
+from wg_api.utils.wg_netlink import WGDeviceInfo, WGPeerInfo
+from wg_api.utils.peer_query import PeerQuery
+from wg_api.utils.etag import make_etag
+from wg_api.utils.exceptions import NotFoundInterface, BaseInterfaceException
+from wg_api.utils.tracing import span
 
 
 OPTION_CONF_KEY = '__option_key__'
 
+Interface = Union[WGInterface, WGInterfaceRecord]
+
 
 def option(opt_key):
     def wrapper(func):
@@ -34,6 +56,7 @@ class ConfigParser:
     _interface_config: str = None
 
     _options: Dict = None
+    _readers: Dict[str, Dict[str, Callable]] = None
     _new_section: bool = None
 
     _SECTION_R = re.compile(r'^\[(?P<section>.+)\]$')
@@ -44,11 +67,24 @@ class ConfigParser:
 
     def __init__(self):
         self._options = self.get_options()
+        self._readers = self.get_readers()
 
     @classmethod
     def get_options(cls):
         return extract_options(cls.__dict__)
 
+    @classmethod
+    def get_readers(cls) -> Dict[str, Dict[str, Callable]]:
+        readers = {}
+        for opt_key, option_func in cls.get_options().items():
+            if not option_func.__name__.startswith('_read_option'):
+                continue
+
+            sect_name, _, opt_name = opt_key.partition(':')
+            readers.setdefault(sect_name, {})[opt_name] = option_func
+
+        return readers
+
     def _init_option(self, sect_name, opt_key, opt_val):
         option_func = self._options.get(f'{sect_name}:{opt_key}')
         if option_func is None:
@@ -315,7 +351,7 @@ class ConfigParser:
 
     @property
     def _add_peer_data(self) -> dict:
-        if not self._peers_data and self._new_section:
+        if not self._peers_data or self._new_section:
             self._peers_data.append({})
 
         self._new_section = False
@@ -337,9 +373,110 @@ class ConfigParser:
         self._new_section = False
         self._interface_config += f'\n{opt_key} = {opt_val}'
 
-    async def load(self, path: Path) -> Optional[WGInterface]:
+    def _make_interface(self, trusted: bool) -> Optional[WGInterface]:
+        with span('model.config_interface'):
+            return self._build_interface(trusted)
+
+    def _make_record(self, trusted: bool) -> Optional[WGInterfaceRecord]:
+        # Trusted configs skip the models entirely, the others are validated first
+        if not trusted:
+            interface = self._make_interface(False)
+            return interface and WGInterfaceRecord.from_model(interface)
+
+        if not self._interface_data:
+            return None
+
+        with span('record.config_interface'):
+            return WGInterfaceRecord.from_data(self._interface_data, self._peers_data)
+
+    def _make(self, trusted: bool, as_record: bool) -> Optional[Interface]:
+        return self._make_record(trusted) if as_record else self._make_interface(trusted)
+
+    def _build_interface(self, trusted: bool) -> Optional[WGInterface]:
+        if not self._interface_data:
+            return None
+
+        if trusted:
+            return self._construct_interface(self._interface_data, self._peers_data)
+
+        interface = WGInterface.parse_obj(self._interface_data)
+        for peer_data in self._peers_data:
+            if not peer_data:
+                continue
+
+            interface.peers.append(WGPeer.parse_obj(peer_data))
+
+        return interface
+
+    @staticmethod
+    def _construct_interface(interface_data: Dict, peers_data: List[Dict]) -> WGInterface:
+        interface_data = dict(interface_data)
+        interface_data['address'] = list(map(IPv4Interface, interface_data.get('address') or []))
+        if dns := interface_data.get('dns'):
+            interface_data['dns'] = list(map(IPv4Address, dns))
+
+        peers = []
+        for peer_data in peers_data:
+            if not peer_data:
+                continue
+
+            if allowed_ips := peer_data.get('allowed_ips'):
+                peer_data = dict(peer_data, allowed_ips=list(map(IPv4Interface, allowed_ips)))
+
+            peers.append(WGPeer.construct(**peer_data))
+
+        return WGInterface.construct(**interface_data, peers=peers)
+
+    def _local(self) -> 'ConfigParser':
+        # The parsing state lives in the attributes, so every parse works on
+        # its own shallow copy sharing the option tables with this instance
+        parser = copy(self)
+        parser._reset_local_data()
+        return parser
+
+    def loads(self, config: str, trusted: bool = False, as_record: bool = False) -> Optional[Interface]:
+        return self._local()._loads(config, trusted, as_record)
+
+    def _loads(self, config: str, trusted: bool, as_record: bool) -> Optional[Interface]:
+        section_readers = None
+        for line in config.splitlines():
+            line = line.strip()
+            if not line or line[0] == '#':
+                continue
+
+            if line[0] == '[' and line[-1] == ']' and len(line) > 2:
+                self._new_section = True
+                section_readers = self._readers.get(line[1:-1], {})
+                continue
+
+            if section_readers is None:
+                continue
+
+            opt_name, sep, opt_val = line.partition('=')
+            opt_name, opt_val = opt_name.rstrip(), opt_val.lstrip()
+            if not (sep and opt_name and opt_val):
+                continue
+
+            if reader := section_readers.get(opt_name):
+                reader(self, opt_val)
+
+        return self._make(trusted, as_record)
+
+    async def load(self, path: Path, trusted: bool = False, bulk: bool = True,
+                   as_record: bool = False) -> Optional[Interface]:
+        if not bulk:
+            return await self._local()._load_lines(path, trusted, as_record)
+
+        with span('config.read'):
+            async with aiofiles.open(path, 'r') as file:
+                config_str = await file.read()
+
+        loop = asyncio.get_event_loop()
+        with span('config.parse'):
+            return await loop.run_in_executor(get_parse_executor(), self.loads, config_str, trusted, as_record)
+
+    async def _load_lines(self, path: Path, trusted: bool, as_record: bool) -> Optional[Interface]:
         curr_section = None
-        self._reset_local_data()
         async with aiofiles.open(path, 'r') as file:
             async for line in file:
                 line = str(line).strip()
@@ -364,20 +501,13 @@ class ConfigParser:
 
                     self._init_option(curr_section, opt_name, opt_val)
 
-        if not self._interface_data:
-            return None
-
-        interface = WGInterface.parse_obj(self._interface_data)
-        for peer_data in self._peers_data:
-            if not peer_data:
-                continue
+        return self._make(trusted, as_record)
 
-            interface.peers.append(WGPeer.parse_obj(peer_data))
-
-        return interface
+    def dumps(self, interface: Interface) -> Optional[str]:
+        with span('config.dumps'):
+            return self._local()._dumps(interface)
 
-    def dumps(self, interface: WGInterface) -> Optional[str]:
-        self._reset_local_data()
+    def _dumps(self, interface: Interface) -> Optional[str]:
         if not interface:
             return None
 
@@ -399,13 +529,145 @@ class ConfigParser:
 
         return self._interface_config
 
-    async def dump(self, path: Path, interface: WGInterface):
+    async def dump(self, path: Path, interface: Interface):
         config = self.dumps(interface)
         if not config:
             raise ValueError('Failed to save the interface')
 
-        async with aiofiles.open(path, 'w+') as file:
-            await file.write(config)
+        loop = asyncio.get_event_loop()
+        with span('config.write'):
+            await loop.run_in_executor(None, self._write_atomic, Path(path), config)
+
+    @staticmethod
+    def _write_atomic(path: Path, config_str: str):
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o600
+
+        # A crash must leave either the old or the new config, never a
+        # truncated one, so the data is synced before it replaces the file
+        fd, tmp_path = tempfile.mkstemp(prefix=f'.{path.name}.', dir=path.parent)
+        try:
+            with os.fdopen(fd, 'w') as file:
+                file.write(config_str)
+                file.flush()
+                os.fchmod(file.fileno(), mode)
+                os.fsync(file.fileno())
+
+            os.replace(tmp_path, path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+
+            raise
+
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+_parse_executor: Optional[Executor] = None
+
+
+def get_parse_executor() -> Executor:
+    global _parse_executor
+    if _parse_executor is None:
+        executor_cls = ProcessPoolExecutor if config.PARSE_IN_PROCESSES else ThreadPoolExecutor
+        _parse_executor = executor_cls(max_workers=config.PARSE_WORKERS)
+
+    return _parse_executor
+
+
+class ConfigCache:
+
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+
+    _entries: Dict[Path, Tuple[Tuple[int, int, int], WGInterfaceRecord, Optional[PeerIndex]]] = None
+    _views: Dict[Tuple[Path, str], Tuple[Tuple[int, int, int], Any]] = None
+
+    def __init__(self):
+        self._entries = {}
+        self._views = {}
+
+    @staticmethod
+    def stat_key(path: Path) -> Tuple[int, int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def get(self, path: Path, stat_key: Tuple[int, int, int]) -> Optional[WGInterfaceRecord]:
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != stat_key:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        # Callers may add, replace or remove peers of the returned interface
+        return entry[1].copy()
+
+    def get_index(self, path: Path) -> Optional[PeerIndex]:
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+
+        stat_key, interface, index = entry
+        if index is None:
+            index = PeerIndex(interface.peers)
+            self._entries[path] = (stat_key, interface, index)
+
+        return index
+
+    def get_view(self, path: Path, stat_key: Tuple[int, int, int], kind: str) -> Any:
+        # Views are other forms of the interface (models, JSON) built on demand
+        # and kept until the file changes
+        entry = self._views.get((path, kind))
+        if entry is None or entry[0] != stat_key:
+            return None
+
+        return entry[1]
+
+    def put_view(self, path: Path, stat_key: Tuple[int, int, int], kind: str, view: Any):
+        self._views[(path, kind)] = (stat_key, view)
+
+    def _discard_views(self, path: Path):
+        for key in [key for key in self._views if key[0] == path]:
+            del self._views[key]
+
+    def put(self, path: Path, stat_key: Tuple[int, int, int], interface: Optional[WGInterfaceRecord]):
+        self._discard_views(path)
+        if interface is None:
+            self._entries.pop(path, None)
+            return
+
+        self._entries[path] = (stat_key, interface.copy(), None)
+
+    def discard(self, path: Path):
+        self._entries.pop(path, None)
+        self._discard_views(path)
+
+    def prune(self, configs_dir: Path, paths: Iterable[Path]):
+        # Drops the configs of the directory which were removed or renamed
+        paths = set(paths)
+        for path in [path for path in self._entries if path.parent == configs_dir and path not in paths]:
+            self._entries.pop(path)
+
+        for key in [key for key in self._views if key[0].parent == configs_dir and key[0] not in paths]:
+            del self._views[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'size': len(self._entries),
+        }
+
+
+config_cache = ConfigCache()
 
 
 class WGConfigs:
@@ -413,59 +675,334 @@ class WGConfigs:
     _parser = None
     _configs_dir = None
 
-    def __init__(self, configs_dir: str):
+    _trusted = None
+
+    _locks: Dict[Path, asyncio.Lock] = {}
+    _edits: Dict[Path, List[Tuple[Callable[[WGInterfaceRecord], Any], asyncio.Future]]] = {}
+
+    def __init__(self, configs_dir: str, trusted: bool = config.TRUSTED_CONFIGS):
         self._configs_dir = configs_dir
+        self._trusted = trusted
         self._parser = ConfigParser()
 
     async def get_configs_paths(self) -> List[Path]:
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
+        configs_paths = await loop.run_in_executor(
             None, lambda: list(Path(self._configs_dir).glob('*.conf'))
         )
+        config_cache.prune(Path(self._configs_dir), configs_paths)
+        return configs_paths
 
     async def get_all(self) -> Dict[Path, WGInterface]:
-        interface_by_path = {}
         configs_paths = await self.get_configs_paths()
-        for config_path in configs_paths:
-            interface_by_path[config_path] = await self.get(config_path)
+        interfaces = await asyncio.gather(*map(self.get, configs_paths))
+        return dict(zip(configs_paths, interfaces))
+
+    async def get_all_records(self) -> Dict[str, Optional[Dict[str, Any]]]:
+        configs_paths = await self.get_configs_paths()
+        records = await asyncio.gather(*map(self.get_json, configs_paths))
+        return dict(zip(map(str, configs_paths), records))
+
+    async def get_json(self, config_path: Path) -> Optional[Dict[str, Any]]:
+        # JSON-ready form of the interface, kept until the file changes
+        config_path = Path(config_path)
+        stat_key = config_cache.stat_key(config_path)
+        record = config_cache.get_view(config_path, stat_key, 'json')
+        if record is None:
+            interface = await self.get_record(config_path)
+            with span('json.config_interface'):
+                record = interface and interface.dict()
+
+            config_cache.put_view(config_path, stat_key, 'json', record)
+
+        return record
+
+    async def get_record(self, config_path: Path) -> Optional[WGInterfaceRecord]:
+        config_path = Path(config_path)
+        stat_key = config_cache.stat_key(config_path)
+        interface = config_cache.get(config_path, stat_key)
+        if interface is not None:
+            return interface
+
+        interface = await self._parser.load(config_path, self._trusted, as_record=True)
+        config_cache.put(config_path, stat_key, interface)
+        return interface
+
+    async def get_tag(self, config_path: Path) -> str:
+        config_path = Path(config_path)
+        try:
+            return make_etag(config_cache.stat_key(config_path))
+        except FileNotFoundError as ex:
+            raise NotFoundInterface(config_path.stem) from ex
+
+    async def get_all_tag(self) -> str:
+        configs_paths = await self.get_configs_paths()
+        stat_keys = []
+        for path in configs_paths:
+            # A config removed after the listing is not in the state any more
+            with suppress(FileNotFoundError):
+                stat_keys.append((str(path), config_cache.stat_key(path)))
+
+        return make_etag(sorted(stat_keys))
+
+    async def get_by_name(self, name: str) -> WGInterface:
+        try:
+            interface = await self.get(self.get_path(name))
+        except FileNotFoundError as ex:
+            raise NotFoundInterface(name) from ex
+
+        if interface is None:
+            raise NotFoundInterface(name)
+
+        return interface
+
+    async def get(self, config_path: Path) -> Optional[WGInterface]:
+        # The models are built only for the API, the repository works on records
+        config_path = Path(config_path)
+        stat_key = config_cache.stat_key(config_path)
+        interface = config_cache.get_view(config_path, stat_key, 'model')
+        if interface is None:
+            record = await self.get_record(config_path)
+            if record is None:
+                return None
+
+            with span('model.config_interface'):
+                interface = record.to_model()
+
+            config_cache.put_view(config_path, stat_key, 'model', interface)
+
+        # The cached view is shared, so callers get their own peers
+        return interface.copy(update={'peers': [peer.copy() for peer in interface.peers]})
+
+    @classmethod
+    def _get_lock(cls, config_path: Path) -> asyncio.Lock:
+        lock = cls._locks.get(config_path)
+        if lock is None:
+            cls._locks[config_path] = lock = asyncio.Lock()
+
+        return lock
+
+    async def _write(self, config_path: Path, interface: Interface):
+        try:
+            await self._parser.dump(config_path, interface)
+        except BaseException:
+            config_cache.discard(config_path)
+            raise
 
-        return interface_by_path
+        if isinstance(interface, WGInterface):
+            interface = WGInterfaceRecord.from_model(interface)
 
-    async def get(self, config_path: Path) -> WGInterface:
-        return await self._parser.load(config_path)
+        config_cache.writes += 1
+        config_cache.put(config_path, config_cache.stat_key(config_path), interface)
 
     async def set(self, config_path: Path, interface: WGInterface):
-        await self._parser.dump(config_path, interface)
+        config_path = Path(config_path)
+        async with self._get_lock(config_path):
+            await self._write(config_path, interface)
+
+    async def _apply_edits(self, config_path: Path):
+        edits = self._edits.pop(config_path, [])
+        try:
+            await self._apply_batch(config_path, edits)
+        finally:
+            # The applying task may be cancelled, the other waiters
+            # must not wait for the results forever then
+            for _, future in edits:
+                if not future.done():
+                    future.set_exception(BaseInterfaceException(config_path.stem, 'config edit is interrupted'))
+
+    async def _apply_batch(self, config_path: Path, edits: List[Tuple[Callable, asyncio.Future]]):
+        try:
+            interface = await self.get_record(config_path)
+        except Exception as ex:
+            for _, future in edits:
+                if not future.done():
+                    future.set_exception(ex)
+
+            return
+
+        applied = []
+        for edit, future in edits:
+            try:
+                applied.append((future, edit(interface)))
+            except Exception as ex:
+                if not future.done():
+                    future.set_exception(ex)
+
+        if not applied:
+            return
+
+        try:
+            await self._write(config_path, interface)
+        except Exception as ex:
+            for future, _ in applied:
+                if not future.done():
+                    future.set_exception(ex)
+
+            return
+
+        for future, result in applied:
+            if not future.done():
+                future.set_result(result)
+
+    async def _edit(self, config_path: Path, edit: Callable[[WGInterfaceRecord], Any]) -> Any:
+        config_path = Path(config_path)
+        future = asyncio.get_event_loop().create_future()
+        self._edits.setdefault(config_path, []).append((edit, future))
+        # Edits queued while the file was locked are applied by the first
+        # waiter in one read-modify-write, the others just get their results
+        async with self._get_lock(config_path):
+            if not future.done():
+                try:
+                    await self._apply_edits(config_path)
+                except asyncio.CancelledError:
+                    # Nobody waits for the own result any more
+                    future.exception()
+                    raise
+
+        return future.result()
 
     async def get_peer(self, config_path: Path, public_key: str) -> WGPeer:
         if not public_key:
             raise ValueError('Empty peer public key')
 
-        interface = await self.get(config_path)
-        for peer in interface.peers:
-            if peer.public_key == public_key:
-                return peer
+        await self.get_record(config_path)
+        peer_index = config_cache.get_index(Path(config_path))
+        peer = peer_index and peer_index.get(public_key)
+        if peer is not None:
+            return peer.to_model()
 
         raise KeyError(f'Not found peer with public key "{public_key}"')
 
-    async def set_peer(self, config_path: Path, peer: WGPeer):
-        interface = await self.get(config_path)
+    async def get_peers(self, config_path: Path, query: PeerQuery) -> Dict[str, Any]:
+        query.check(WGPeer.__fields__, {
+            'connected': query.connected,
+            'disabled': query.disabled,
+            'handshake_older': query.handshake_older,
+        })
+        config_path = Path(config_path)
+        try:
+            interface = await self.get_record(config_path)
+        except FileNotFoundError as ex:
+            raise NotFoundInterface(config_path.stem) from ex
+
+        if interface is None:
+            raise NotFoundInterface(config_path.stem)
+
+        with span('query.config_peers'):
+            page, next_cursor, total = query.select(interface.peers)
+            return query.page([peer.dict() for peer in page], next_cursor, total)
+
+    @staticmethod
+    def _set_peer(interface: WGInterfaceRecord, saved_peer: WGPeer):
+        saved_peer = WGPeerRecord.from_model(saved_peer)
         for idx, peer in enumerate(interface.peers):
-            if peer.public_key == peer.public_key:
-                interface.peers[idx] = peer
+            if peer.public_key == saved_peer.public_key:
+                interface.peers[idx] = saved_peer
+                break
         else:
-            interface.peers.append(peer)
-
-        await self.set(config_path, interface)
+            interface.peers.append(saved_peer)
 
-    async def remove_peer(self, config_path: Path, public_key: str):
-        interface = await self.get(config_path)
+    @staticmethod
+    def _remove_peer(interface: WGInterfaceRecord, public_key: str) -> WGPeer:
         for idx, peer in enumerate(interface.peers):
             if peer.public_key == public_key:
-                interface.peers.pop(idx)
-                break
-        else:
-            raise KeyError(f'Not found peer with public key "{public_key}"')
+                return interface.peers.pop(idx).to_model()
+
+        raise KeyError(f'Not found peer with public key "{public_key}"')
+
+    @staticmethod
+    def _apply_operations(interface: WGInterfaceRecord,
+                          operations: List[WGPeerOperation]) -> List[WGPeerOperationResult]:
+        results = []
+        peers = {peer.public_key: peer for peer in interface.peers}
+        for operation in operations:
+            public_key = operation.public_key
+            result = WGPeerOperationResult(action=operation.action, public_key=public_key)
+            results.append(result)
+            if operation.action in (WGPeerAction.DISABLE, WGPeerAction.ENABLE):
+                result.success, result.error = False, f'action "{operation.action.value}" is not supported by configs'
+            elif operation.action == WGPeerAction.ADD and public_key in peers:
+                result.success, result.error = False, 'peer already exists'
+            elif operation.action != WGPeerAction.ADD and public_key not in peers:
+                result.success, result.error = False, f'Not found peer with public key "{public_key}"'
+            elif operation.action == WGPeerAction.REMOVE:
+                del peers[public_key]
+            else:
+                peers[public_key] = WGPeerRecord.from_model(operation.peer)
+
+        interface.peers[:] = peers.values()
+        return results
+
+    @staticmethod
+    def _apply_running(interface: WGInterfaceRecord, device: WGDeviceInfo,
+                       current_peers: List[WGPeerInfo]) -> int:
+        changes = 0
+        # A port chosen by the kernel is not written to a config without one
+        if interface.listen_port and interface.listen_port != device.listen_port:
+            interface.listen_port = device.listen_port or None
+            changes += 1
+
+        if (interface.private_key or None) != (device.private_key or None):
+            interface.private_key = device.private_key or None
+            changes += 1
+
+        if int(str(interface.fw_mark or 0), 0) != int(device.fw_mark or '0', 0):
+            interface.fw_mark = device.fw_mark
+            changes += 1
+
+        current_by_pk = {peer.public_key: peer for peer in current_peers}
+        peers = []
+        for saved in interface.peers:
+            current = current_by_pk.pop(saved.public_key, None)
+            if current is None:
+                changes += 1
+                continue
+
+            # Endpoints learned by the kernel are kept only where the config has one
+            peer = WGPeerRecord(current.public_key, current.keepalive, saved.end_point and current.end_point,
+                                current.preshared_key, tuple(current.allowed_ips) or None)
+            if (peer.end_point, peer.preshared_key, peer.keepalive) == \
+                    (saved.end_point, saved.preshared_key, saved.keepalive or None) and \
+                    allowed_networks(peer.allowed_ips) == allowed_networks(saved.allowed_ips):
+                peer = saved
+            else:
+                changes += 1
+
+            peers.append(peer)
+
+        for current in current_by_pk.values():
+            changes += 1
+            peers.append(WGPeerRecord(current.public_key, current.keepalive, None,
+                                      current.preshared_key, tuple(current.allowed_ips) or None))
+
+        interface.peers[:] = peers
+        return changes
+
+    async def sync_with_running(self, config_path: Path, device: WGDeviceInfo,
+                                current_peers: List[WGPeerInfo]) -> int:
+        # Rewrites only the differing options and peers, the rest of the
+        # config (addresses, DNS, hooks, unchanged peers) is kept as is
+        return await self._edit(config_path, partial(self._apply_running, device=device,
+                                                     current_peers=current_peers))
+
+    @staticmethod
+    def make_config(interface: Interface) -> str:
+        config_str = ConfigParser().dumps(interface)
+        if not config_str:
+            raise ValueError('Failed to render the interface config')
+
+        return config_str
+
+    def get_path(self, name: str) -> Path:
+        check_interface_name(name)
+        return Path(self._configs_dir) / f'{name}.conf'
+
+    async def apply_peers(self, config_path: Path, operations: List[WGPeerOperation]) -> List[WGPeerOperationResult]:
+        return await self._edit(config_path, partial(self._apply_operations, operations=operations))
+
+    async def set_peer(self, config_path: Path, peer: WGPeer):
+        await self._edit(config_path, partial(self._set_peer, saved_peer=peer))
 
-        await self.set(config_path, interface)
-        return peer
+    async def remove_peer(self, config_path: Path, public_key: str) -> WGPeer:
+        return await self._edit(config_path, partial(self._remove_peer, public_key=public_key))
@@ -0,0 +1,104 @@
+import time
+import asyncio
+from contextlib import suppress
+from typing import Any, Dict, List, Optional
+from wg_api.models.wg_drift import WGInterfaceDrift, WGReconcileResult, \
+    WGSyncDirection
+from wg_api.utils import config
+from wg_api.utils.exceptions import ShellError, NotFoundInterface
+from wg_api.utils.tracing import span
+from wg_api.repositories.wg_configs import WGConfigs
+from wg_api.repositories.wg_running import WGRunning
+
+
+class WGDrift:
+
+    last_run: Optional[float] = None
+    _last_results: Dict[str, WGReconcileResult] = {}
+
+    @classmethod
+    async def get_drift(cls, configs: WGConfigs, name: str) -> WGInterfaceDrift:
+        config_path = configs.get_path(name)
+        try:
+            interface = await configs.get_record(config_path)
+        except FileNotFoundError as ex:
+            raise NotFoundInterface(name) from ex
+
+        if interface is None:
+            raise NotFoundInterface(name)
+
+        try:
+            device, current_peers = await WGRunning.get_device(name)
+        except NotFoundInterface:
+            return WGInterfaceDrift(name=name, running=False)
+
+        with span('drift.diff'):
+            return WGInterfaceDrift(name=name, running=True,
+                                    **WGRunning.diff_interface(interface, device, current_peers))
+
+    @classmethod
+    async def get_all_drift(cls, configs: WGConfigs) -> List[WGInterfaceDrift]:
+        names = sorted(path.stem for path in await configs.get_configs_paths())
+        return list(await asyncio.gather(*(cls.get_drift(configs, name) for name in names)))
+
+    @classmethod
+    async def reconcile(cls, configs: WGConfigs, name: str, direction: WGSyncDirection,
+                        dry_run: bool = False) -> WGReconcileResult:
+        drift = await cls.get_drift(configs, name)
+        result = WGReconcileResult(name=name, direction=direction, dry_run=dry_run,
+                                   in_sync=drift.in_sync, drift=drift)
+        if dry_run or drift.in_sync:
+            return result
+
+        if not drift.running:
+            result.error = str(NotFoundInterface(name))
+            return result
+
+        # Both directions diff against the state they change once more,
+        # so only what differs at that moment is applied
+        try:
+            if direction == WGSyncDirection.TO_RUNNING:
+                interface = await configs.get_record(configs.get_path(name))
+                result.changes = await WGRunning.set_interface(name, interface)
+            else:
+                device, current_peers = await WGRunning.get_device(name)
+                result.changes = await configs.sync_with_running(configs.get_path(name), device, current_peers)
+        except (ShellError, ValueError, OSError) as ex:
+            result.error = str(ex)
+            return result
+
+        result.in_sync = True
+        return result
+
+    @classmethod
+    async def reconcile_all(cls, configs: WGConfigs, direction: Optional[WGSyncDirection],
+                            dry_run: bool = False) -> List[WGReconcileResult]:
+        names = sorted(path.stem for path in await configs.get_configs_paths())
+        results = []
+        for name in names:
+            try:
+                results.append(await cls.reconcile(configs, name, direction, dry_run or direction is None))
+            except (ShellError, ValueError, OSError):
+                continue
+
+        cls._last_results = {result.name: result for result in results}
+        cls.last_run = time.time()
+        return results
+
+    @classmethod
+    async def reconcile_periodically(cls, interval: float, direction: Optional[str] = config.DRIFT_DIRECTION,
+                                     dry_run: bool = config.DRIFT_DRY_RUN):
+        configs = WGConfigs(config.CONFIGS_DIR)
+        direction = direction and WGSyncDirection(direction)
+        while True:
+            with suppress(ShellError, ValueError, OSError):
+                await cls.reconcile_all(configs, direction, dry_run)
+
+            await asyncio.sleep(interval)
+
+    @classmethod
+    def get_last_report(cls) -> Dict[str, Any]:
+        return {
+            'time': cls.last_run,
+            'results': list(cls._last_results.values()),
+        }
@@ -0,0 +1,120 @@
+import time
+import asyncio
+from contextlib import suppress
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+from wg_api.utils import config
+from wg_api.utils.exceptions import ShellError
+from wg_api.utils.event_hub import Event, EventHub, Subscription
+from wg_api.utils.wg_netlink import WGDump
+from wg_api.repositories.wg_running import WGRunning
+from wg_api.repositories.wg_firewall import WGFirewall
+
+
+PeerState = Tuple[bool, Optional[int], bool]
+
+
+class WGEvents:
+
+    _hub: EventHub = EventHub()
+    _state: Optional[Dict[Tuple[str, str], PeerState]] = None
+    _poller: Optional[asyncio.Task] = None
+
+    @classmethod
+    def _is_disabled(cls, allowed_ips: List[str], disabled_ips: Set[str]) -> bool:
+        return any(allowed_ip.split('/', 1)[0] in disabled_ips for allowed_ip in allowed_ips)
+
+    @classmethod
+    def _read_state(cls, dump: WGDump, disabled_ips: Set[str], now: float) -> Dict[Tuple[str, str], PeerState]:
+        delta = WGRunning.CONNECTION_DELTA.total_seconds()
+        return {
+            (name, peer.public_key): (
+                bool(peer.latest_handshake and now - peer.latest_handshake < delta),
+                peer.latest_handshake,
+                bool(disabled_ips) and cls._is_disabled(peer.allowed_ips, disabled_ips),
+            )
+            for name, (_, peers) in dump.items() for peer in peers
+        }
+
+    @staticmethod
+    def _event(event: str, key: Tuple[str, str], state: PeerState) -> Tuple[Hashable, Event]:
+        name, public_key = key
+        # Events of one kind for one peer share a key, so they are coalesced
+        category = {'connected': 'connection', 'disconnected': 'connection',
+                    'disabled': 'firewall', 'enabled': 'firewall'}.get(event, event)
+        return (name, public_key, category), {
+            'event': event,
+            'name': name,
+            'public_key': public_key,
+            'latest_handshake': state[1],
+        }
+
+    @classmethod
+    def _diff(cls, old: Dict[Tuple[str, str], PeerState],
+              new: Dict[Tuple[str, str], PeerState]) -> List[Tuple[Hashable, Event]]:
+        events = []
+        for key, state in new.items():
+            connected, handshake, disabled = state
+            old_state = old.get(key)
+            if old_state is None:
+                # New peers report only what differs from a disconnected enabled peer
+                old_state = (False, handshake, False)
+
+            old_connected, old_handshake, old_disabled = old_state
+            if connected != old_connected:
+                events.append(cls._event('connected' if connected else 'disconnected', key, state))
+            elif handshake != old_handshake:
+                events.append(cls._event('handshake', key, state))
+
+            if disabled != old_disabled:
+                events.append(cls._event('disabled' if disabled else 'enabled', key, state))
+
+        for key, state in old.items():
+            if key not in new and state[0]:
+                events.append(cls._event('disconnected', key, state))
+
+        return events
+
+    @classmethod
+    async def poll(cls):
+        dump = await WGRunning.get_dump()
+        disabled_ips = set()
+        with suppress(ShellError, ValueError):
+            disabled_ips = set(map(str, await WGFirewall.load_disabled_ips()))
+
+        state = cls._read_state(dump, disabled_ips, time.time())
+        # The first poll is the baseline, subscribers get only the changes
+        if cls._state is not None:
+            cls._hub.publish(cls._diff(cls._state, state))
+
+        cls._state = state
+
+    @classmethod
+    async def _poll_periodically(cls, interval: float):
+        try:
+            while True:
+                with suppress(ShellError, ValueError, OSError):
+                    await cls.poll()
+
+                await asyncio.sleep(interval)
+        finally:
+            cls._state = None
+
+    @classmethod
+    def subscribe(cls) -> Subscription:
+        subscription = cls._hub.subscribe(config.EVENTS_MAX_PENDING)
+        # One poller serves every subscriber and runs only while there are any
+        if cls._poller is None or cls._poller.done():
+            cls._poller = asyncio.ensure_future(cls._poll_periodically(config.EVENTS_POLL_INTERVAL))
+
+        return subscription
+
+    @classmethod
+    def unsubscribe(cls, subscription: Subscription):
+        cls._hub.unsubscribe(subscription)
+        if not len(cls._hub) and cls._poller is not None:
+            cls._poller.cancel()
+            cls._poller = None
+
+    @classmethod
+    def subscribers(cls) -> int:
+        return len(cls._hub)
@@ -1,8 +1,16 @@
 import json
-from typing import List, Dict, Optional
+import asyncio
+from contextlib import suppress
+from typing import List, Dict, Iterable, Optional, Set
 from ipaddress import IPv4Interface, IPv4Address
 from wg_api.models import WGInterface, WGPeer
+from wg_api.utils import config
+from wg_api.utils.exceptions import ShellError
 from wg_api.utils.wg_utils import shell_exec
+from wg_api.utils.nft_batcher import NftBatcher
+from wg_api.utils.peer_index import PeerIndex
+from wg_api.utils.snapshot_cache import running_cache
+from wg_api.utils.tracing import span
 
 
 class WGFirewall:
@@ -11,6 +19,13 @@ class WGFirewall:
     DISABLED_SET = 'disabled-peers'
     INTERFACES_SET = 'running-interfaces'
 
+    last_drift: Optional[Dict[str, List[str]]] = None
+    drift_count: int = 0
+
+    _batcher: Optional[NftBatcher] = None
+    _disabled_ips: Optional[Set[IPv4Address]] = None
+    _load_lock: Optional[asyncio.Lock] = None
+
     @classmethod
     def _get_set_elements(cls, nft_data: dict, set_name: str):
         if not nft_data:
@@ -32,57 +47,152 @@ class WGFirewall:
             return set_data.get('elem') or []
 
     @classmethod
-    async def _get_disabled_ips(cls) -> List[IPv4Address]:
-        nft_data = json.loads(await shell_exec(f'nft --json list set inet '
-                                               f'{cls.TABLE} {cls.DISABLED_SET}'))
-        disabled_ips = cls._get_set_elements(nft_data, cls.DISABLED_SET)
-        if not disabled_ips:
-            return []
+    async def _list_disabled_set(cls) -> dict:
+        with span('firewall.list_disabled'):
+            data = await shell_exec(f'nft --json list set inet {cls.TABLE} {cls.DISABLED_SET}')
+
+        with span('json.loads'):
+            return json.loads(data)
+
+    @classmethod
+    async def _list_addresses(cls) -> list:
+        with span('firewall.list_addresses'):
+            data = await shell_exec('ip -j -br a show')
+
+        with span('json.loads'):
+            return json.loads(data)
+
+    @classmethod
+    async def _read_disabled_ips(cls) -> Set[IPv4Address]:
+        nft_data = await cls._list_disabled_set()
+        return set(map(IPv4Address, cls._get_set_elements(nft_data, cls.DISABLED_SET) or []))
+
+    @classmethod
+    async def load_disabled_ips(cls) -> Set[IPv4Address]:
+        if cls._load_lock is None:
+            cls._load_lock = asyncio.Lock()
+
+        async with cls._load_lock:
+            if cls._disabled_ips is None:
+                cls._disabled_ips = await cls._read_disabled_ips()
+
+        return cls._disabled_ips
+
+    @classmethod
+    async def _get_disabled_ips(cls) -> Set[IPv4Address]:
+        # The set is changed only by our own commits, so after the first load
+        # it is served from memory and checked against nft by `reconcile`
+        if cls._disabled_ips is not None:
+            return cls._disabled_ips
+
+        return await cls.load_disabled_ips()
+
+    @classmethod
+    async def reconcile(cls) -> Dict[str, List[str]]:
+        # Waits for the queued changes, otherwise they would look like drift
+        await cls._get_batcher().drain()
+        nft_ips = await cls._read_disabled_ips()
+        shadow_ips = cls._disabled_ips if cls._disabled_ips is not None else nft_ips
+        cls.last_drift = {
+            'missing': sorted(map(str, shadow_ips - nft_ips)),
+            'unexpected': sorted(map(str, nft_ips - shadow_ips)),
+        }
+        if shadow_ips != nft_ips:
+            cls.drift_count += 1
+
+        cls._disabled_ips = nft_ips
+        return cls.last_drift
 
-        return list(map(IPv4Address, disabled_ips))
+    @classmethod
+    async def reconcile_periodically(cls, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            with suppress(ShellError, ValueError):
+                await cls.reconcile()
 
     @classmethod
     async def get_disabled_peers(cls, *interfaces: WGInterface) -> List[WGPeer]:
-        disabled_peers = []
+        disabled_peers = {}
         if not interfaces:
-            return disabled_peers
+            return []
 
         disabled_ips = await cls._get_disabled_ips()
         if not disabled_ips:
-            return disabled_peers
+            return []
 
         for interface in interfaces:
-            for peer in interface.peers:
-                for peer_addr in peer.allowed_ips:
-                    if peer_addr.ip in disabled_ips:
-                        disabled_peers.append(peer)
+            peer_index = PeerIndex(interface.peers)
+            for disabled_ip in disabled_ips:
+                for peer in peer_index.by_ip(disabled_ip):
+                    disabled_peers[id(peer)] = peer
 
-        return disabled_peers
+        return list(disabled_peers.values())
 
-    @staticmethod
-    def _get_peer_ips_str(peer: WGPeer) -> Optional[str]:
+    @classmethod
+    async def is_peer_disabled(cls, peer: WGPeer) -> bool:
         if not peer.allowed_ips:
-            return None
+            return False
 
-        return ', '.join(str(peer_ip.ip) for peer_ip in peer.allowed_ips)
+        disabled_ips = await cls._get_disabled_ips()
+        return any(peer_addr.ip in disabled_ips for peer_addr in peer.allowed_ips)
+
+    @staticmethod
+    def _get_peer_ips(peer: WGPeer) -> List[str]:
+        return [str(peer_ip.ip) for peer_ip in peer.allowed_ips or []]
 
     @classmethod
     async def disable_peer(cls, peer: WGPeer):
-        peer_ips_str = cls._get_peer_ips_str(peer)
-        if not peer_ips_str:
-            return
-
-        await shell_exec(f'nft add element inet '
-                         f'{cls.TABLE} {cls.DISABLED_SET} {{ {peer_ips_str} }}')
+        await cls.update_disabled_ips(disable_ips=cls._get_peer_ips(peer))
 
     @classmethod
     async def enable_peer(cls, peer: WGPeer):
-        peer_ips_str = cls._get_peer_ips_str(peer)
-        if not peer_ips_str:
+        await cls.update_disabled_ips(enable_ips=cls._get_peer_ips(peer))
+
+    @classmethod
+    async def _commit_disabled_ips(cls, elements: Dict[str, bool]):
+        disable_ips = [ip for ip, disabled in elements.items() if disabled]
+        enable_ips = [ip for ip, disabled in elements.items() if not disabled]
+        disabled_ips = await cls._get_disabled_ips()
+        # The shadow set only skips redundant adds, deletes are always issued
+        # since it may be stale
+        disable_ips = [ip for ip in disable_ips if IPv4Address(ip) not in disabled_ips]
+
+        script = []
+        if disable_ips:
+            script.append(f'add element inet {cls.TABLE} {cls.DISABLED_SET} {{ {", ".join(disable_ips)} }}')
+
+        if enable_ips:
+            # Deleting a missing element fails the whole nft transaction, adding
+            # an existing one does not, so the elements are added first
+            elements = ', '.join(enable_ips)
+            script.append(f'add element inet {cls.TABLE} {cls.DISABLED_SET} {{ {elements} }}')
+            script.append(f'delete element inet {cls.TABLE} {cls.DISABLED_SET} {{ {elements} }}')
+
+        if not script:
             return
 
-        await shell_exec(f'nft delete element inet '
-                         f'{cls.TABLE} {cls.DISABLED_SET} {{ {peer_ips_str} }}')
+        try:
+            with span('firewall.commit'):
+                await shell_exec('nft -f -', *script)
+        except ShellError:
+            # The shadow set may have drifted, the next read loads it again
+            cls._disabled_ips = None
+            raise
+
+        if (disabled_ips := cls._disabled_ips) is not None:
+            disabled_ips.update(map(IPv4Address, disable_ips))
+            disabled_ips.difference_update(map(IPv4Address, enable_ips))
+
+    @classmethod
+    def _get_batcher(cls) -> NftBatcher:
+        if cls._batcher is None:
+            cls._batcher = NftBatcher(cls._commit_disabled_ips, config.NFT_BATCH_DELAY, config.NFT_BATCH_SIZE)
+
+        return cls._batcher
+
+    @classmethod
+    async def update_disabled_ips(cls, disable_ips: Iterable[str] = (), enable_ips: Iterable[str] = ()):
+        await cls._get_batcher().submit(disable_ips, enable_ips)
 
     @classmethod
     async def get_interfaces_addresses(cls, *interface_names: str) -> Dict[str, List[IPv4Interface]]:
@@ -90,7 +200,7 @@ class WGFirewall:
         if not interface_names:
             return addresses_by_interface
 
-        ip_data = json.loads(await shell_exec('ip -j -br a show'))
+        ip_data = await running_cache.get('ip-addresses', cls._list_addresses)
         if not ip_data:
             return addresses_by_interface
 
@@ -0,0 +1,63 @@
+import time
+import asyncio
+from contextlib import suppress
+from typing import Any, Dict, List, Optional
+from wg_api.utils import config
+from wg_api.utils.exceptions import ShellError, NotFoundPeerException
+from wg_api.utils.peer_history import ThroughputHistory
+from wg_api.utils.wg_utils import check_interface_name
+from wg_api.repositories.wg_running import WGRunning
+
+
+class WGHistory:
+
+    interval: float = config.HISTORY_INTERVAL
+
+    _history: ThroughputHistory = ThroughputHistory(config.HISTORY_SIZE)
+
+    @classmethod
+    def _since(cls, minutes: Optional[float]) -> Optional[float]:
+        return None if minutes is None else time.time() - minutes * 60
+
+    @classmethod
+    async def sample(cls):
+        # A fresh dump, cached ones would skew the rates by up to the cache TTL
+        dump = await WGRunning.get_dump(cached=False)
+        cls._history.record(dump, time.time())
+
+    @classmethod
+    async def sample_periodically(cls, interval: float):
+        cls.interval = interval
+        while True:
+            with suppress(ShellError, ValueError, OSError):
+                await cls.sample()
+
+            await asyncio.sleep(interval)
+
+    @classmethod
+    def get_peer_history(cls, name: str, public_key: str, minutes: float = None) -> Dict[str, Any]:
+        check_interface_name(name)
+        key = (name, public_key)
+        if key not in cls._history:
+            raise NotFoundPeerException(name, public_key)
+
+        since = cls._since(minutes)
+        return {
+            'public_key': public_key,
+            'interval': cls.interval,
+            **cls._history.summary(key, since),
+            'samples': [{'time': sample_time, 'rx_rate': rx_rate, 'tx_rate': tx_rate}
+                        for sample_time, rx_rate, tx_rate in cls._history.series(key, since)],
+        }
+
+    @classmethod
+    def get_top(cls, count: int, minutes: float = None, name: str = None) -> List[Dict[str, Any]]:
+        if name is not None:
+            check_interface_name(name)
+
+        return [{
+            'name': peer_name,
+            'public_key': public_key,
+            'rx_rate': rx_rate,
+            'tx_rate': tx_rate,
+        } for (peer_name, public_key), rx_rate, tx_rate in cls._history.top(count, cls._since(minutes), name)]
@@ -1,19 +1,37 @@
+import time
+import errno
+import asyncio
 from io import StringIO
 from datetime import datetime, timedelta
+from ipaddress import IPv4Interface
 from typing import Any, List, Optional, \
-    Callable, Dict
+    Callable, Dict, Tuple
 from wg_api.repositories.wg_firewall import WGFirewall
-from wg_api.models.wg_peer import WGPeer, WGRunningPeer
+from wg_api.models.wg_peer import WGPeer, WGRunningPeer, WGPeerAction, \
+    WGPeerOperation, WGPeerOperationResult
 from wg_api.models.wg_interface import WGInterface, WGRunningInterface
 from wg_api.utils.exceptions import ShellError, BaseInterfaceException, \
-    NotFoundInterface, BasePeerException, NotFoundPeerException
+    NotFoundInterface, BasePeerException, NotFoundPeerException, NetlinkError
+from wg_api.utils.wg_netlink import WGNetlink, WGDeviceInfo, \
+    WGPeerInfo, WGDump
+from wg_api.utils.peer_index import PeerIndex
+from wg_api.utils.snapshot_cache import running_cache
+from wg_api.utils.tracing import span
+from wg_api.utils.peer_query import PeerQuery
+from wg_api.utils.etag import dump_etag
+from wg_api.utils.fast_json import running_interface_record, running_peer_record
 from wg_api.utils.wg_utils import shell_exec, escape, \
-    escape_to_str, check_interface_name
+    escape_to_str, check_interface_name, allowed_networks
 
 
 class WGRunning:
 
     CONNECTION_DELTA = timedelta(minutes=2)
+    PEERS_BATCH_SIZE = 256
+    NETLINK_UNAVAILABLE = (errno.ENOENT, errno.EPERM, errno.EACCES,
+                           errno.EPROTONOSUPPORT, errno.EAFNOSUPPORT)
+
+    _netlink: Optional[WGNetlink] = WGNetlink()
 
     @classmethod
     def _prepare(cls, value: str, cast: Callable = None) -> Any:
@@ -48,8 +66,9 @@ class WGRunning:
         return datetime.now() - datetime.fromtimestamp(latest_handshakes) < cls.CONNECTION_DELTA
 
     @classmethod
-    def _parse_interface(cls, *parts) -> WGRunningInterface:
-        return WGRunningInterface(
+    def _parse_device_info(cls, *parts) -> WGDeviceInfo:
+        return WGDeviceInfo(
+            name=parts[0],
             private_key=cls._prepare(parts[1]),
             public_key=cls._prepare(parts[2]),
             listen_port=cls._prepare(parts[3], int),
@@ -57,56 +76,134 @@ class WGRunning:
         )
 
     @classmethod
-    def _parse_peer(cls, *parts) -> WGRunningPeer:
-        latest_handshake = cls._prepare(parts[5], cls._int_zero_none)
-        return WGRunningPeer(
+    def _parse_peer_info(cls, *parts) -> WGPeerInfo:
+        return WGPeerInfo(
             public_key=cls._prepare(parts[1]),
             preshared_key=cls._prepare(parts[2]),
             end_point=cls._prepare(parts[3]),
-            allowed_ips=cls._prepare(parts[4], cls._array),
-            latest_handshake=latest_handshake,
+            allowed_ips=cls._prepare(parts[4], cls._array) or [],
+            latest_handshake=cls._prepare(parts[5], cls._int_zero_none),
             transfer_rx=cls._prepare(parts[6], int),
             transfer_tx=cls._prepare(parts[7], int),
-            keepalive=cls._prepare(parts[8], cls._int_off),
-            connected=cls._is_connected(latest_handshake)
+            keepalive=cls._prepare(parts[8], cls._int_off)
+        )
+
+    @classmethod
+    def _parse_dump(cls, data: str, name: str = None) -> WGDump:
+        dump = {}
+        curr_name = None
+        with StringIO(data) as str_io:
+            for line in str_io:
+                parts = line.strip().split('\t')
+                if name is not None:
+                    parts.insert(0, name)
+
+                interface_name = parts[0]
+                if interface_name != curr_name:
+                    curr_name = interface_name
+                    dump[curr_name] = (cls._parse_device_info(*parts), [])
+                else:
+                    dump[curr_name][1].append(cls._parse_peer_info(*parts))
+
+        return dump
+
+    @classmethod
+    async def _read_netlink_dump(cls, name: str = None) -> Optional[WGDump]:
+        if cls._netlink is None:
+            return None
+
+        loop = asyncio.get_event_loop()
+        try:
+            with span('netlink.dump'):
+                return await loop.run_in_executor(None, cls._netlink.dump, name)
+        except NetlinkError as ex:
+            if ex.err_code == errno.ENODEV:
+                return {}
+
+            err_code = ex.err_code
+        except OSError as ex:
+            err_code = ex.errno
+
+        if err_code in cls.NETLINK_UNAVAILABLE:
+            # No module, no permissions or no netlink at all,
+            # so the `wg` tool is used from now on
+            cls._netlink = None
+
+        # Other errors (EINTR, EAGAIN, ENOBUFS) fall back for this call only
+        return None
+
+    @classmethod
+    async def _fetch_dump(cls, name: str = None) -> WGDump:
+        dump = await cls._read_netlink_dump(name)
+        if dump is not None:
+            return dump
+
+        if name is None:
+            data = await shell_exec(f"wg show all dump")
+        else:
+            data = await shell_exec(f"wg show interfaces | grep -wq '{escape(name)}' "
+                                    f"&& wg show '{escape(name)}' dump")
+
+        with span('wg.parse_dump'):
+            return cls._parse_dump(data, name) if data else {}
+
+    @classmethod
+    async def _read_dump(cls, name: str = None) -> WGDump:
+        return await running_cache.get(('dump', name), lambda: cls._fetch_dump(name))
+
+    @classmethod
+    async def get_dump(cls, cached: bool = True) -> WGDump:
+        return await cls._read_dump() if cached else await cls._fetch_dump()
+
+    @classmethod
+    def _parse_interface(cls, device: WGDeviceInfo, peers: List[WGPeerInfo]) -> WGRunningInterface:
+        with span('model.running_interface'):
+            return cls._build_interface(device, peers)
+
+    @classmethod
+    def _build_interface(cls, device: WGDeviceInfo, peers: List[WGPeerInfo]) -> WGRunningInterface:
+        # The kernel is a trusted source, so the models are built without validation
+        return WGRunningInterface.construct(
+            private_key=device.private_key,
+            public_key=device.public_key,
+            listen_port=device.listen_port,
+            fw_mark=None if device.fw_mark is None else str(device.fw_mark),
+            address=[],
+            peers=[cls._parse_peer(peer) for peer in peers]
+        )
+
+    @classmethod
+    def _parse_peer(cls, peer: WGPeerInfo) -> WGRunningPeer:
+        return WGRunningPeer.construct(
+            public_key=peer.public_key,
+            preshared_key=peer.preshared_key,
+            end_point=peer.end_point,
+            allowed_ips=list(map(IPv4Interface, peer.allowed_ips)) or None,
+            latest_handshake=peer.latest_handshake,
+            transfer_rx=peer.transfer_rx,
+            transfer_tx=peer.transfer_tx,
+            keepalive=peer.keepalive,
+            connected=cls._is_connected(peer.latest_handshake)
         )
 
     @classmethod
-    def _parse_connected(cls, name, public_key, latest_handshakes):
-        latest_handshake = cls._prepare(latest_handshakes, cls._int_zero_none)
-        return name, public_key, cls._is_connected(latest_handshake)
+    def _get_connected(cls, peers: List[WGPeerInfo]) -> Dict[str, bool]:
+        return {peer.public_key: cls._is_connected(peer.latest_handshake) for peer in peers}
 
     @classmethod
     async def get_status(cls, name: str) -> dict:
         check_interface_name(name)
-        data = await shell_exec(f"wg show interfaces | grep -wq '{escape(name)}' "
-                                f"&& wg show '{escape(name)}' latest-handshakes")
-        if not data:
+        dump = await cls._read_dump(name)
+        if name not in dump:
             raise NotFoundInterface(name)
 
-        connected_data = {}
-        with StringIO(data) as str_io:
-            for line in str_io:
-                parts = line.strip().split('\t')
-                _, pk, conn = cls._parse_connected(name, *parts)
-                connected_data[pk] = conn
-
-        return connected_data
+        _, peers = dump[name]
+        return cls._get_connected(peers)
 
     @classmethod
     async def get_status_all(cls) -> dict:
-        connected_data = {}
-        data = await shell_exec(f"wg show all latest-handshakes")
-        if not data:
-            return connected_data
-
-        with StringIO(data) as str_io:
-            for line in str_io:
-                parts = line.strip().split('\t')
-                name, pk, conn = cls._parse_connected(*parts)
-                connected_data.setdefault(name, {})[pk] = conn
-
-        return connected_data
+        dump = await cls._read_dump()
+        return {name: cls._get_connected(peers) for name, (_, peers) in dump.items()}
 
     @staticmethod
     async def _fill_disabled_peers(*interfaces: WGRunningInterface):
@@ -127,118 +224,386 @@ class WGRunning:
     @classmethod
     async def get_all(cls) -> Dict[str, WGRunningInterface]:
         all_interfaces = {}
-        all_data = await shell_exec(f"wg show all dump")
-        if not all_data:
-            return all_interfaces
+        for name, (device, peers) in (await cls._read_dump()).items():
+            all_interfaces[name] = cls._parse_interface(device, peers)
 
-        curr_name = None
-        interface = None
-        with StringIO(all_data) as str_io:
-            for line in str_io:
-                parts = line.strip().split('\t')
-                interface_name = parts[0]
-                if interface is None or interface_name != curr_name:
-                    curr_name = interface_name
-                    all_interfaces[curr_name] = interface = cls._parse_interface(*parts)
-                else:
-                    interface.peers.append(cls._parse_peer(*parts))
+        if not all_interfaces:
+            return all_interfaces
 
         await cls._fill_disabled_peers(*all_interfaces.values())
         await cls._fill_interface_addresses(all_interfaces)
         return all_interfaces
 
+    @classmethod
+    async def get_all_records(cls) -> Dict[str, Dict[str, Any]]:
+        dump = await cls._read_dump()
+        if not dump:
+            return {}
+
+        disabled_ips = set(map(str, await WGFirewall.load_disabled_ips()))
+        addresses = await WGFirewall.get_interfaces_addresses(*dump)
+        now = time.time()
+        delta = cls.CONNECTION_DELTA.total_seconds()
+        with span('record.running_interface'):
+            return {
+                name: running_interface_record(device, peers, list(map(str, addresses.get(name, []))),
+                                               disabled_ips, now, delta)
+                for name, (device, peers) in dump.items()
+            }
+
+    @classmethod
+    async def get_tag(cls, name: str = None) -> str:
+        if name is not None:
+            check_interface_name(name)
+
+        return await running_cache.get(('tag', name), lambda: cls._make_tag(name))
+
+    @classmethod
+    async def _make_tag(cls, name: Optional[str]) -> str:
+        dump = await cls._read_dump(name)
+        if name is not None and name not in dump:
+            raise NotFoundInterface(name)
+
+        # Everything the responses are built from: the dump, the firewall and the addresses
+        disabled_ips = tuple(sorted(await WGFirewall.load_disabled_ips()))
+        addresses = await WGFirewall.get_interfaces_addresses(*dump)
+        with span('etag.running'):
+            return dump_etag(
+                dump, time.time(), cls.CONNECTION_DELTA.total_seconds(), disabled_ips,
+                tuple(sorted((if_name, tuple(if_addresses)) for if_name, if_addresses in addresses.items())),
+            )
+
     @classmethod
     async def get_by_name(cls, name: str) -> WGRunningInterface:
         check_interface_name(name)
-        data = await shell_exec(f"wg show interfaces | grep -wq '{escape(name)}' "
-                                f"&& wg show '{escape(name)}' dump")
-        if not data:
+        dump = await cls._read_dump(name)
+        if name not in dump:
             raise NotFoundInterface(name)
 
-        interface = None
-        with StringIO(data) as str_io:
-            for line in str_io:
-                parts = line.strip().split('\t')
-                if interface is None:
-                    interface = cls._parse_interface(None, *parts)
-                else:
-                    interface.peers.append(cls._parse_peer(None, *parts))
-
+        interface = cls._parse_interface(*dump[name])
         await cls._fill_disabled_peers(interface)
         await cls._fill_interface_addresses({name: interface})
         return interface
 
+    @classmethod
+    async def get_peers(cls, name: str, query: PeerQuery) -> Dict[str, Any]:
+        query.check(WGRunningPeer.__fields__)
+        check_interface_name(name)
+        dump = await cls._read_dump(name)
+        if name not in dump:
+            raise NotFoundInterface(name)
+
+        _, peers = dump[name]
+        disabled_ips = None
+        if query.disabled is not None or query.wants('disabled'):
+            disabled_ips = set(map(str, await WGFirewall.load_disabled_ips()))
+
+        now = time.time()
+        delta = cls.CONNECTION_DELTA.total_seconds()
+
+        def is_connected(peer: WGPeerInfo) -> bool:
+            return bool(peer.latest_handshake) and now - peer.latest_handshake < delta
+
+        def is_disabled(peer: WGPeerInfo) -> bool:
+            return bool(disabled_ips) and any(ip.split('/', 1)[0] in disabled_ips for ip in peer.allowed_ips)
+
+        def match(peer: WGPeerInfo) -> bool:
+            if query.connected is not None and is_connected(peer) != query.connected:
+                return False
+
+            # Peers without a handshake are older than any age
+            handshake = peer.latest_handshake
+            if query.handshake_older is not None and handshake and now - handshake <= query.handshake_older:
+                return False
+
+            return query.disabled is None or is_disabled(peer) == query.disabled
+
+        filtered = query.connected is not None or query.disabled is not None or query.handshake_older is not None
+        with span('query.running_peers'):
+            page, next_cursor, total = query.select(peers, match if filtered else None)
+            records = [running_peer_record(peer, is_connected(peer), is_disabled(peer)) for peer in page]
+
+        return query.page(records, next_cursor, total)
+
     @classmethod
     async def get_peers_pks(cls, name: str) -> List[str]:
         check_interface_name(name)
-        peers_pks = await shell_exec(f"wg show interfaces | grep -wq '{escape(name)}' "
-                                     f"&& wg show '{escape(name)}' peers")
-        return peers_pks.strip().split('\n')
+        dump = await cls._read_dump(name)
+        if name not in dump:
+            return []
+
+        _, peers = dump[name]
+        return [peer.public_key for peer in peers]
+
+    @classmethod
+    def _fw_mark_value(cls, fw_mark: Any) -> int:
+        fw_mark = cls._off(str(fw_mark or 0))
+        return int(fw_mark, 0) if fw_mark else 0
 
     @classmethod
-    async def set_interface(cls, name, interface: WGInterface):
-        peers_pks = await cls.get_peers_pks(name)
+    def _peer_changes(cls, peer: WGPeer, current: WGPeerInfo) -> List[str]:
+        changes = []
+        # Peers without an endpoint keep the one learned by the kernel
+        if peer.end_point and peer.end_point != current.end_point:
+            changes.append('end_point')
+
+        if peer.preshared_key != current.preshared_key:
+            changes.append('preshared_key')
+
+        if (peer.keepalive or None) != current.keepalive:
+            changes.append('keepalive')
+
+        if allowed_networks(peer.allowed_ips) != allowed_networks(current.allowed_ips):
+            changes.append('allowed_ips')
+
+        return changes
+
+    @classmethod
+    def _is_peer_changed(cls, peer: WGPeer, current: Optional[WGPeerInfo]) -> bool:
+        return current is None or bool(cls._peer_changes(peer, current))
+
+    @classmethod
+    def _interface_changes(cls, interface: WGInterface, device: WGDeviceInfo) -> List[str]:
+        changes = []
+        # Without a port in the config the kernel keeps the one it has chosen
+        if interface.listen_port and interface.listen_port != device.listen_port:
+            changes.append('listen_port')
+
+        if cls._fw_mark_value(interface.fw_mark) != cls._fw_mark_value(device.fw_mark):
+            changes.append('fw_mark')
 
+        if interface.private_key != device.private_key:
+            changes.append('private_key')
+
+        return changes
+
+    @classmethod
+    def _interface_args(cls, interface: WGInterface, device: WGDeviceInfo) -> Tuple[str, List[str]]:
         input_args = []
-        command = f"wg set '{escape(name)}'"
-        command += f" listen-port {interface.listen_port or 0}"
-        command += f" fwmark '{escape_to_str(interface.fw_mark or 0)}'"
-        if interface.private_key:
-            command += f" private-key <(read -r; echo \"$REPLY\")"
-            input_args.append(interface.private_key)
+        command = ''
+        changes = cls._interface_changes(interface, device)
+        if 'listen_port' in changes:
+            command += f" listen-port {interface.listen_port}"
+
+        if 'fw_mark' in changes:
+            command += f" fwmark '{escape_to_str(interface.fw_mark or 0)}'"
+
+        if 'private_key' in changes:
+            if interface.private_key:
+                command += f" private-key <(read -r; echo \"$REPLY\")"
+                input_args.append(interface.private_key)
+            else:
+                command += f" private-key /dev/null"
+
+        return command, input_args
+
+    @classmethod
+    def _peer_args(cls, peer: WGPeer) -> Tuple[str, List[str]]:
+        input_args = []
+        command = f" peer '{escape(peer.public_key)}'"
+        if peer.preshared_key:
+            command += f" preshared-key <(read -r; echo \"$REPLY\")"
+            input_args.append(peer.preshared_key)
         else:
-            command += f" private-key /dev/null"
+            command += f" preshared-key /dev/null"
 
-        for peer in interface.peers:
-            command += f" peer '{escape(peer.public_key)}'"
-            if peer.preshared_key:
-                command += f" preshared-key <(read -r; echo \"$REPLY\")"
-                input_args.append(peer.preshared_key)
-            else:
-                command += f" preshared-key /dev/null"
+        if peer.end_point:
+            command += f" endpoint '{escape_to_str(peer.end_point)}'"
 
-            if peer.end_point:
-                command += f" endpoint '{escape_to_str(peer.end_point)}'"
+        command += f" persistent-keepalive {peer.keepalive or 0}"
+        if peer.allowed_ips:
+            command += f" allowed-ips '{','.join(map(str, peer.allowed_ips))}'"
+        else:
+            command += f" allowed-ips ''"
 
-            command += f" persistent-keepalive {peer.keepalive or 0}"
-            if peer.allowed_ips:
-                command += f" allowed-ips '{','.join(map(str, peer.allowed_ips))}'"
-            else:
-                command += f" allowed-ips ''"
+        return command, input_args
+
+    @classmethod
+    async def _wg_set(cls, name: str, interface_args: Tuple[str, List[str]],
+                      peers_args: List[Tuple[str, List[str]]],
+                      stop_on_error: bool = True) -> List[Optional[ShellError]]:
+        # Peers are set in chunks of PEERS_BATCH_SIZE, without `stop_on_error`
+        # every chunk is tried and the error of each one is returned
+        command, input_args = interface_args
+        errors = []
+        try:
+            for idx in range(0, max(len(peers_args), 1), cls.PEERS_BATCH_SIZE):
+                for peer_command, peer_input_args in peers_args[idx:idx + cls.PEERS_BATCH_SIZE]:
+                    command += peer_command
+                    input_args.extend(peer_input_args)
+
+                error = None
+                if command:
+                    try:
+                        await shell_exec(f"wg set '{escape(name)}'{command}", *input_args)
+                    except ShellError as ex:
+                        if stop_on_error:
+                            raise
+
+                        error = ex
+
+                errors.append(error)
+                command, input_args = '', []
+        finally:
+            running_cache.invalidate()
 
-            if peer.public_key in peers_pks:
-                peers_pks.remove(peer.public_key)
+        return errors
 
-        for peer_pk in peers_pks:
-            command += f" peer '{escape(peer_pk)}' remove"
+    @classmethod
+    async def _get_device(cls, name: str) -> Tuple[WGDeviceInfo, List[WGPeerInfo]]:
+        check_interface_name(name)
+        # Diffs are computed against the actual state, not a cached snapshot
+        dump = await cls._fetch_dump(name)
+        if name not in dump:
+            raise NotFoundInterface(name)
+
+        return dump[name]
+
+    @classmethod
+    async def set_interface(cls, name, interface: WGInterface) -> int:
+        device, current_peers = await cls._get_device(name)
+        current_by_pk = {peer.public_key: peer for peer in current_peers}
+
+        peers_args = []
+        for peer in interface.peers:
+            if cls._is_peer_changed(peer, current_by_pk.pop(peer.public_key, None)):
+                peers_args.append(cls._peer_args(peer))
+
+        for peer_pk in current_by_pk:
+            peers_args.append((f" peer '{escape(peer_pk)}' remove", []))
 
         try:
-            await shell_exec(command, *input_args)
+            await cls._wg_set(name, cls._interface_args(interface, device), peers_args)
         except ShellError as ex:
             raise BaseInterfaceException(name, 'interface is not set') from ex
 
+        return len(peers_args)
+
+    @classmethod
+    async def get_device(cls, name: str) -> Tuple[WGDeviceInfo, List[WGPeerInfo]]:
+        return await cls._get_device(name)
+
+    @classmethod
+    def diff_interface(cls, interface: WGInterface, device: WGDeviceInfo,
+                       current_peers: List[WGPeerInfo]) -> Dict[str, Any]:
+        # What `set_interface` would change to make the device match the interface
+        current_by_pk = {peer.public_key: peer for peer in current_peers}
+        missing_peers, changed_peers = [], []
+        for peer in interface.peers:
+            current = current_by_pk.pop(peer.public_key, None)
+            if current is None:
+                missing_peers.append(peer.public_key)
+            elif changes := cls._peer_changes(peer, current):
+                changed_peers.append({'public_key': peer.public_key, 'fields': changes})
+
+        return {
+            'interface': cls._interface_changes(interface, device),
+            'missing_peers': missing_peers,
+            'extra_peers': list(current_by_pk),
+            'changed_peers': changed_peers,
+        }
+
+    @classmethod
+    async def _get_peer_index(cls, name: str) -> PeerIndex[WGPeerInfo]:
+        check_interface_name(name)
+
+        async def build_index():
+            dump = await cls._read_dump(name)
+            if name not in dump:
+                raise NotFoundInterface(name)
+
+            return PeerIndex(dump[name][1])
+
+        return await running_cache.get(('index', name), build_index)
+
     @classmethod
     async def get_peer(cls, name: str, public_key: str) -> WGRunningPeer:
         if not public_key:
             raise ValueError('Empty peer public key')
 
-        interface = await cls.get_by_name(name)
-        for peer in interface.peers:
-            if peer.public_key == public_key:
-                return peer
+        index = await cls._get_peer_index(name)
+        peer_info = index.get(public_key)
+        if peer_info is None:
+            raise NotFoundPeerException(name, public_key)
 
-        raise NotFoundPeerException(name, public_key)
+        peer = cls._parse_peer(peer_info)
+        peer.disabled = await WGFirewall.is_peer_disabled(peer)
+        return peer
 
     @classmethod
-    async def set_peer(cls, name: str, saved_peer: WGPeer):
-        interface: WGInterface = await cls.get_by_name(name)
-        for idx, peer in enumerate(interface.peers):
+    async def set_peer(cls, name: str, saved_peer: WGPeer) -> int:
+        _, current_peers = await cls._get_device(name)
+        for peer in current_peers:
             if peer.public_key == saved_peer.public_key:
-                interface.peers[idx] = saved_peer
+                current = peer
+                break
         else:
-            interface.peers.append(saved_peer)
+            current = None
+
+        if not cls._is_peer_changed(saved_peer, current):
+            return 0
+
+        try:
+            await cls._wg_set(name, ('', []), [cls._peer_args(saved_peer)])
+        except ShellError as ex:
+            raise BasePeerException(name, saved_peer.public_key, 'peer is not set') from ex
+
+        return 1
+
+    @staticmethod
+    def _peer_ips(allowed_ips: List[Any]) -> List[str]:
+        peer_ips = (str(allowed_ip).partition('/')[0] for allowed_ip in allowed_ips or [])
+        return [peer_ip for peer_ip in peer_ips if ':' not in peer_ip]
+
+    @classmethod
+    async def apply_peers(cls, name: str, operations: List[WGPeerOperation]) -> List[WGPeerOperationResult]:
+        _, current_peers = await cls._get_device(name)
+        allowed_ips_by_pk = {peer.public_key: peer.allowed_ips for peer in current_peers}
+        current_by_pk = {peer.public_key: peer for peer in current_peers}
+
+        results = []
+        peers_args, wg_results = [], []
+        disable_ips, enable_ips, fw_results = [], [], []
+        for operation in operations:
+            public_key = operation.public_key
+            result = WGPeerOperationResult(action=operation.action, public_key=public_key)
+            results.append(result)
+            exists = public_key in allowed_ips_by_pk
+            if operation.action == WGPeerAction.ADD and exists:
+                result.success, result.error = False, 'peer already exists'
+            elif operation.action != WGPeerAction.ADD and not exists:
+                result.success, result.error = False, str(NotFoundPeerException(name, public_key))
+            elif operation.action in (WGPeerAction.ADD, WGPeerAction.UPDATE):
+                if cls._is_peer_changed(operation.peer, current_by_pk.pop(public_key, None)):
+                    peers_args.append(cls._peer_args(operation.peer))
+                    wg_results.append(result)
+
+                allowed_ips_by_pk[public_key] = operation.peer.allowed_ips
+            elif operation.action == WGPeerAction.REMOVE:
+                peers_args.append((f" peer '{escape(public_key)}' remove", []))
+                wg_results.append(result)
+                current_by_pk.pop(public_key, None)
+                del allowed_ips_by_pk[public_key]
+            else:
+                peer_ips = cls._peer_ips(allowed_ips_by_pk[public_key])
+                (disable_ips if operation.action == WGPeerAction.DISABLE else enable_ips).extend(peer_ips)
+                fw_results.append(result)
+
+        errors = await cls._wg_set(name, ('', []), peers_args, stop_on_error=False)
+        for idx, result in enumerate(wg_results):
+            error = errors[idx // cls.PEERS_BATCH_SIZE]
+            if error is not None:
+                result.success, result.error = False, str(error)
+
+        try:
+            await WGFirewall.update_disabled_ips(disable_ips, enable_ips)
+        except ShellError as ex:
+            for result in fw_results:
+                result.success, result.error = False, str(ex)
+        finally:
+            running_cache.invalidate()
 
-        await cls.set_interface(name, interface)
+        return results
 
     @classmethod
     async def remove_peer(cls, name: str, public_key: str) -> WGRunningPeer:
@@ -247,6 +612,8 @@ class WGRunning:
             await shell_exec(f"wg set '{escape(name)}' peer '{peer.public_key}' remove")
         except ShellError as ex:
             raise BasePeerException(name, public_key, 'peer is not removed') from ex
+        finally:
+            running_cache.invalidate()
 
         return peer
 
@@ -257,6 +624,8 @@ class WGRunning:
             await WGFirewall.disable_peer(peer)
         except ShellError as ex:
             raise BasePeerException(name, public_key, 'peer is not disabled') from ex
+        finally:
+            running_cache.invalidate()
 
     @classmethod
     async def enable_peer(cls, name: str, public_key: str):
@@ -265,6 +634,8 @@ class WGRunning:
             await WGFirewall.enable_peer(peer)
         except ShellError as ex:
             raise BasePeerException(name, public_key, 'peer is not enabled') from ex
+        finally:
+            running_cache.invalidate()
 
     @classmethod
     async def start(cls, name: str):
@@ -274,6 +645,8 @@ class WGRunning:
                              f"|| wg-quick up '{escape(name)}'")
         except ShellError as ex:
             raise BaseInterfaceException(name, 'interface is not started') from ex
+        finally:
+            running_cache.invalidate()
 
     @classmethod
     async def stop(cls, name: str):
@@ -283,6 +656,8 @@ class WGRunning:
                              f"&& wg-quick down '{escape(name)}'")
         except ShellError as ex:
             raise BaseInterfaceException(name, f'interface is not stopped') from ex
+        finally:
+            running_cache.invalidate()
 
     @classmethod
     async def save_config(cls, name: str):
@@ -299,3 +674,5 @@ class WGRunning:
             await shell_exec(f"wg syncconf '{escape(name)}' <(wg-quick strip '{escape(name)}')")
         except ShellError as ex:
             raise BaseInterfaceException(name, 'interface is not synchronized') from ex
+        finally:
+            running_cache.invalidate()
@@ -1,2 +1,5 @@
 from .running import running_router
 from .configs import configs_router
+from .metrics import metrics_router
+from .debug import debug_router
+from .drift import drift_router
@@ -1,12 +1,18 @@
-from typing import Dict
-from fastapi import APIRouter, Depends, status
-from wg_api.utils import handle_http_exception
+from typing import Dict, List, Optional, Union
+from functools import partial
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from wg_api.utils import config, handle_http_exception
 from wg_api.repositories import WGConfigs, WGClients
-from wg_api.models import WGConfigInterface, WGPeer
+from wg_api.repositories.wg_configs import config_cache
+from wg_api.utils.etag import check_etag
+from wg_api.utils.fast_json import FastJSONResponse
+from wg_api.utils.peer_query import PeerQuery, peer_query
+from wg_api.models import WGConfigInterface, WGPeer, \
+    WGPeerOperation, WGPeerOperationResult, WGPeerPage
 
 
 def configs_repo():
-    return WGConfigs('/etc/wireguard/')
+    return WGConfigs(config.CONFIGS_DIR)
 
 
 configs_router = APIRouter(prefix='/configs', tags=['configs'])
@@ -14,13 +20,36 @@ configs_router = APIRouter(prefix='/configs', tags=['configs'])
 
 @configs_router.get('/all')
 @handle_http_exception()
-async def get_all_interfaces(wg_configs: WGConfigs = Depends(configs_repo)) -> Dict[str, WGConfigInterface]:
-    return await wg_configs.get_all()
+async def get_all_interfaces(request: Request, response: Response, fast: bool = False,
+                             wait: float = Query(0, ge=0, le=config.ETAG_MAX_WAIT),
+                             wg_configs: WGConfigs = Depends(configs_repo)) -> Dict[str, WGConfigInterface]:
+    tag, not_modified = await check_etag(request, wg_configs.get_all_tag, wait)
+    if not_modified is not None:
+        return not_modified
+
+    if fast:
+        return FastJSONResponse(await wg_configs.get_all_records(), request.headers.get('accept-encoding'),
+                                headers={'ETag': tag})
+
+    response.headers['ETag'] = tag
+    return {str(path): interface for path, interface in (await wg_configs.get_all()).items()}
+
+
+@configs_router.get('/cache')
+async def get_cache_stats() -> Dict[str, int]:
+    return config_cache.stats()
 
 
 @configs_router.get('/')
 @handle_http_exception()
-async def get_interface(name: str, wg_configs: WGConfigs = Depends(configs_repo)) -> WGConfigInterface:
+async def get_interface(request: Request, response: Response, name: str,
+                        wait: float = Query(0, ge=0, le=config.ETAG_MAX_WAIT),
+                        wg_configs: WGConfigs = Depends(configs_repo)) -> WGConfigInterface:
+    tag, not_modified = await check_etag(request, partial(wg_configs.get_tag, wg_configs.get_path(name)), wait)
+    if not_modified is not None:
+        return not_modified
+
+    response.headers['ETag'] = tag
     return await wg_configs.get_by_name(name)
 
 
@@ -32,20 +61,35 @@ async def set_interface(name: str, interface: WGConfigInterface, wg_configs: WGC
 
 @configs_router.get('/peers')
 @handle_http_exception()
-async def get_peer(name: str, public_key: str, wg_configs: WGConfigs = Depends(configs_repo)) -> WGPeer:
-    return await wg_configs.get_peer(name, public_key)
+async def get_peer(request: Request, name: str, public_key: Optional[str] = None,
+                   query: PeerQuery = Depends(peer_query),
+                   wg_configs: WGConfigs = Depends(configs_repo)) -> Union[WGPeer, WGPeerPage]:
+    # Without a public key a page of the peers is listed
+    if public_key is None:
+        page = await wg_configs.get_peers(wg_configs.get_path(name), query)
+        return FastJSONResponse(page, request.headers.get('accept-encoding'))
+
+    return await wg_configs.get_peer(wg_configs.get_path(name), public_key)
 
 
 @configs_router.put('/peers', status_code=status.HTTP_204_NO_CONTENT)
 @handle_http_exception()
 async def set_peer(name: str, peer: WGPeer, wg_configs: WGConfigs = Depends(configs_repo)):
-    await wg_configs.set_peer(name, peer)
+    await wg_configs.set_peer(wg_configs.get_path(name), peer)
 
 
 @configs_router.delete('/peers', status_code=status.HTTP_204_NO_CONTENT)
 @handle_http_exception()
 async def remove_peer(name: str, public_key: str, wg_configs: WGConfigs = Depends(configs_repo)):
-    await wg_configs.remove_peer(name, public_key)
+    peer = await wg_configs.remove_peer(wg_configs.get_path(name), public_key)
+    WGClients.release_client_address(WGClients.config_owner(name), peer)
+
+
+@configs_router.post('/peers/bulk')
+@handle_http_exception()
+async def apply_peers(name: str, operations: List[WGPeerOperation],
+                      wg_configs: WGConfigs = Depends(configs_repo)) -> List[WGPeerOperationResult]:
+    return await wg_configs.apply_peers(wg_configs.get_path(name), operations)
 
 
 @configs_router.post('/peers/disable', status_code=status.HTTP_204_NO_CONTENT)
@@ -64,9 +108,15 @@ async def enable_peer(name: str, public_key: str, wg_configs: WGConfigs = Depend
 @handle_http_exception()
 async def create_client(name: str, wg_configs: WGConfigs = Depends(configs_repo)) -> Dict[str, str]:
     interface = await wg_configs.get_by_name(name)
-    client_peer, client_interface = await WGClients.create_client(interface)
-    await wg_configs.set_peer(name, client_peer)
+    owner = WGClients.config_owner(name)
+    client_peer, client_interface = await WGClients.create_client(owner, interface)
+    try:
+        client_config = WGConfigs.make_config(client_interface)
+        await wg_configs.set_peer(wg_configs.get_path(name), client_peer)
+    except BaseException:
+        WGClients.release_client_address(owner, client_peer)
+        raise
     return {
         'public_key': client_peer.public_key,
-        'client_config': WGConfigs.make_config(client_interface),
+        'client_config': client_config,
     }
@@ -0,0 +1,21 @@
+from typing import Any, Dict, List
+from fastapi import APIRouter, Query, status
+from wg_api.utils.tracing import recent_traces, summarize
+
+
+debug_router = APIRouter(prefix='/debug', tags=['debug'])
+
+
+@debug_router.get('/traces')
+async def get_traces(limit: int = Query(20, ge=1)) -> List[Dict[str, Any]]:
+    return [trace.to_dict() for trace in list(recent_traces)[-limit:]]
+
+
+@debug_router.get('/traces/summary')
+async def get_traces_summary() -> Dict[str, Dict[str, float]]:
+    return summarize(list(recent_traces))
+
+
+@debug_router.delete('/traces', status_code=status.HTTP_204_NO_CONTENT)
+async def clear_traces():
+    recent_traces.clear()
@@ -0,0 +1,40 @@
+from typing import Any, Dict, List
+from fastapi import APIRouter, Depends
+from wg_api.utils import handle_http_exception
+from wg_api.repositories import WGConfigs, WGDrift
+from wg_api.routers.configs import configs_repo
+from wg_api.models import WGInterfaceDrift, WGReconcileResult, WGSyncDirection
+
+
+drift_router = APIRouter(prefix='/drift', tags=['drift'])
+
+
+@drift_router.get('/all')
+@handle_http_exception()
+async def get_all_drift(wg_configs: WGConfigs = Depends(configs_repo)) -> List[WGInterfaceDrift]:
+    return await WGDrift.get_all_drift(wg_configs)
+
+
+@drift_router.get('/report')
+async def get_last_report() -> Dict[str, Any]:
+    return WGDrift.get_last_report()
+
+
+@drift_router.get('/')
+@handle_http_exception()
+async def get_drift(name: str, wg_configs: WGConfigs = Depends(configs_repo)) -> WGInterfaceDrift:
+    return await WGDrift.get_drift(wg_configs, name)
+
+
+@drift_router.post('/reconcile/all')
+@handle_http_exception()
+async def reconcile_all(direction: WGSyncDirection, dry_run: bool = False,
+                        wg_configs: WGConfigs = Depends(configs_repo)) -> List[WGReconcileResult]:
+    return await WGDrift.reconcile_all(wg_configs, direction, dry_run)
+
+
+@drift_router.post('/reconcile')
+@handle_http_exception()
+async def reconcile(name: str, direction: WGSyncDirection, dry_run: bool = False,
+                    wg_configs: WGConfigs = Depends(configs_repo)) -> WGReconcileResult:
+    return await WGDrift.reconcile(wg_configs, name, direction, dry_run)
@@ -0,0 +1,27 @@
+from contextlib import suppress
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from wg_api.utils.exceptions import ShellError
+from wg_api.utils.metrics import shell_metrics, render_wg_metrics
+from wg_api.repositories import WGRunning, WGFirewall
+
+
+metrics_router = APIRouter(tags=['metrics'])
+
+
+class MetricsResponse(PlainTextResponse):
+    media_type = 'text/plain; version=0.0.4'
+
+
+@metrics_router.get('/metrics', response_class=MetricsResponse)
+async def get_metrics() -> MetricsResponse:
+    disabled_ips = set()
+    with suppress(ShellError, ValueError):
+        disabled_ips = set(map(str, await WGFirewall.load_disabled_ips()))
+
+    lines = []
+    render_wg_metrics(lines, await WGRunning.get_dump(), disabled_ips,
+                      WGRunning.CONNECTION_DELTA.total_seconds())
+    shell_metrics.render(lines)
+    lines.append('')
+    return MetricsResponse('\n'.join(lines))
@@ -1,10 +1,17 @@
-from typing import List, Dict
-from fastapi import APIRouter, status
-from wg_api.utils import handle_http_exception
+import json
+from functools import partial
+from typing import Any, AsyncIterator, List, Dict, Optional, Union
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from wg_api.utils import config, handle_http_exception
+from wg_api.utils.etag import check_etag
+from wg_api.utils.fast_json import FastJSONResponse
+from wg_api.utils.peer_query import PeerQuery, peer_query
+from wg_api.utils.snapshot_cache import running_cache
 from wg_api.repositories import WGConfigs, \
-    WGRunning, WGClients
-from wg_api.models import WGInterface, \
-    WGRunningInterface, WGPeer, WGRunningPeer
+    WGRunning, WGClients, WGFirewall, WGHistory, WGEvents
+from wg_api.models import WGInterface, WGRunningInterface, WGPeer, \
+    WGRunningPeer, WGPeerOperation, WGPeerOperationResult, WGPeerPage
 
 
 running_router = APIRouter(prefix='/running', tags=['running'])
@@ -12,7 +19,17 @@ running_router = APIRouter(prefix='/running', tags=['running'])
 
 @running_router.get('/all')
 @handle_http_exception()
-async def get_interfaces() -> Dict[str, WGRunningInterface]:
+async def get_interfaces(request: Request, response: Response, fast: bool = False,
+                         wait: float = Query(0, ge=0, le=config.ETAG_MAX_WAIT)) -> Dict[str, WGRunningInterface]:
+    tag, not_modified = await check_etag(request, WGRunning.get_tag, wait)
+    if not_modified is not None:
+        return not_modified
+
+    if fast:
+        return FastJSONResponse(await WGRunning.get_all_records(), request.headers.get('accept-encoding'),
+                                headers={'ETag': tag})
+
+    response.headers['ETag'] = tag
     return await WGRunning.get_all()
 
 
@@ -22,6 +39,49 @@ async def get_statuses() -> dict:
     return await WGRunning.get_status_all()
 
 
+@running_router.get('/cache')
+async def get_cache_stats() -> Dict[str, int]:
+    return running_cache.stats()
+
+
+@running_router.post('/firewall/reconcile')
+@handle_http_exception()
+async def reconcile_firewall() -> Dict[str, List[str]]:
+    return await WGFirewall.reconcile()
+
+
+@running_router.get('/top')
+@handle_http_exception()
+async def get_top_peers(count: int = Query(10, ge=1, le=1000), minutes: Optional[float] = Query(None, gt=0),
+                        name: Optional[str] = None) -> List[Dict[str, Any]]:
+    return WGHistory.get_top(count, minutes, name)
+
+
+async def _stream_events(request: Request) -> AsyncIterator[str]:
+    # Subscribes only once the response is streamed, so a client gone
+    # before that leaves nothing behind
+    subscription = WGEvents.subscribe()
+    try:
+        while not await request.is_disconnected():
+            events = await subscription.get(config.EVENTS_KEEPALIVE)
+            if not events:
+                yield ': keepalive\n\n'
+                continue
+
+            yield ''.join(f"event: {event['event']}\ndata: {json.dumps(event)}\n\n" for event in events)
+    finally:
+        WGEvents.unsubscribe(subscription)
+
+
+@running_router.get('/events')
+async def stream_events(request: Request) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_events(request),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache'},
+    )
+
+
 @running_router.post('/start', status_code=status.HTTP_204_NO_CONTENT)
 @handle_http_exception()
 async def start_interface(name: str):
@@ -54,14 +114,20 @@ async def get_status(name: str) -> dict:
 
 @running_router.get('/')
 @handle_http_exception()
-async def get_interface(name: str) -> WGRunningInterface:
+async def get_interface(request: Request, response: Response, name: str,
+                        wait: float = Query(0, ge=0, le=config.ETAG_MAX_WAIT)) -> WGRunningInterface:
+    tag, not_modified = await check_etag(request, partial(WGRunning.get_tag, name), wait)
+    if not_modified is not None:
+        return not_modified
+
+    response.headers['ETag'] = tag
     return await WGRunning.get_by_name(name)
 
 
-@running_router.put('/', status_code=status.HTTP_204_NO_CONTENT)
+@running_router.put('/')
 @handle_http_exception()
-async def set_interface(name: str, interface: WGInterface):
-    await WGRunning.set_interface(name, interface)
+async def set_interface(name: str, interface: WGInterface) -> Dict[str, int]:
+    return {'changed_peers': await WGRunning.set_interface(name, interface)}
 
 
 @running_router.get('/peers/public_keys')
@@ -70,33 +136,59 @@ async def get_peers_public_keys(name: str) -> List[str]:
     return await WGRunning.get_peers_pks(name)
 
 
+@running_router.get('/peers/history')
+@handle_http_exception()
+async def get_peer_history(name: str, public_key: str,
+                           minutes: Optional[float] = Query(None, gt=0)) -> Dict[str, Any]:
+    return WGHistory.get_peer_history(name, public_key, minutes)
+
+
 @running_router.get('/peers')
 @handle_http_exception()
-async def get_peer(name: str, public_key: str) -> WGRunningPeer:
+async def get_peer(request: Request, name: str, public_key: Optional[str] = None,
+                   query: PeerQuery = Depends(peer_query)) -> Union[WGRunningPeer, WGPeerPage]:
+    # Without a public key a page of the peers is listed
+    if public_key is None:
+        return FastJSONResponse(await WGRunning.get_peers(name, query), request.headers.get('accept-encoding'))
+
     return await WGRunning.get_peer(name, public_key)
 
 
-@running_router.put('/peers', status_code=status.HTTP_204_NO_CONTENT)
+@running_router.put('/peers')
 @handle_http_exception()
-async def set_peer(name: str, peer: WGPeer):
-    await WGRunning.set_peer(name, peer)
+async def set_peer(name: str, peer: WGPeer) -> Dict[str, int]:
+    return {'changed_peers': await WGRunning.set_peer(name, peer)}
 
 
 @running_router.delete('/peers', status_code=status.HTTP_204_NO_CONTENT)
 @handle_http_exception()
 async def remove_peer(name: str, public_key: str):
-    await WGRunning.remove_peer(name, public_key)
+    peer = await WGRunning.remove_peer(name, public_key)
+    WGClients.release_client_address(WGClients.running_owner(name), peer)
+
+
+@running_router.post('/peers/bulk')
+@handle_http_exception()
+async def apply_peers(name: str, operations: List[WGPeerOperation]) -> List[WGPeerOperationResult]:
+    return await WGRunning.apply_peers(name, operations)
 
 
 @running_router.put('/peers/clients')
 @handle_http_exception()
 async def create_client(name: str) -> Dict[str, str]:
     interface = await WGRunning.get_by_name(name)
-    client_peer, client_interface = await WGClients.create_client(interface)
-    await WGRunning.set_peer(name, client_peer)
+    owner = WGClients.running_owner(name)
+    client_peer, client_interface = await WGClients.create_client(owner, interface)
+    try:
+        # The config is rendered before the peer is added, so a failure leaves no orphaned peer
+        client_config = WGConfigs.make_config(client_interface)
+        await WGRunning.set_peer(name, client_peer)
+    except BaseException:
+        WGClients.release_client_address(owner, client_peer)
+        raise
     return {
         'public_key': client_peer.public_key,
-        'client_config': WGConfigs.make_config(client_interface),
+        'client_config': client_config,
     }
 
 
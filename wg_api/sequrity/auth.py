@@ -0,0 +1,131 @@
+import hmac
+import asyncio
+import hashlib
+from contextlib import suppress
+from datetime import datetime
+from typing import Dict, Optional
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import APIKeyHeader
+from wg_api.utils import config
+from wg_api.utils.ttl_cache import TTLCache
+from wg_api.models import WGClientApp as WGClientAppModel
+from wg_api.repositories.wg_client_app import WGClientApp
+from wg_api.sequrity.passwords import verify_password
+from wg_api.db.engine import database
+
+
+class AppAuthenticator:
+
+    flush_interval: float = None
+
+    _apps: WGClientApp = None
+    _cache: TTLCache = None
+    _failures: TTLCache = None
+    _failed_clients: TTLCache = None
+    _max_failures: int = None
+    _auth_dts: Dict[str, datetime] = None
+    _flusher: Optional[asyncio.Task] = None
+
+    def __init__(self, apps: WGClientApp, cache_size: int, cache_ttl: float, flush_interval: float,
+                 failure_ttl: float, max_failures: int):
+        self.flush_interval = flush_interval
+        self._apps = apps
+        self._cache = TTLCache(cache_size, cache_ttl)
+        self._failures = TTLCache(cache_size, failure_ttl)
+        self._failed_clients = TTLCache(cache_size, failure_ttl)
+        self._max_failures = max_failures
+        self._auth_dts = {}
+
+    @staticmethod
+    def _secret_digest(app_key: str, app_secret: str) -> bytes:
+        # The cache keeps a fast digest, never the secret itself
+        return hashlib.sha256(f'{app_key}\0{app_secret}'.encode('utf-8')).digest()
+
+    async def authenticate(self, app_key: str, app_secret: str,
+                           client: Optional[str] = None) -> Optional[WGClientAppModel]:
+        digest = self._secret_digest(app_key, app_secret)
+        cached = self._cache.get(app_key)
+        if cached is not None and hmac.compare_digest(cached[0], digest):
+            self._mark_auth(app_key)
+            return cached[1]
+
+        # Wrong secrets are rejected without hashing them again, and a client
+        # with too many failures is throttled until its failures expire. The
+        # client is throttled rather than the key, so nobody can lock a key out
+        if self._failures.get(digest) is not None \
+                or (self._failed_clients.get(client) or 0) >= self._max_failures:
+            return None
+
+        row = await self._apps.get(app_key)
+        if row is None:
+            self._fail(client, digest)
+            return None
+
+        loop = asyncio.get_event_loop()
+        if not await loop.run_in_executor(None, verify_password, app_secret, row['hashed_password']):
+            self._fail(client, digest)
+            return None
+
+        app = WGClientAppModel(**{field: row[field] for field in WGClientAppModel.__fields__})
+        self._cache.put(app_key, (digest, app))
+        self._mark_auth(app_key)
+        return app
+
+    def _fail(self, client: Optional[str], digest: bytes):
+        self._failures.put(digest, True)
+        self._failed_clients.put(client, (self._failed_clients.get(client) or 0) + 1)
+
+    def forget(self, app_key: str):
+        self._cache.discard(app_key)
+        # A secret rejected before may be the new one
+        self._failures.clear()
+
+    def _mark_auth(self, app_key: str):
+        self._auth_dts[app_key] = datetime.utcnow()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        auth_dts, self._auth_dts = self._auth_dts, {}
+        try:
+            await self._apps.update_auth_dts(auth_dts)
+        except Exception:
+            # Keeps the timestamps for the next flush unless newer ones came
+            self._auth_dts = {**auth_dts, **self._auth_dts}
+            raise
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._flusher
+
+            self._flusher = None
+
+        await self.flush()
+
+
+authenticator = AppAuthenticator(
+    WGClientApp(database), config.AUTH_CACHE_SIZE, config.AUTH_CACHE_TTL,
+    config.AUTH_DT_FLUSH_INTERVAL, config.AUTH_FAILURE_TTL, config.AUTH_MAX_FAILURES
+)
+
+app_key_header = APIKeyHeader(name='X-App-Key', auto_error=False)
+app_secret_header = APIKeyHeader(name='X-App-Secret', auto_error=False)
+
+
+async def verify_app(request: Request, app_key: Optional[str] = Depends(app_key_header),
+                     app_secret: Optional[str] = Depends(app_secret_header)) -> Optional[WGClientAppModel]:
+    if not config.AUTH_ENABLED:
+        return None
+
+    client = request.client.host if request.client else None
+    app = app_key and app_secret and await authenticator.authenticate(app_key, app_secret, client)
+    if not app:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid application credentials')
+
+    return app
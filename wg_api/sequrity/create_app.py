@@ -0,0 +1,35 @@
+import asyncio
+import argparse
+from typing import Optional
+from secrets import token_urlsafe
+from wg_api.db import database, connect_database, disconnect_database
+from wg_api.repositories.wg_client_app import WGClientApp
+from wg_api.sequrity.passwords import hash_password
+
+
+async def create_app(app_key: str, app_secret: str, app_name: Optional[str] = None) -> bool:
+    await connect_database()
+    try:
+        return await WGClientApp(database).set_password(app_key, hash_password(app_secret), app_name)
+    finally:
+        await disconnect_database()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m wg_api.sequrity.create_app',
+        description='Creates an application or resets its secret, the secret is printed once',
+    )
+    parser.add_argument('app_key')
+    parser.add_argument('app_name', nargs='?')
+    args = parser.parse_args()
+
+    app_secret = token_urlsafe(32)
+    created = asyncio.run(create_app(args.app_key, app_secret, args.app_name))
+    print(f'{"Created" if created else "Reset secret of"} application {args.app_key}')
+    print(f'X-App-Key: {args.app_key}')
+    print(f'X-App-Secret: {app_secret}')
+
+
+if __name__ == '__main__':
+    main()
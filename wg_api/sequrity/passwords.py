@@ -0,0 +1,28 @@
+import hmac
+import hashlib
+from base64 import b64encode, b64decode
+from secrets import token_bytes
+
+
+ALGORITHM = 'pbkdf2_sha256'
+ITERATIONS = 260000
+
+
+def hash_password(password: str, iterations: int = ITERATIONS) -> str:
+    salt = token_bytes(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f'{ALGORITHM}${iterations}${b64encode(salt).decode()}${b64encode(digest).decode()}'
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    try:
+        algorithm, iterations, salt, digest = hashed_password.split('$')
+        if algorithm != ALGORITHM:
+            return False
+
+        expected = b64decode(digest)
+        actual = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), b64decode(salt), int(iterations))
+    except ValueError:
+        return False
+
+    return hmac.compare_digest(actual, expected)
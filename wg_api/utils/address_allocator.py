@@ -0,0 +1,86 @@
+from ipaddress import ip_network, IPv4Address, IPv4Network
+from typing import FrozenSet, Iterable, Optional, Union
+
+
+Addresses = Union[str, IPv4Address, IPv4Network]
+
+
+class AddressAllocator:
+
+    network: IPv4Network = None
+    synced_networks: Optional[FrozenSet[IPv4Network]] = None
+
+    _used: bytearray = None
+    _cursor: int = 0
+
+    # One byte per address, so the next free one is found by a C-level
+    # `bytearray.find` instead of iterating over python address objects.
+    # Fixed addresses (network, broadcast, server, configured) are never released
+    _FREE = 0
+    _USED = 1
+    _FIXED = 2
+
+    def __init__(self, network: IPv4Network, reserved: Iterable[Addresses] = ()):
+        self.network = network
+        self._used = bytearray(network.num_addresses)
+        self._fix(self._range(network.network_address))
+        self._fix(self._range(network.broadcast_address))
+        for addresses in reserved:
+            self._fix(self._range(addresses))
+
+    def _range(self, addresses: Addresses) -> range:
+        addresses = ip_network(addresses, strict=False)
+        if addresses.version != self.network.version or not addresses.overlaps(self.network):
+            return range(0)
+
+        start = max(int(addresses.network_address), int(self.network.network_address))
+        end = min(int(addresses.broadcast_address), int(self.network.broadcast_address))
+        offset = int(self.network.network_address)
+        return range(start - offset, end - offset + 1)
+
+    def __contains__(self, addresses: Addresses) -> bool:
+        return bool(self._range(addresses))
+
+    def __len__(self) -> int:
+        return self._used.count(self._FREE)
+
+    def is_used(self, addr: Addresses) -> bool:
+        addr_range = self._range(addr)
+        return bool(addr_range) and self._FREE not in self._used[addr_range.start:addr_range.stop]
+
+    def _fix(self, addr_range: range):
+        self._used[addr_range.start:addr_range.stop] = bytes([self._FIXED]) * len(addr_range)
+
+    def _replace(self, addr_range: range, old: int, new: int):
+        part = self._used[addr_range.start:addr_range.stop]
+        self._used[addr_range.start:addr_range.stop] = part.replace(bytes([old]), bytes([new]))
+
+    def reserve(self, addresses: Addresses):
+        self._replace(self._range(addresses), self._FREE, self._USED)
+
+    def reserve_range(self, first: IPv4Address, last: IPv4Address):
+        offset = int(self.network.network_address)
+        start = max(int(first) - offset, 0)
+        stop = min(int(last) - offset + 1, len(self._used))
+        if start < stop:
+            self._fix(range(start, stop))
+
+    def release(self, addresses: Addresses):
+        addr_range = self._range(addresses)
+        if not addr_range:
+            return
+
+        self._replace(addr_range, self._USED, self._FREE)
+        self._cursor = min(self._cursor, addr_range.start)
+
+    def allocate(self) -> IPv4Address:
+        idx = self._used.find(self._FREE, self._cursor)
+        if idx < 0:
+            idx = self._used.find(self._FREE)
+
+        if idx < 0:
+            raise RuntimeError('All addresses are reserved')
+
+        self._used[idx] = self._USED
+        self._cursor = idx + 1
+        return self.network.network_address + idx
@@ -1,3 +1,5 @@
+import os
+
 
 SERVER_IP = '192.168.1.200'
 
@@ -8,3 +10,69 @@ DEFAULT_POST_UP = [
 DEFAULT_POST_DOWN = [
     'nft delete element inet wg-table interfaces { %i }',
 ]
+
+RUNNING_CACHE_TTL = 2.0
+RUNNING_CACHE_SIZE = 256
+
+CLIENTS_RESERVED_ADDRESSES = []
+
+TRUSTED_CONFIGS = False
+
+PARSE_WORKERS = 4
+PARSE_IN_PROCESSES = False
+
+NFT_BATCH_DELAY = 0.01
+NFT_BATCH_SIZE = 1000
+
+FIREWALL_RECONCILE_INTERVAL = 60
+
+SHELL_POOL_SIZE = 4
+SHELL_TIMEOUT = 30.0
+SHELL_MAX_PENDING = 1024
+SHELL_OUTPUT_LIMIT = 64 * 1024 * 1024
+
+KEY_POOL_SIZE = 64
+
+HISTORY_INTERVAL = 10.0
+HISTORY_SIZE = 60
+
+EVENTS_POLL_INTERVAL = 1.0
+EVENTS_MAX_PENDING = 10000
+EVENTS_KEEPALIVE = 15.0
+
+TRACE_ENABLED = os.environ.get('WG_API_TRACE', '') not in ('', '0')
+TRACE_HEADER = os.environ.get('WG_API_TRACE_HEADER', '') not in ('', '0')
+TRACE_PROFILER = os.environ.get('WG_API_PROFILE') or None
+TRACE_PROFILE_HEADER = os.environ.get('WG_API_PROFILE_HEADER', '') not in ('', '0')
+TRACE_HISTORY = 100
+TRACE_PROFILE_LINES = 40
+
+AUTH_ENABLED = os.environ.get('WG_API_AUTH', '1') not in ('', '0')
+AUTH_CACHE_SIZE = 1024
+AUTH_CACHE_TTL = 300.0
+AUTH_DT_FLUSH_INTERVAL = 30.0
+AUTH_FAILURE_TTL = 30.0
+AUTH_MAX_FAILURES = 10
+
+DB_POOL_SIZE = 4
+DB_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'foreign_keys': 'ON',
+    'temp_store': 'MEMORY',
+    'cache_size': -8000,
+}
+
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 4
+BROTLI_QUALITY = 4
+
+ETAG_POLL_INTERVAL = 1.0
+ETAG_MAX_WAIT = 300.0
+
+CONFIGS_DIR = '/etc/wireguard/'
+
+DRIFT_INTERVAL = 300.0
+DRIFT_DIRECTION = 'to_running'
+DRIFT_DRY_RUN = True
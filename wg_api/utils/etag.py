@@ -0,0 +1,70 @@
+import time
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, \
+    Iterable, Optional, Set, Tuple
+from starlette.requests import Request
+from starlette.responses import Response
+from wg_api.utils import config
+from wg_api.utils.wg_netlink import WGDump
+
+
+def make_etag(value: Any) -> str:
+    # For small states (stat keys of the configs)
+    return f'"{hashlib.blake2b(repr(value).encode(), digest_size=12).hexdigest()}"'
+
+
+def dump_etag(dump: WGDump, now: float, connection_delta: float, *extra: Any) -> str:
+    # The dump values are digested as they are, without building its text
+    digest = hashlib.blake2b(digest_size=12)
+    for name, (device, peers) in dump.items():
+        digest.update(repr((name, device)).encode())
+        for peer in peers:
+            handshake = peer.latest_handshake
+            digest.update(repr((
+                *peer[:3], tuple(peer.allowed_ips), *peer[4:],
+                bool(handshake) and now - handshake < connection_delta,
+            )).encode())
+
+    digest.update(repr(extra).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def parse_if_none_match(value: Optional[str]) -> Set[str]:
+    if not value:
+        return set()
+
+    # Weak comparison, as If-None-Match requires
+    tags = set()
+    for tag in value.split(','):
+        tag = tag.strip()
+        if tag:
+            tags.add(tag[2:] if tag.startswith('W/') else tag)
+
+    return tags
+
+
+def is_matched(tag: str, tags: Iterable[str]) -> bool:
+    return '*' in tags or tag in tags
+
+
+async def check_etag(request: Request, get_tag: Callable[[], Awaitable[str]],
+                     wait: float = 0) -> Tuple[str, Optional[Response]]:
+    # With `wait` a request for the current state is held until the state
+    # changes, so a client can poll without getting the same state again
+    tags = parse_if_none_match(request.headers.get('if-none-match'))
+    tag = await get_tag()
+    deadline = time.monotonic() + wait
+    while is_matched(tag, tags) and time.monotonic() < deadline:
+        await asyncio.sleep(min(config.ETAG_POLL_INTERVAL, deadline - time.monotonic()))
+        if await request.is_disconnected():
+            break
+
+        tag = await get_tag()
+
+    # Weak tags: the same state is sent as models or fast JSON, compressed or not
+    etag = f'W/{tag}'
+    if is_matched(tag, tags):
+        return etag, Response(status_code=304, headers={'ETag': etag})
+
+    return etag, None
@@ -0,0 +1,80 @@
+import asyncio
+from typing import Any, Dict, Hashable, Iterable, List, Set, Tuple
+
+
+Event = Dict[str, Any]
+
+
+class Subscription:
+
+    max_pending: int = None
+    overflows: int = 0
+
+    _overflowed: bool = False
+    _pending: Dict[Hashable, Event] = None
+    _ready: asyncio.Event = None
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self._pending = {}
+        self._ready = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def push(self, key: Hashable, event: Event):
+        if self._overflowed:
+            return
+
+        # A newer event for the same key replaces the queued one, so a slow
+        # subscriber gets the latest state instead of the whole history
+        if self._pending.pop(key, None) is None and len(self._pending) >= self.max_pending:
+            self._pending.clear()
+            self._overflowed = True
+            self.overflows += 1
+        else:
+            self._pending[key] = event
+
+        self._ready.set()
+
+    async def get(self, timeout: float = None) -> List[Event]:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+
+        self._ready.clear()
+        if self._overflowed:
+            self._overflowed = False
+            return [{'event': 'overflow'}]
+
+        events = list(self._pending.values())
+        self._pending.clear()
+        return events
+
+
+class EventHub:
+
+    _subscriptions: Set[Subscription] = None
+
+    def __init__(self):
+        self._subscriptions = set()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self, max_pending: int) -> Subscription:
+        subscription = Subscription(max_pending)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def publish(self, events: Iterable[Tuple[Hashable, Event]]):
+        if not self._subscriptions:
+            return
+
+        for key, event in events:
+            for subscription in self._subscriptions:
+                subscription.push(key, event)
@@ -20,6 +20,26 @@ class ShellError(RuntimeError):
         return msg
 
 
+class NetlinkError(RuntimeError):
+
+    err_code = None
+    err_msg = None
+
+    def __init__(self, err_code, err_msg=None):
+        self.err_code = err_code
+        self.err_msg = err_msg
+
+    def __str__(self):
+        msg = 'Netlink request error'
+        if self.err_msg:
+            msg += f' "{self.err_msg}"'
+
+        if self.err_code:
+            msg += f' (code: {self.err_code})'
+
+        return msg
+
+
 class ParseConfigError(RuntimeError):
 
     reason = None
@@ -95,3 +115,25 @@ class NotFoundPeerException(BasePeerException):
 
     def __str__(self):
         return f'Interface "{self.name}" does not have a peer "{self.public_key}"'
+
+
+class IncorrectKey(ValueError):
+
+    key = None
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def __str__(self):
+        return f'Incorrect key "{self.key}"'
+
+
+class IncorrectPeerQuery(ValueError):
+
+    reason = None
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+    def __str__(self):
+        return f'Incorrect peer query: {self.reason}'
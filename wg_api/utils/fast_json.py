@@ -0,0 +1,131 @@
+import gzip
+import orjson
+from enum import Enum
+from ipaddress import IPv4Address, IPv4Interface, IPv6Address, IPv6Interface
+from typing import Any, Dict, List, Optional, Set
+from pydantic import BaseModel
+from starlette.responses import Response
+from wg_api.utils import config
+from wg_api.utils.wg_netlink import WGDeviceInfo, WGPeerInfo
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+_ADDRESS_TYPES = (IPv4Address, IPv4Interface, IPv6Address, IPv6Interface)
+
+# Running interfaces carry no config-only options
+_RUNNING_EMPTY_OPTIONS = {
+    'mtu': None, 'table': None, 'save_conf': None,
+    'pre_up': None, 'post_up': None, 'pre_down': None, 'post_down': None, 'dns': None,
+}
+
+
+def model_record(value: Any) -> Any:
+    # Same output as `jsonable_encoder` for the models of this API,
+    # without validation and per-field encoder lookups
+    if isinstance(value, BaseModel):
+        return {name: model_record(getattr(value, name)) for name in value.__fields__}
+
+    if isinstance(value, list):
+        return [model_record(item) for item in value]
+
+    if isinstance(value, _ADDRESS_TYPES):
+        return str(value)
+
+    if isinstance(value, Enum):
+        return value.value
+
+    return value
+
+
+def running_peer_record(peer: WGPeerInfo, connected: bool, disabled: bool) -> Dict[str, Any]:
+    return {
+        'public_key': peer.public_key,
+        'keepalive': peer.keepalive,
+        'end_point': peer.end_point,
+        'preshared_key': peer.preshared_key,
+        'allowed_ips': peer.allowed_ips or None,
+        'latest_handshake': peer.latest_handshake,
+        'transfer_rx': peer.transfer_rx,
+        'transfer_tx': peer.transfer_tx,
+        'connected': connected,
+        'disabled': disabled,
+    }
+
+
+def running_interface_record(device: WGDeviceInfo, peers: List[WGPeerInfo], addresses: List[str],
+                             disabled_ips: Set[str], now: float, connection_delta: float) -> Dict[str, Any]:
+    peer_records = []
+    for peer in peers:
+        handshake = peer.latest_handshake
+        disabled = False
+        if disabled_ips:
+            disabled = any(allowed_ip.split('/', 1)[0] in disabled_ips for allowed_ip in peer.allowed_ips)
+
+        peer_records.append(running_peer_record(
+            peer, bool(handshake) and now - handshake < connection_delta, disabled
+        ))
+
+    return {
+        'private_key': device.private_key,
+        'address': addresses,
+        'fw_mark': None if device.fw_mark is None else str(device.fw_mark),
+        'listen_port': device.listen_port,
+        **_RUNNING_EMPTY_OPTIONS,
+        'peers': peer_records,
+        'public_key': device.public_key,
+    }
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    encodings = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+
+        if name:
+            encodings[name.lower()] = quality
+
+    return encodings
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    if not accept_encoding:
+        return None
+
+    encodings = _accepted_encodings(accept_encoding)
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+    quality, encoding = max((encodings.get(name, encodings.get('*', 0.0)), name) for name in supported)
+    # On equal quality brotli wins, it compresses JSON noticeably better
+    if encodings.get('br', 0.0) == quality and 'br' in supported:
+        encoding = 'br'
+
+    return encoding if quality > 0 else None
+
+
+class FastJSONResponse(Response):
+
+    media_type = 'application/json'
+
+    def __init__(self, content: Any, accept_encoding: str = None, status_code: int = 200,
+                 headers: Dict[str, str] = None):
+        body = orjson.dumps(content)
+        headers = {**(headers or {}), 'Vary': 'Accept-Encoding'}
+        encoding = choose_encoding(accept_encoding) if len(body) >= config.COMPRESS_MIN_SIZE else None
+        if encoding == 'br':
+            body = brotli.compress(body, quality=config.BROTLI_QUALITY)
+            headers['Content-Encoding'] = 'br'
+        elif encoding == 'gzip':
+            body = gzip.compress(body, compresslevel=config.GZIP_LEVEL)
+            headers['Content-Encoding'] = 'gzip'
+
+        super().__init__(body, status_code=status_code, headers=headers)
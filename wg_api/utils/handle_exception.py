@@ -10,5 +10,7 @@ async def handle_http_exception():
         yield
     except (NotFoundInterface, NotFoundPeerException) as ex:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(ex))
+    except (IncorrectKey, IncorrectPeerQuery) as ex:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ex))
     except (BaseInterfaceException, BasePeerException) as ex:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(ex))
@@ -0,0 +1,145 @@
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+from wg_api.utils.wg_netlink import WGDump
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def command_label(cmd: str) -> str:
+    # `wg set 'wg0' ...` -> `wg set`, quoted arguments are never part of the label
+    words = []
+    for word in cmd.split(None, 2)[:2]:
+        if word.startswith(("'", '"', '<', '|', '&', ';')):
+            break
+
+        words.append(word)
+
+    return ' '.join(words)
+
+
+def _header(lines: List[str], name: str, metric_type: str, help_text: str):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {metric_type}')
+
+
+class CommandStats:
+
+    count: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    buckets: List[int] = None
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, seconds: float, failed: bool):
+        self.count += 1
+        self.total_seconds += seconds
+        if failed:
+            self.errors += 1
+
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+class ShellMetrics:
+
+    _commands: Dict[str, CommandStats] = None
+
+    def __init__(self):
+        self._commands = {}
+
+    def observe(self, cmd: str, seconds: float, failed: bool = False):
+        label = command_label(cmd)
+        stats = self._commands.get(label)
+        if stats is None:
+            stats = self._commands[label] = CommandStats()
+
+        stats.observe(seconds, failed)
+
+    def render(self, lines: List[str]):
+        commands = sorted((escape_label(label), stats) for label, stats in self._commands.items())
+
+        _header(lines, 'wg_api_shell_commands_total', 'counter', 'Executed shell commands.')
+        for label, stats in commands:
+            lines.append(f'wg_api_shell_commands_total{{command="{label}"}} {stats.count}')
+
+        _header(lines, 'wg_api_shell_command_errors_total', 'counter', 'Failed shell commands.')
+        for label, stats in commands:
+            lines.append(f'wg_api_shell_command_errors_total{{command="{label}"}} {stats.errors}')
+
+        name = 'wg_api_shell_command_duration_seconds'
+        _header(lines, name, 'histogram', 'Shell command execution time.')
+        for label, stats in commands:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(f'{name}_bucket{{command="{label}",le="{bound}"}} {cumulative}')
+
+            lines.append(f'{name}_bucket{{command="{label}",le="+Inf"}} {stats.count}')
+            lines.append(f'{name}_sum{{command="{label}"}} {stats.total_seconds}')
+            lines.append(f'{name}_count{{command="{label}"}} {stats.count}')
+
+
+def _is_disabled(allowed_ips: Iterable[str], disabled_ips: Set[str]) -> bool:
+    for allowed_ip in allowed_ips:
+        if allowed_ip.split('/', 1)[0] in disabled_ips:
+            return True
+
+    return False
+
+
+def render_wg_metrics(lines: List[str], dump: WGDump, disabled_ips: Set[str],
+                      connection_delta: float, now: float = None):
+    now = time.time() if now is None else now
+    # Labels and flags are computed once per peer and reused by every family
+    rows: List[Tuple[str, int, int, int, int, int]] = []
+    interfaces: List[Tuple[str, int, int, int]] = []
+    for name, (_, peers) in dump.items():
+        interface_label = f'interface="{escape_label(name)}"'
+        rx_total = tx_total = 0
+        for peer in peers:
+            handshake = peer.latest_handshake
+            rx = peer.transfer_rx or 0
+            tx = peer.transfer_tx or 0
+            rx_total += rx
+            tx_total += tx
+            rows.append((
+                f'{{{interface_label},public_key="{peer.public_key}"}}',
+                rx, tx,
+                int(now - handshake) if handshake else -1,
+                1 if handshake and now - handshake < connection_delta else 0,
+                1 if disabled_ips and _is_disabled(peer.allowed_ips, disabled_ips) else 0,
+            ))
+
+        interfaces.append((f'{{{interface_label}}}', len(peers), rx_total, tx_total))
+
+    _header(lines, 'wireguard_interface_peers', 'gauge', 'Number of peers of the interface.')
+    lines.extend(f'wireguard_interface_peers{labels} {peers}' for labels, peers, _, _ in interfaces)
+    _header(lines, 'wireguard_interface_receive_bytes_total', 'counter', 'Bytes received by all peers.')
+    lines.extend(f'wireguard_interface_receive_bytes_total{labels} {rx}' for labels, _, rx, _ in interfaces)
+    _header(lines, 'wireguard_interface_transmit_bytes_total', 'counter', 'Bytes sent to all peers.')
+    lines.extend(f'wireguard_interface_transmit_bytes_total{labels} {tx}' for labels, _, _, tx in interfaces)
+
+    _header(lines, 'wireguard_peer_receive_bytes_total', 'counter', 'Bytes received from the peer.')
+    lines.extend(f'wireguard_peer_receive_bytes_total{row[0]} {row[1]}' for row in rows)
+    _header(lines, 'wireguard_peer_transmit_bytes_total', 'counter', 'Bytes sent to the peer.')
+    lines.extend(f'wireguard_peer_transmit_bytes_total{row[0]} {row[2]}' for row in rows)
+    _header(lines, 'wireguard_peer_handshake_age_seconds', 'gauge',
+            'Seconds since the latest handshake, peers without a handshake are omitted.')
+    lines.extend(f'wireguard_peer_handshake_age_seconds{row[0]} {row[3]}' for row in rows if row[3] >= 0)
+    _header(lines, 'wireguard_peer_connected', 'gauge', 'Whether the peer made a recent handshake.')
+    lines.extend(f'wireguard_peer_connected{row[0]} {row[4]}' for row in rows)
+    _header(lines, 'wireguard_peer_disabled', 'gauge', 'Whether the peer is disabled by the firewall.')
+    lines.extend(f'wireguard_peer_disabled{row[0]} {row[5]}' for row in rows)
+
+
+shell_metrics = ShellMetrics()
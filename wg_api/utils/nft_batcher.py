@@ -0,0 +1,87 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, \
+    Iterable, List, Optional, Set
+
+
+class NftBatcher:
+
+    delay: float = None
+    max_size: int = None
+
+    _commit: Callable[[Dict[str, bool]], Awaitable[None]] = None
+    _elements: Dict[str, bool] = None
+    _waiters: List[asyncio.Future] = None
+    _timer: Optional[asyncio.TimerHandle] = None
+    _lock: Optional[asyncio.Lock] = None
+    _tasks: Set[asyncio.Future] = None
+
+    def __init__(self, commit: Callable[[Dict[str, bool]], Awaitable[None]],
+                 delay: float, max_size: int):
+        self.delay = delay
+        self.max_size = max_size
+        self._commit = commit
+        self._elements = {}
+        self._waiters = []
+        self._tasks = set()
+
+    def __len__(self) -> int:
+        return len(self._elements)
+
+    def _queue(self, elements: Iterable[str], add: bool):
+        for element in elements:
+            # The latest operation on an element wins and keeps its order
+            self._elements.pop(element, None)
+            self._elements[element] = add
+
+    def submit(self, add: Iterable[str] = (), delete: Iterable[str] = ()) -> asyncio.Future:
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._queue(add, True)
+        self._queue(delete, False)
+        if not self._elements:
+            future.set_result(None)
+            return future
+
+        self._waiters.append(future)
+        if len(self._elements) >= self.max_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.delay, self.flush)
+
+        return future
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._waiters:
+            return
+
+        elements, waiters = self._elements, self._waiters
+        self._elements, self._waiters = {}, []
+        task = asyncio.ensure_future(self._flush(elements, waiters))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def drain(self):
+        self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _flush(self, elements: Dict[str, bool], waiters: List[asyncio.Future]):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        # Batches are committed in order, a later one may revert an earlier one
+        async with self._lock:
+            try:
+                await self._commit(elements)
+            except Exception as ex:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(ex)
+            else:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
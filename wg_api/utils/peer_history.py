@@ -0,0 +1,152 @@
+import heapq
+from array import array
+from typing import Dict, List, Optional, Tuple
+from wg_api.utils.wg_netlink import WGDump
+
+
+PeerKey = Tuple[str, str]
+
+
+class PeerSeries:
+
+    __slots__ = ('last_rx', 'last_tx', 'last_seen', 'started', 'rx_rates', 'tx_rates')
+
+    def __init__(self, capacity: int, started: int):
+        self.last_rx: Optional[int] = None
+        self.last_tx: Optional[int] = None
+        self.last_seen = started
+        # Rates are known from the sample after the first one
+        self.started = started
+        # float32 rates keep a peer at 8 bytes per sample
+        self.rx_rates = array('f', bytes(4 * capacity))
+        self.tx_rates = array('f', bytes(4 * capacity))
+
+
+def _rate(value: Optional[int], last: Optional[int], elapsed: float) -> float:
+    if value is None or last is None or elapsed <= 0:
+        return 0.0
+
+    # Counters start from zero again when the interface or the peer is recreated
+    delta = value - last if value >= last else value
+    return delta / elapsed
+
+
+class ThroughputHistory:
+
+    capacity: int = None
+    samples: int = 0
+
+    _times: array = None
+    _peers: Dict[PeerKey, PeerSeries] = None
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._times = array('d', bytes(8 * capacity))
+        self._peers = {}
+
+    def __len__(self) -> int:
+        return len(self._peers)
+
+    def __contains__(self, key: PeerKey) -> bool:
+        return key in self._peers
+
+    def _window(self, since: float = None) -> List[int]:
+        # Sample numbers in the window, the oldest first
+        count = min(self.samples, self.capacity)
+        return [sample for sample in range(self.samples - count + 1, self.samples + 1)
+                if since is None or self._times[(sample - 1) % self.capacity] >= since]
+
+    def _ranges(self, window: List[int]) -> List[Tuple[int, int]]:
+        # The window as at most two contiguous slices of the ring
+        ranges = []
+        for sample in window:
+            slot = (sample - 1) % self.capacity
+            if ranges and ranges[-1][1] == slot:
+                ranges[-1] = (ranges[-1][0], slot + 1)
+            else:
+                ranges.append((slot, slot + 1))
+
+        return ranges
+
+    def record(self, dump: WGDump, now: float):
+        slot = self.samples % self.capacity
+        elapsed = now - self._times[(self.samples - 1) % self.capacity] if self.samples else 0.0
+        self._times[slot] = now
+        self.samples += 1
+        sample = self.samples
+
+        for name, (_, peers) in dump.items():
+            for peer in peers:
+                key = (name, peer.public_key)
+                series = self._peers.get(key)
+                if series is None:
+                    series = self._peers[key] = PeerSeries(self.capacity, sample)
+                elif series.last_seen != sample - 1:
+                    # The peer was missing from the previous sample
+                    series.last_rx = series.last_tx = None
+
+                series.rx_rates[slot] = _rate(peer.transfer_rx, series.last_rx, elapsed)
+                series.tx_rates[slot] = _rate(peer.transfer_tx, series.last_tx, elapsed)
+                series.last_rx = peer.transfer_rx
+                series.last_tx = peer.transfer_tx
+                series.last_seen = sample
+
+        # Missing peers transfer nothing and are dropped once they leave the window
+        for key, series in list(self._peers.items()):
+            if series.last_seen == sample:
+                continue
+
+            if sample - series.last_seen >= self.capacity:
+                del self._peers[key]
+            else:
+                series.rx_rates[slot] = series.tx_rates[slot] = 0.0
+
+    def series(self, key: PeerKey, since: float = None) -> List[Tuple[float, Optional[float], Optional[float]]]:
+        series = self._peers[key]
+        result = []
+        for sample in self._window(since):
+            slot = (sample - 1) % self.capacity
+            if sample <= series.started:
+                result.append((self._times[slot], None, None))
+            else:
+                result.append((self._times[slot], series.rx_rates[slot], series.tx_rates[slot]))
+
+        return result
+
+    def summary(self, key: PeerKey, since: float = None) -> Dict[str, Optional[float]]:
+        rates = [(rx_rate, tx_rate) for _, rx_rate, tx_rate in self.series(key, since) if rx_rate is not None]
+        rx_rates = [rx_rate for rx_rate, _ in rates]
+        tx_rates = [tx_rate for _, tx_rate in rates]
+        return {
+            'rx_rate': rx_rates[-1] if rates else None,
+            'tx_rate': tx_rates[-1] if rates else None,
+            'rx_peak': max(rx_rates) if rates else None,
+            'tx_peak': max(tx_rates) if rates else None,
+            'rx_avg': sum(rx_rates) / len(rates) if rates else None,
+            'tx_avg': sum(tx_rates) / len(rates) if rates else None,
+        }
+
+    def top(self, count: int, since: float = None, name: str = None) -> List[Tuple[PeerKey, float, float]]:
+        window = self._window(since)
+        if not window:
+            return []
+
+        ranges = self._ranges(window)
+        averages = []
+        for key, series in self._peers.items():
+            if name is not None and key[0] != name:
+                continue
+
+            # Slots before the peer started are zero, so only the divisor differs
+            samples = min(len(window), self.samples - series.started)
+            if samples <= 0:
+                continue
+
+            rx_total = tx_total = 0.0
+            for start, stop in ranges:
+                rx_total += sum(series.rx_rates[start:stop])
+                tx_total += sum(series.tx_rates[start:stop])
+
+            averages.append((key, rx_total / samples, tx_total / samples))
+
+        return heapq.nlargest(count, averages, key=lambda item: item[1] + item[2])
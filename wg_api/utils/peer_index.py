@@ -0,0 +1,123 @@
+from ipaddress import ip_address, ip_interface, IPv4Address, \
+    IPv6Address, IPv4Interface, IPv6Interface
+from typing import Any, Dict, Generic, Iterable, \
+    Iterator, List, Optional, Tuple, TypeVar, Union
+
+
+Peer = TypeVar('Peer')
+Address = Union[str, int, Any]
+
+
+class PrefixIndex(Generic[Peer]):
+
+    _tables: Dict[int, Dict[int, List[Peer]]] = None
+    _max_prefixlen: int = None
+
+    def __init__(self, max_prefixlen: int):
+        self._tables = {}
+        self._max_prefixlen = max_prefixlen
+
+    def _mask(self, prefixlen: int) -> int:
+        return ((1 << prefixlen) - 1) << (self._max_prefixlen - prefixlen)
+
+    def add(self, network_addr: int, prefixlen: int, peer: Peer):
+        table = self._tables.setdefault(prefixlen, {})
+        table.setdefault(network_addr & self._mask(prefixlen), []).append(peer)
+
+    def remove(self, network_addr: int, prefixlen: int, peer: Peer):
+        table = self._tables.get(prefixlen)
+        if table is None:
+            return
+
+        key = network_addr & self._mask(prefixlen)
+        peers = [table_peer for table_peer in table.get(key, []) if table_peer is not peer]
+        if peers:
+            table[key] = peers
+        else:
+            table.pop(key, None)
+
+        if not table:
+            del self._tables[prefixlen]
+
+    def find(self, addr: int) -> Iterator[Peer]:
+        for prefixlen, table in self._lookup_order:
+            yield from table.get(addr & self._mask(prefixlen), ())
+
+    @property
+    def _lookup_order(self) -> List[Tuple[int, Dict[int, List[Peer]]]]:
+        return sorted(self._tables.items(), reverse=True, key=lambda item: item[0])
+
+
+class PeerIndex(Generic[Peer]):
+
+    _by_key: Dict[str, Peer] = None
+    _by_ip: Dict[Any, List[Peer]] = None
+    _prefixes: Dict[int, PrefixIndex[Peer]] = None
+
+    def __init__(self, peers: Iterable[Peer] = ()):
+        self._by_key = {}
+        self._by_ip = {}
+        self._prefixes = {4: PrefixIndex(32), 6: PrefixIndex(128)}
+        for peer in peers:
+            self.add(peer)
+
+    @staticmethod
+    def _interfaces(peer: Peer) -> Iterator[Union[IPv4Interface, IPv6Interface]]:
+        for allowed_ip in peer.allowed_ips or ():
+            yield allowed_ip if isinstance(allowed_ip, (IPv4Interface, IPv6Interface)) \
+                else ip_interface(allowed_ip)
+
+    @staticmethod
+    def _address(addr: Address) -> Union[IPv4Address, IPv6Address]:
+        return addr if isinstance(addr, (IPv4Address, IPv6Address)) else ip_address(addr)
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def __contains__(self, public_key: str) -> bool:
+        return public_key in self._by_key
+
+    def __iter__(self) -> Iterator[Peer]:
+        return iter(self._by_key.values())
+
+    def add(self, peer: Peer):
+        if peer.public_key in self._by_key:
+            self.remove(peer.public_key)
+
+        self._by_key[peer.public_key] = peer
+        for interface in self._interfaces(peer):
+            self._by_ip.setdefault(interface.ip, []).append(peer)
+            network = interface.network
+            self._prefixes[network.version].add(int(network.network_address), network.prefixlen, peer)
+
+    def remove(self, public_key: str) -> Optional[Peer]:
+        peer = self._by_key.pop(public_key, None)
+        if peer is None:
+            return None
+
+        for interface in self._interfaces(peer):
+            peers = [ip_peer for ip_peer in self._by_ip.get(interface.ip, []) if ip_peer is not peer]
+            if peers:
+                self._by_ip[interface.ip] = peers
+            else:
+                self._by_ip.pop(interface.ip, None)
+
+            network = interface.network
+            self._prefixes[network.version].remove(int(network.network_address), network.prefixlen, peer)
+
+        return peer
+
+    def get(self, public_key: str) -> Optional[Peer]:
+        return self._by_key.get(public_key)
+
+    def by_ip(self, addr: Address) -> List[Peer]:
+        return self._by_ip.get(self._address(addr), [])
+
+    def routes(self, addr: Address) -> List[Peer]:
+        addr = self._address(addr)
+        routes = {id(peer): peer for peer in self._prefixes[addr.version].find(int(addr))}
+        return list(routes.values())
+
+    def is_routed(self, addr: Address) -> bool:
+        addr = self._address(addr)
+        return next(self._prefixes[addr.version].find(int(addr)), None) is not None
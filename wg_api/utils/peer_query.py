@@ -0,0 +1,131 @@
+import heapq
+import socket
+from ipaddress import ip_interface, ip_network, IPv4Network
+from typing import Any, Callable, Collection, Dict, Iterable, \
+    List, Optional, Tuple, TypeVar
+from fastapi import HTTPException, Query, status
+from wg_api.utils.exceptions import IncorrectPeerQuery
+
+
+Peer = TypeVar('Peer')
+
+
+class PeerQuery:
+
+    cursor: Optional[str] = None
+    limit: int = None
+    connected: Optional[bool] = None
+    disabled: Optional[bool] = None
+    handshake_older: Optional[float] = None
+    prefix: Optional[str] = None
+    key_prefix: Optional[str] = None
+    fields: Optional[Tuple[str, ...]] = None
+
+    _network: Any = None
+    _network_int: int = None
+    _network_mask: int = None
+
+    def __init__(self, cursor: Optional[str] = None, limit: int = 50, connected: Optional[bool] = None,
+                 disabled: Optional[bool] = None, handshake_older: Optional[float] = None,
+                 prefix: Optional[str] = None, key_prefix: Optional[str] = None, fields: Optional[str] = None):
+        self.cursor = cursor or None
+        self.limit = limit
+        self.connected = connected
+        self.disabled = disabled
+        self.handshake_older = handshake_older
+        self.prefix = prefix or None
+        self.key_prefix = key_prefix or None
+        if fields:
+            self.fields = tuple(field for field in map(str.strip, fields.split(',')) if field)
+
+        if self.prefix is not None:
+            try:
+                self._network = ip_network(self.prefix, strict=False)
+            except ValueError as ex:
+                raise IncorrectPeerQuery(f'incorrect prefix "{self.prefix}"') from ex
+
+            if isinstance(self._network, IPv4Network):
+                self._network_int = int(self._network.network_address)
+                self._network_mask = int(self._network.netmask)
+
+    def check(self, fields: Collection[str], unsupported: Dict[str, Any] = None):
+        if self.fields is not None:
+            unknown = [field for field in self.fields if field not in fields]
+            if unknown:
+                raise IncorrectPeerQuery(f'unknown fields {", ".join(unknown)}')
+
+        for name, value in (unsupported or {}).items():
+            if value is not None:
+                raise IncorrectPeerQuery(f'filter "{name}" is not supported')
+
+    def wants(self, field: str) -> bool:
+        return self.fields is None or field in self.fields
+
+    def _ip_within(self, allowed_ip: str) -> bool:
+        addr, _, prefixlen = allowed_ip.partition('/')
+        if self._network_int is not None and ':' not in addr:
+            # The common IPv4 case without the ipaddress objects
+            try:
+                addr_int = int.from_bytes(socket.inet_aton(addr), 'big')
+            except OSError:
+                return False
+
+            return (addr_int & self._network_mask == self._network_int
+                    and int(prefixlen or 32) >= self._network.prefixlen)
+
+        try:
+            network = ip_interface(allowed_ip).network
+        except ValueError:
+            return False
+
+        return network.version == self._network.version and network.subnet_of(self._network)
+
+    def match(self, public_key: str, allowed_ips: Iterable[str]) -> bool:
+        # Filters shared by all the peers, the cheapest go first
+        if self.cursor is not None and public_key <= self.cursor:
+            return False
+
+        if self.key_prefix is not None and not public_key.startswith(self.key_prefix):
+            return False
+
+        if self._network is not None:
+            return any(self._ip_within(str(allowed_ip)) for allowed_ip in allowed_ips or ())
+
+        return True
+
+    def select(self, peers: Iterable[Peer],
+               match: Callable[[Peer], bool] = None) -> Tuple[List[Peer], Optional[str], int]:
+        # Peers are ordered by the public key and the cursor is the last
+        # key of the page, so pages stay stable while peers are changed
+        matched = [peer for peer in peers if self.match(peer.public_key, peer.allowed_ips)
+                   and (match is None or match(peer))]
+        page = heapq.nsmallest(self.limit + 1, matched, key=lambda peer: peer.public_key)
+        next_cursor = None
+        if len(page) > self.limit:
+            page = page[:self.limit]
+            next_cursor = page[-1].public_key
+
+        return page, next_cursor, len(matched)
+
+    def project(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        if self.fields is None:
+            return record
+
+        return {field: record[field] for field in self.fields}
+
+    def page(self, records: List[Dict[str, Any]], next_cursor: Optional[str], total: int) -> Dict[str, Any]:
+        return {
+            'peers': [self.project(record) for record in records],
+            'next_cursor': next_cursor,
+            'total': total,
+        }
+
+
+def peer_query(cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=1000),
+               connected: Optional[bool] = None, disabled: Optional[bool] = None,
+               handshake_older: Optional[float] = Query(None, ge=0), prefix: Optional[str] = None,
+               key_prefix: Optional[str] = None, fields: Optional[str] = None) -> PeerQuery:
+    try:
+        return PeerQuery(cursor, limit, connected, disabled, handshake_older, prefix, key_prefix, fields)
+    except IncorrectPeerQuery as ex:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ex))
@@ -0,0 +1,151 @@
+import os
+import signal
+import asyncio
+from uuid import uuid4
+from contextlib import suppress
+from typing import List, Optional, Tuple
+from wg_api.utils.exceptions import ShellError
+
+
+PIPE = asyncio.subprocess.PIPE
+
+
+class ShellWorker:
+
+    _proc: Optional[asyncio.subprocess.Process] = None
+    _output_limit: int = None
+
+    _CMD_VAR = '__wg_cmd'
+
+    def __init__(self, output_limit: int):
+        self._output_limit = output_limit
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.returncode is None
+
+    async def start(self):
+        self._proc = await asyncio.create_subprocess_exec(
+            '/bin/bash', '--noprofile', '--norc',
+            stdin=PIPE, stdout=PIPE, stderr=PIPE, limit=self._output_limit,
+            start_new_session=True
+        )
+
+    def kill(self) -> Optional[asyncio.subprocess.Process]:
+        proc, self._proc = self._proc, None
+        if proc is not None and proc.returncode is None:
+            # Commands run in subshells, the whole group is killed so a timed
+            # out command does not keep running and holding the pipes
+            with suppress(ProcessLookupError):
+                os.killpg(proc.pid, signal.SIGKILL)
+
+        return proc
+
+    async def stop(self):
+        # Waiting lets the loop reap the process and close its pipes
+        proc = self.kill()
+        if proc is not None:
+            await proc.wait()
+
+    def _make_script(self, marker: str, cmd: str, input_str: Optional[str]) -> bytes:
+        # The command and its input are passed as quoted heredocs, so nothing
+        # is expanded before `eval`; the random marker can not occur in them
+        script = f"IFS= read -r -d '' {self._CMD_VAR} <<'{marker}'\n{cmd}\n{marker}\n"
+        if input_str is None:
+            script += f'( eval "${self._CMD_VAR}" ) </dev/null\n'
+        else:
+            script += f'( eval "${self._CMD_VAR}" ) <<\'{marker}\'\n{input_str}\n{marker}\n'
+
+        script += f"printf '\\n{marker}:%d\\n' $?\n"
+        script += f"printf '\\n{marker}\\n' >&2\n"
+        return script.encode('utf-8')
+
+    async def run(self, cmd: str, input_str: Optional[str]) -> Tuple[int, str, str]:
+        marker = f'__wg_{uuid4().hex}'
+        stdout_sep = f'\n{marker}:'.encode('utf-8')
+        stderr_sep = f'\n{marker}\n'.encode('utf-8')
+
+        self._proc.stdin.write(self._make_script(marker, cmd, input_str))
+        await self._proc.stdin.drain()
+        stdout, stderr = await asyncio.gather(
+            self._proc.stdout.readuntil(stdout_sep),
+            self._proc.stderr.readuntil(stderr_sep),
+        )
+        returncode = int(await self._proc.stdout.readline())
+        return (
+            returncode,
+            stdout[:-len(stdout_sep)].decode('utf-8'),
+            stderr[:-len(stderr_sep)].decode('utf-8'),
+        )
+
+
+class ShellPool:
+
+    size: int = None
+    timeout: float = None
+    max_pending: int = None
+
+    _output_limit: int = None
+    _pending: int = 0
+    _idle: List[ShellWorker] = None
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __init__(self, size: int, timeout: float, max_pending: int, output_limit: int):
+        self.size = size
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._output_limit = output_limit
+        self._idle = []
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+
+        # Workers are bound to the loop which started them
+        for worker in self._idle:
+            worker.kill()
+
+        self._loop = loop
+        self._idle = []
+        self._semaphore = asyncio.Semaphore(self.size)
+
+    async def close(self):
+        workers, self._idle = self._idle, []
+        await asyncio.gather(*(worker.stop() for worker in workers))
+
+    async def exec(self, cmd: str, input_str: str = None) -> Tuple[int, str, str]:
+        self._bind_loop()
+        if self._pending >= self.max_pending:
+            raise ShellError(cmd, 'too many pending shell commands')
+
+        self._pending += 1
+        try:
+            async with self._semaphore:
+                return await self._exec(cmd, input_str)
+        finally:
+            self._pending -= 1
+
+    async def _exec(self, cmd: str, input_str: Optional[str]) -> Tuple[int, str, str]:
+        worker = self._idle.pop() if self._idle else ShellWorker(self._output_limit)
+        try:
+            if not worker.alive:
+                await worker.start()
+
+            result = await asyncio.wait_for(worker.run(cmd, input_str), self.timeout)
+        except asyncio.TimeoutError as ex:
+            await worker.stop()
+            raise ShellError(cmd, f'timed out after {self.timeout} seconds') from ex
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError) as ex:
+            # The worker crashed or its output is broken, the next command
+            # gets a new one
+            await worker.stop()
+            raise ShellError(cmd, 'shell worker failed') from ex
+        except BaseException:
+            await worker.stop()
+            raise
+
+        self._idle.append(worker)
+        return result
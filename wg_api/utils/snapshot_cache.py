@@ -0,0 +1,70 @@
+import asyncio
+from functools import partial
+from typing import Any, Awaitable, Callable, \
+    Dict, Hashable
+from wg_api.utils import config
+from wg_api.utils.ttl_cache import TTLCache
+
+
+class SnapshotCache:
+
+    ttl: float = None
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+
+    _generation: int = 0
+    _entries: TTLCache = None
+    _pending: Dict[Hashable, asyncio.Future] = None
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        # Keys come from request paths, expired and least used ones are dropped
+        self._entries = TTLCache(maxsize, ttl)
+        self._pending = {}
+
+    def _store(self, key: Hashable, generation: int, task: asyncio.Future):
+        if self._pending.get(key) is task:
+            del self._pending[key]
+
+        if task.cancelled() or task.exception() is not None:
+            return
+
+        # The state was changed while fetching, the result may be stale
+        if generation != self._generation or self.ttl <= 0:
+            return
+
+        self._entries.put(key, task.result())
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = self._entries.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._pending.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(fetch())
+            task.add_done_callback(partial(self._store, key, self._generation))
+            self._pending[key] = task
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def invalidate(self):
+        self._generation += 1
+        self._entries.clear()
+        self._pending.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'size': len(self._entries),
+        }
+
+
+running_cache = SnapshotCache(config.RUNNING_CACHE_TTL, config.RUNNING_CACHE_SIZE)
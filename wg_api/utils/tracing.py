@@ -0,0 +1,220 @@
+import io
+import re
+import time
+import pstats
+import cProfile
+import threading
+from collections import deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, List, Optional
+from wg_api.utils import config
+
+try:
+    from pyinstrument import Profiler as PyInstrumentProfiler
+except ImportError:
+    PyInstrumentProfiler = None
+
+
+TRACE_HEADER = b'x-trace'
+PROFILE_HEADER = b'x-profile'
+
+_NOOP_SPAN = nullcontext()
+
+
+class Trace:
+
+    method: str = None
+    path: str = None
+    started: float = None
+    duration: Optional[float] = None
+    profile: Optional[str] = None
+    spans: Dict[str, List[float]] = None
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.time()
+        self.spans = {}
+
+    def add(self, name: str, seconds: float):
+        span = self.spans.get(name)
+        if span is None:
+            self.spans[name] = [1, seconds, seconds]
+        else:
+            span[0] += 1
+            span[1] += seconds
+            if seconds > span[2]:
+                span[2] = seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'method': self.method,
+            'path': self.path,
+            'started': self.started,
+            'duration': self.duration,
+            'spans': {name: {'count': count, 'total': total, 'max': max_seconds}
+                      for name, (count, total, max_seconds) in self.spans.items()},
+            'profile': self.profile,
+        }
+
+    def server_timing(self) -> str:
+        metrics = [f'total;dur={self.duration * 1000:.3f}']
+        for name, (count, total, _) in sorted(self.spans.items(), key=lambda item: -item[1][1]):
+            metrics.append(f'{re.sub(r"[^A-Za-z0-9_.-]", "-", name)};dur={total * 1000:.3f};desc="{count}x"')
+
+        return ', '.join(metrics)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar('wg_api_trace', default=None)
+
+recent_traces: Deque[Trace] = deque(maxlen=config.TRACE_HISTORY)
+
+
+class _Span:
+
+    __slots__ = ('_trace', '_name', '_started')
+
+    def __init__(self, trace: Trace, name: str):
+        self._trace = trace
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._trace.add(self._name, time.perf_counter() - self._started)
+
+
+def span(name: str):
+    # Without an active trace this is one context variable lookup
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+
+    return _Span(trace, name)
+
+
+def summarize(traces: List[Trace]) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for trace in traces:
+        for name, (count, total, max_seconds) in trace.spans.items():
+            span_summary = summary.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            span_summary['count'] += count
+            span_summary['total'] += total
+            span_summary['max'] = max(span_summary['max'], max_seconds)
+
+    return summary
+
+
+class _CProfileCapture:
+
+    _profile: cProfile.Profile = None
+
+    def start(self):
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop(self) -> str:
+        self._profile.disable()
+        output = io.StringIO()
+        pstats.Stats(self._profile, stream=output).sort_stats('cumulative').print_stats(config.TRACE_PROFILE_LINES)
+        return output.getvalue()
+
+
+class _PyInstrumentCapture:
+
+    _profiler: Any = None
+
+    def start(self):
+        self._profiler = PyInstrumentProfiler(async_mode='enabled')
+        self._profiler.start()
+
+    def stop(self) -> str:
+        self._profiler.stop()
+        return self._profiler.output_text()
+
+
+def _make_profiler(name: Optional[str]) -> Optional[Any]:
+    if name == 'pyinstrument' and PyInstrumentProfiler is not None:
+        return _PyInstrumentCapture()
+
+    if name in ('1', 'true', 'cprofile', 'pyinstrument'):
+        return _CProfileCapture()
+
+    return None
+
+
+class TracingMiddleware:
+
+    app: Callable = None
+    enabled: bool = False
+    trace_header: bool = False
+    profiler: Optional[str] = None
+    profile_header: bool = False
+
+    # Profilers are process wide, so one capture runs at a time
+    _capture_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, app: Callable, enabled: bool = config.TRACE_ENABLED,
+                 trace_header: bool = config.TRACE_HEADER,
+                 profiler: Optional[str] = config.TRACE_PROFILER,
+                 profile_header: bool = config.TRACE_PROFILE_HEADER):
+        self.app = app
+        self.enabled = enabled
+        self.trace_header = trace_header
+        self.profiler = profiler
+        self.profile_header = profile_header
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        enabled = self.enabled
+        profiler_name = self.profiler
+        for header, value in scope['headers']:
+            # Headers run before authentication, so clients may opt in only
+            # when the server allows it
+            if header == TRACE_HEADER and self.trace_header:
+                enabled = value not in (b'', b'0')
+            elif header == PROFILE_HEADER and self.profile_header:
+                profiler_name = value.decode('latin-1').lower() or None
+
+        if not (enabled or profiler_name):
+            return await self.app(scope, receive, send)
+
+        trace = Trace(scope['method'], scope['path'])
+        profiler = _make_profiler(profiler_name)
+        if profiler is not None and not self._capture_lock.acquire(blocking=False):
+            # Another request is being profiled, this one is only traced
+            profiler = None
+
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                trace.duration = time.perf_counter() - started
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', trace.server_timing().encode('latin-1')))
+                message = dict(message, headers=headers)
+
+            await send(message)
+
+        token = _current_trace.set(trace)
+        try:
+            if profiler is not None:
+                # cProfile also sees whatever else the event loop runs meanwhile
+                profiler.start()
+
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if profiler is not None:
+                try:
+                    trace.profile = profiler.stop()
+                finally:
+                    self._capture_lock.release()
+
+            trace.duration = time.perf_counter() - started
+            _current_trace.reset(token)
+            recent_traces.append(trace)
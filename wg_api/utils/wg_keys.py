@@ -0,0 +1,148 @@
+import asyncio
+from base64 import b64encode, b64decode
+from binascii import Error as Base64Error
+from collections import deque
+from secrets import token_bytes
+from typing import Deque, List, Optional, Tuple
+from wg_api.utils.exceptions import IncorrectKey
+
+try:
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+except ImportError:
+    X25519PrivateKey = None
+
+
+KEY_LEN = 32
+
+# Curve25519 parameters (RFC 7748)
+_P = 2 ** 255 - 19
+_A24 = 121665
+_BASE_U = 9
+
+KeyPair = Tuple[str, str]
+
+
+def _clamp(scalar: bytes) -> bytes:
+    scalar = bytearray(scalar)
+    scalar[0] &= 248
+    scalar[31] = (scalar[31] & 127) | 64
+    return bytes(scalar)
+
+
+def _x25519(scalar: bytes, u: int) -> bytes:
+    # Fallback for when `cryptography` is not installed. Python integers are
+    # not constant-time, so the timing of this ladder depends on the key
+    k = int.from_bytes(_clamp(scalar), 'little')
+    x_1, x_2, z_2, x_3, z_3 = u, 1, 0, u, 1
+    swap = 0
+    for t in range(254, -1, -1):
+        k_t = (k >> t) & 1
+        swap ^= k_t
+        if swap:
+            x_2, x_3 = x_3, x_2
+            z_2, z_3 = z_3, z_2
+        swap = k_t
+
+        a = x_2 + z_2
+        aa = a * a % _P
+        b = x_2 - z_2
+        bb = b * b % _P
+        e = aa - bb
+        c = x_3 + z_3
+        d = x_3 - z_3
+        da = d * a % _P
+        cb = c * b % _P
+        x_3 = (da + cb) ** 2 % _P
+        z_3 = x_1 * (da - cb) ** 2 % _P
+        x_2 = aa * bb % _P
+        z_2 = e * (aa + _A24 * e) % _P
+
+    if swap:
+        x_2, z_2 = x_3, z_3
+
+    return (x_2 * pow(z_2, _P - 2, _P) % _P).to_bytes(KEY_LEN, 'little')
+
+
+def _decode_key(key: str) -> bytes:
+    try:
+        raw = b64decode(key, validate=True)
+    except (Base64Error, ValueError):
+        raise IncorrectKey(key)
+
+    if len(raw) != KEY_LEN:
+        raise IncorrectKey(key)
+
+    return raw
+
+
+def _encode_key(raw: bytes) -> str:
+    return b64encode(raw).decode('utf-8')
+
+
+def _public_bytes(private_raw: bytes) -> bytes:
+    if X25519PrivateKey is not None:
+        return X25519PrivateKey.from_private_bytes(private_raw).public_key() \
+            .public_bytes(Encoding.Raw, PublicFormat.Raw)
+
+    return _x25519(private_raw, _BASE_U)
+
+
+def generate_private_key() -> str:
+    # Same as `wg genkey`: random bytes clamped to a valid Curve25519 scalar
+    return _encode_key(_clamp(token_bytes(KEY_LEN)))
+
+
+def derive_public_key(private_key: str) -> str:
+    # `wg pubkey` clamps the key itself, so unclamped keys give the same result
+    return _encode_key(_public_bytes(_clamp(_decode_key(private_key))))
+
+
+def generate_keypair() -> KeyPair:
+    private_raw = _clamp(token_bytes(KEY_LEN))
+    return _encode_key(private_raw), _encode_key(_public_bytes(private_raw))
+
+
+def generate_keypairs(count: int) -> List[KeyPair]:
+    return [generate_keypair() for _ in range(count)]
+
+
+class KeyPool:
+
+    size: int = None
+    refill_batch: int = None
+
+    _keys: Deque[KeyPair] = None
+    _refill: Optional[asyncio.Future] = None
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __init__(self, size: int, refill_batch: int = 16):
+        self.size = size
+        self.refill_batch = refill_batch
+        self._keys = deque()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _schedule_refill(self):
+        if len(self._keys) > self.size // 2:
+            return
+
+        loop = asyncio.get_running_loop()
+        if self._refill is not None and self._loop is loop and not self._refill.done():
+            return
+
+        self._loop = loop
+        self._refill = asyncio.ensure_future(self.fill())
+
+    async def fill(self):
+        loop = asyncio.get_running_loop()
+        while len(self._keys) < self.size:
+            # Small batches keep the executor thread from holding the GIL long
+            count = min(self.refill_batch, self.size - len(self._keys))
+            self._keys.extend(await loop.run_in_executor(None, generate_keypairs, count))
+
+    async def get(self) -> KeyPair:
+        keypair = self._keys.popleft() if self._keys else generate_keypair()
+        self._schedule_refill()
+        return keypair
@@ -0,0 +1,319 @@
+import os
+import errno
+import socket
+import struct
+from base64 import b64encode
+from ipaddress import ip_address
+from typing import Callable, Dict, Iterator, List, \
+    NamedTuple, Optional, Tuple
+from wg_api.utils.exceptions import NetlinkError
+
+
+NETLINK_ROUTE = 0
+NETLINK_GENERIC = 16
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+
+NLM_F_REQUEST = 0x01
+NLM_F_MULTI = 0x02
+NLM_F_ACK = 0x04
+NLM_F_DUMP = 0x300
+
+NLA_F_NESTED = 1 << 15
+NLA_TYPE_MASK = 0x3fff
+
+GENL_ID_CTRL = 0x10
+CTRL_CMD_NEWFAMILY = 1
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+
+RTM_NEWLINK = 16
+RTM_GETLINK = 18
+IFLA_IFNAME = 3
+IFLA_LINKINFO = 18
+IFLA_INFO_KIND = 1
+
+WG_GENL_NAME = 'wireguard'
+WG_GENL_VERSION = 1
+WG_CMD_GET_DEVICE = 0
+
+WGDEVICE_A_IFNAME = 2
+WGDEVICE_A_PRIVATE_KEY = 3
+WGDEVICE_A_PUBLIC_KEY = 4
+WGDEVICE_A_LISTEN_PORT = 6
+WGDEVICE_A_FWMARK = 7
+WGDEVICE_A_PEERS = 8
+
+WGPEER_A_PUBLIC_KEY = 1
+WGPEER_A_PRESHARED_KEY = 2
+WGPEER_A_ENDPOINT = 4
+WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL = 5
+WGPEER_A_LAST_HANDSHAKE_TIME = 6
+WGPEER_A_RX_BYTES = 7
+WGPEER_A_TX_BYTES = 8
+WGPEER_A_ALLOWEDIPS = 9
+
+WGALLOWEDIP_A_FAMILY = 1
+WGALLOWEDIP_A_IPADDR = 2
+WGALLOWEDIP_A_CIDR_MASK = 3
+
+_NLMSGHDR = struct.Struct('=IHHII')
+_GENLMSGHDR = struct.Struct('=BBH')
+_IFINFOMSG = struct.Struct('=BxHiII')
+_NLATTR = struct.Struct('=HH')
+_TIMESPEC = struct.Struct('=qq')
+
+_ZERO_KEY = bytes(32)
+_RECV_SIZE = 1 << 16
+
+
+class WGDeviceInfo(NamedTuple):
+
+    name: str
+    private_key: Optional[str]
+    public_key: Optional[str]
+    listen_port: Optional[int]
+    fw_mark: Optional[str]
+
+
+class WGPeerInfo(NamedTuple):
+
+    public_key: str
+    preshared_key: Optional[str]
+    end_point: Optional[str]
+    allowed_ips: List[str]
+    latest_handshake: Optional[int]
+    transfer_rx: int
+    transfer_tx: int
+    keepalive: Optional[int]
+
+
+WGDump = Dict[str, Tuple[WGDeviceInfo, List[WGPeerInfo]]]
+
+
+def _align(length: int) -> int:
+    return (length + 3) & ~3
+
+
+def pack_attr(attr_type: int, payload: bytes) -> bytes:
+    length = _NLATTR.size + len(payload)
+    return _NLATTR.pack(length, attr_type) + payload + bytes(_align(length) - length)
+
+
+def pack_nested(attr_type: int, *attrs: bytes) -> bytes:
+    return pack_attr(attr_type | NLA_F_NESTED, b''.join(attrs))
+
+
+def pack_str(attr_type: int, value: str) -> bytes:
+    return pack_attr(attr_type, value.encode('utf-8') + b'\0')
+
+
+def pack_message(msg_type: int, flags: int, seq: int, payload: bytes) -> bytes:
+    return _NLMSGHDR.pack(_NLMSGHDR.size + len(payload), msg_type, flags, seq, 0) + payload
+
+
+def parse_attrs(data: bytes, offset: int = 0, end: int = None) -> Iterator[Tuple[int, bytes]]:
+    end = len(data) if end is None else end
+    while offset + _NLATTR.size <= end:
+        length, attr_type = _NLATTR.unpack_from(data, offset)
+        if length < _NLATTR.size:
+            break
+
+        yield attr_type & NLA_TYPE_MASK, data[offset + _NLATTR.size:offset + length]
+        offset += _align(length)
+
+
+def parse_messages(data: bytes) -> Iterator[Tuple[int, int, bytes]]:
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        length, msg_type, flags, _, _ = _NLMSGHDR.unpack_from(data, offset)
+        if length < _NLMSGHDR.size:
+            break
+
+        yield msg_type, flags, data[offset + _NLMSGHDR.size:offset + length]
+        offset += _align(length)
+
+
+def _key(value: bytes) -> Optional[str]:
+    if not value or value == _ZERO_KEY:
+        return None
+
+    return b64encode(value).decode('utf-8')
+
+
+def _str(value: bytes) -> str:
+    return value.split(b'\0', 1)[0].decode('utf-8')
+
+
+def _endpoint(value: bytes) -> Optional[str]:
+    family, = struct.unpack_from('=H', value)
+    port, = struct.unpack_from('!H', value, 2)
+    if family == socket.AF_INET:
+        return f'{ip_address(value[4:8])}:{port}'
+
+    if family == socket.AF_INET6:
+        return f'[{ip_address(value[8:24])}]:{port}'
+
+    return None
+
+
+def _allowed_ip(value: bytes) -> Optional[str]:
+    family = addr = cidr = None
+    for attr_type, payload in parse_attrs(value):
+        if attr_type == WGALLOWEDIP_A_FAMILY:
+            family, = struct.unpack('=H', payload)
+        elif attr_type == WGALLOWEDIP_A_IPADDR:
+            addr = payload
+        elif attr_type == WGALLOWEDIP_A_CIDR_MASK:
+            cidr = payload[0]
+
+    if family not in (socket.AF_INET, socket.AF_INET6) or addr is None:
+        return None
+
+    return f'{ip_address(addr)}/{cidr}'
+
+
+def _parse_peer(data: bytes) -> WGPeerInfo:
+    public_key = preshared_key = end_point = None
+    latest_handshake = keepalive = None
+    transfer_rx = transfer_tx = 0
+    allowed_ips = []
+    for attr_type, payload in parse_attrs(data):
+        if attr_type == WGPEER_A_PUBLIC_KEY:
+            public_key = _key(payload)
+        elif attr_type == WGPEER_A_PRESHARED_KEY:
+            preshared_key = _key(payload)
+        elif attr_type == WGPEER_A_ENDPOINT:
+            end_point = _endpoint(payload)
+        elif attr_type == WGPEER_A_PERSISTENT_KEEPALIVE_INTERVAL:
+            keepalive = struct.unpack('=H', payload)[0] or None
+        elif attr_type == WGPEER_A_LAST_HANDSHAKE_TIME:
+            latest_handshake = _TIMESPEC.unpack(payload)[0] or None
+        elif attr_type == WGPEER_A_RX_BYTES:
+            transfer_rx, = struct.unpack('=Q', payload)
+        elif attr_type == WGPEER_A_TX_BYTES:
+            transfer_tx, = struct.unpack('=Q', payload)
+        elif attr_type == WGPEER_A_ALLOWEDIPS:
+            for _, allowed_ip_data in parse_attrs(payload):
+                if allowed_ip := _allowed_ip(allowed_ip_data):
+                    allowed_ips.append(allowed_ip)
+
+    return WGPeerInfo(public_key, preshared_key, end_point, allowed_ips,
+                      latest_handshake, transfer_rx, transfer_tx, keepalive)
+
+
+class WGNetlink:
+
+    _seq = 0
+    _family_id = None
+    _socket_factory = None
+
+    def __init__(self, socket_factory: Callable[[int], socket.socket] = None):
+        self._socket_factory = socket_factory or self._open_socket
+
+    @staticmethod
+    def _open_socket(protocol: int) -> socket.socket:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, protocol)
+        sock.bind((0, 0))
+        return sock
+
+    def _next_seq(self) -> int:
+        self._seq = (self._seq + 1) & 0xffffffff
+        return self._seq
+
+    def _request(self, protocol: int, msg_type: int, flags: int, payload: bytes) -> Iterator[bytes]:
+        seq = self._next_seq()
+        sock = self._socket_factory(protocol)
+        try:
+            sock.send(pack_message(msg_type, NLM_F_REQUEST | flags, seq, payload))
+            while True:
+                for resp_type, resp_flags, resp_payload in parse_messages(sock.recv(_RECV_SIZE)):
+                    if resp_type == NLMSG_DONE:
+                        return
+
+                    if resp_type == NLMSG_ERROR:
+                        err_code, = struct.unpack_from('=i', resp_payload)
+                        if err_code:
+                            raise NetlinkError(-err_code, os.strerror(-err_code))
+
+                        return
+
+                    yield resp_payload
+                    if not resp_flags & NLM_F_MULTI:
+                        return
+        finally:
+            sock.close()
+
+    def _get_family_id(self) -> int:
+        if self._family_id is not None:
+            return self._family_id
+
+        payload = _GENLMSGHDR.pack(CTRL_CMD_GETFAMILY, 1, 0)
+        payload += pack_str(CTRL_ATTR_FAMILY_NAME, WG_GENL_NAME)
+        for resp_payload in self._request(NETLINK_GENERIC, GENL_ID_CTRL, NLM_F_ACK, payload):
+            for attr_type, value in parse_attrs(resp_payload, _GENLMSGHDR.size):
+                if attr_type == CTRL_ATTR_FAMILY_ID:
+                    self._family_id, = struct.unpack('=H', value)
+                    return self._family_id
+
+        raise NetlinkError(errno.ENOENT, f'Generic netlink family "{WG_GENL_NAME}" is not found')
+
+    def interfaces(self) -> List[str]:
+        names = []
+        payload = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)
+        for resp_payload in self._request(NETLINK_ROUTE, RTM_GETLINK, NLM_F_DUMP, payload):
+            name = kind = None
+            for attr_type, value in parse_attrs(resp_payload, _IFINFOMSG.size):
+                if attr_type == IFLA_IFNAME:
+                    name = _str(value)
+                elif attr_type == IFLA_LINKINFO:
+                    for info_type, info_value in parse_attrs(value):
+                        if info_type == IFLA_INFO_KIND:
+                            kind = _str(info_value)
+
+            if name and kind == WG_GENL_NAME:
+                names.append(name)
+
+        return names
+
+    def device(self, name: str) -> Tuple[WGDeviceInfo, List[WGPeerInfo]]:
+        device = None
+        peers: List[WGPeerInfo] = []
+        payload = _GENLMSGHDR.pack(WG_CMD_GET_DEVICE, WG_GENL_VERSION, 0)
+        payload += pack_str(WGDEVICE_A_IFNAME, name)
+        for resp_payload in self._request(NETLINK_GENERIC, self._get_family_id(),
+                                          NLM_F_ACK | NLM_F_DUMP, payload):
+            private_key = public_key = listen_port = fw_mark = None
+            for attr_type, value in parse_attrs(resp_payload, _GENLMSGHDR.size):
+                if attr_type == WGDEVICE_A_PRIVATE_KEY:
+                    private_key = _key(value)
+                elif attr_type == WGDEVICE_A_PUBLIC_KEY:
+                    public_key = _key(value)
+                elif attr_type == WGDEVICE_A_LISTEN_PORT:
+                    listen_port, = struct.unpack('=H', value)
+                elif attr_type == WGDEVICE_A_FWMARK:
+                    mark, = struct.unpack('=I', value)
+                    fw_mark = f'0x{mark:x}' if mark else None
+                elif attr_type == WGDEVICE_A_PEERS:
+                    for _, peer_data in parse_attrs(value):
+                        peer = _parse_peer(peer_data)
+                        # The kernel splits big devices into several messages,
+                        # the allowed ips of one peer may continue in the next one
+                        if peers and peers[-1].public_key == peer.public_key:
+                            peers[-1].allowed_ips.extend(peer.allowed_ips)
+                        else:
+                            peers.append(peer)
+
+            if device is None:
+                device = WGDeviceInfo(name, private_key, public_key, listen_port, fw_mark)
+
+        if device is None:
+            raise NetlinkError(errno.ENODEV, f'Not found interface "{name}"')
+
+        return device, peers
+
+    def dump(self, name: str = None) -> WGDump:
+        names = self.interfaces() if name is None else [name]
+        return {if_name: self.device(if_name) for if_name in names}
@@ -1,26 +1,78 @@
+import os
 import re
+import time
+import signal
 import asyncio
-from typing import Any
-from base64 import b64encode
-from secrets import token_bytes
-from ipaddress import IPv4Interface
+from contextlib import suppress
+from typing import Any, Iterable, Optional, Set, Tuple
+from ipaddress import ip_interface
+from wg_api.utils import config
+from wg_api.utils.shell_pool import ShellPool
+from wg_api.utils.metrics import shell_metrics, command_label
+from wg_api.utils.tracing import span
+from wg_api.utils.wg_keys import KeyPool, generate_private_key, derive_public_key
 from wg_api.utils.exceptions import ShellError, \
     IncorrectInterfaceName
 
 
 PIPE = asyncio.subprocess.PIPE
 
+shell_pool = ShellPool(
+    config.SHELL_POOL_SIZE, config.SHELL_TIMEOUT,
+    config.SHELL_MAX_PENDING, config.SHELL_OUTPUT_LIMIT
+)
 
-async def shell_exec(cmd: str, *input_args: str) -> str:
+key_pool = KeyPool(config.KEY_POOL_SIZE)
+
+
+async def _kill_group(proc: asyncio.subprocess.Process):
+    # The whole group is killed, not only the shell, so the command itself
+    # does not keep running
+    with suppress(ProcessLookupError):
+        os.killpg(proc.pid, signal.SIGKILL)
+
+    await proc.wait()
+
+
+async def _spawn_exec(cmd: str, input_str: str = None) -> Tuple[int, str, str]:
     proc = await asyncio.create_subprocess_shell(
         f"/bin/bash -c '{escape(cmd)}'",
-        stdin=PIPE, stdout=PIPE, stderr=PIPE
+        stdin=PIPE, stdout=PIPE, stderr=PIPE,
+        start_new_session=True
     )
-    stdout, stderr = await proc.communicate('\n'.join(input_args).encode('utf-8') if input_args else None)
-    if stderr and proc.returncode != 0:
-        raise ShellError(unescape(cmd), stderr.decode('utf-8').strip(), proc.returncode)
+    try:
+        stdout, stderr = await asyncio.wait_for(
+            proc.communicate(input_str.encode('utf-8') if input_str is not None else None),
+            config.SHELL_TIMEOUT
+        )
+    except asyncio.TimeoutError as ex:
+        await _kill_group(proc)
+        raise ShellError(cmd, f'timed out after {config.SHELL_TIMEOUT} seconds') from ex
+    except BaseException:
+        await _kill_group(proc)
+        raise
 
-    return stdout.decode('utf-8').strip()
+    return proc.returncode, stdout.decode('utf-8'), stderr.decode('utf-8')
+
+
+async def shell_exec(cmd: str, *input_args: str) -> str:
+    input_str = '\n'.join(input_args) if input_args else None
+    started = time.perf_counter()
+    failed = True
+    try:
+        with span(f'shell {command_label(cmd)}'):
+            if config.SHELL_POOL_SIZE > 0:
+                returncode, stdout, stderr = await shell_pool.exec(cmd, input_str)
+            else:
+                returncode, stdout, stderr = await _spawn_exec(cmd, input_str)
+
+        if stderr and returncode != 0:
+            raise ShellError(unescape(cmd), stderr.strip(), returncode)
+
+        failed = False
+        return stdout.strip()
+    finally:
+        shell_metrics.observe(cmd, time.perf_counter() - started, failed)
 
 
 def escape_to_str(value: Any) -> str:
@@ -36,11 +88,16 @@ def unescape(value: str) -> str:
 
 
 async def get_private_key() -> str:
-    return b64encode(token_bytes(32)).decode('utf-8')
+    return generate_private_key()
 
 
 async def get_public_key(private_key: str) -> str:
-    return str(await shell_exec('wg pubkey', private_key)).strip()
+    return derive_public_key(private_key)
+
+
+def allowed_networks(allowed_ips: Optional[Iterable[Any]]) -> Set[Any]:
+    # 10.0.0.1/24 and 10.0.0.0/24 are the same allowed IPs for WireGuard
+    return {ip_interface(allowed_ip).network for allowed_ip in allowed_ips or ()}
 
 
 def check_interface_name(name: str):